@@ -0,0 +1,82 @@
+"""
+Micro-benchmark: Inference Result Extraction
+
+Compares the old per-box extraction loop (three .cpu().numpy() round trips per
+box) with the vectorised extract_detections() on synthetic detection results
+containing 10 / 100 / 1000 boxes.
+
+Usage:
+    python bench_result_extraction.py [--repeat 200]
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from inference_utils import class_names_array, extract_detections
+
+NAMES = {i: f'class_{i}' for i in range(80)}
+
+
+def legacy_extract(result):
+    """Original per-box loop from predict()"""
+    detections = []
+    if result.boxes is not None and len(result.boxes) > 0:
+        for box in result.boxes:
+            bbox = box.xyxy[0].cpu().numpy().tolist()
+            conf = float(box.conf[0].cpu().numpy())
+            cls = int(box.cls[0].cpu().numpy())
+            detections.append({
+                'class': result.names[cls],
+                'confidence': conf,
+                'bbox': bbox
+            })
+    return detections
+
+
+def make_result(num_boxes, height=1080, width=1920):
+    """Build a synthetic detection result with num_boxes boxes"""
+    rng = np.random.default_rng(0)
+    xy1 = rng.uniform(0, [width - 100, height - 100], size=(num_boxes, 2))
+    xy2 = xy1 + rng.uniform(10, 100, size=(num_boxes, 2))
+    conf = rng.uniform(0.25, 1.0, size=(num_boxes, 1))
+    cls = rng.integers(0, len(NAMES), size=(num_boxes, 1))
+    data = torch.from_numpy(np.hstack([xy1, xy2, conf, cls]).astype(np.float32))
+    orig_img = np.zeros((height, width, 3), dtype=np.uint8)
+    return Results(orig_img, path='bench.jpg', names=NAMES, boxes=data)
+
+
+def bench(fn, result, repeat):
+    fn(result)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(result)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    names_array = class_names_array(NAMES)
+
+    print(f"{'boxes':>8} {'legacy ms':>12} {'vectorised ms':>15} {'speedup':>10}")
+    for num_boxes in (10, 100, 1000):
+        result = make_result(num_boxes)
+        assert legacy_extract(result) == extract_detections(result, 'detect', names_array=names_array)
+
+        legacy_ms = bench(legacy_extract, result, args.repeat)
+        vector_ms = bench(lambda r: extract_detections(r, 'detect', names_array=names_array), result, args.repeat)
+        print(f'{num_boxes:>8} {legacy_ms:>12.3f} {vector_ms:>15.3f} {legacy_ms / vector_ms:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
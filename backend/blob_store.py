@@ -0,0 +1,106 @@
+import os
+import stat
+import errno
+import uuid
+import shutil
+import threading
+
+
+class BlobStore:
+    """数据集文件的内容寻址存储
+
+    每个文件按 sha256 只保存一份（blobs_dir/ab/abcdef...，只读），数据集目录中的文件是指向
+    blob 的硬链接。blob 的链接数为 1 时说明已没有数据集引用，可以回收。入库、链接与回收在
+    同一把锁内检查链接数，回收不会删掉正在被链接的 blob。
+    """
+
+    # 无法建立硬链接时退化为复制的错误：跨文件系统、文件系统不支持、链接数达到上限
+    COPY_ERRNOS = (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EOPNOTSUPP)
+
+    def __init__(self, blobs_dir):
+        self.blobs_dir = blobs_dir
+        self.tmp_dir = os.path.join(blobs_dir, 'tmp')
+        self._lock = threading.Lock()
+        self.stored = 0
+        self.reused = 0
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path(self, digest):
+        return os.path.join(self.blobs_dir, digest[:2], digest)
+
+    def temp_path(self):
+        return os.path.join(self.tmp_dir, uuid.uuid4().hex)
+
+    def _link(self, blob, target):
+        """target 已存在等其他错误直接抛出：不能覆盖已有文件，它可能是其他 blob 的硬链接"""
+        try:
+            os.link(blob, target)
+        except OSError as e:
+            if e.errno not in self.COPY_ERRNOS:
+                raise
+            # 跨文件系统等无法硬链接时退化为复制（不去重），目标不存在时才创建
+            with open(blob, 'rb') as src, open(target, 'xb') as dst:
+                shutil.copyfileobj(src, dst)
+
+    def put(self, digest, target, data=None, temp_path=None):
+        """把内容为 digest 的文件放到 target：已有相同内容时直接链接，否则先入库再链接
+
+        内容由 data（bytes）或已写好的临时文件 temp_path 提供。返回是否新入库。
+        """
+        blob = self.path(digest)
+        if temp_path is None and os.path.exists(blob):
+            with self._lock:
+                if os.path.exists(blob):
+                    self._link(blob, target)
+                    self.reused += 1
+                    return False
+        if temp_path is None:
+            temp_path = self.temp_path()
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+        os.chmod(temp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        with self._lock:
+            if os.path.exists(blob):
+                os.remove(temp_path)
+                self._link(blob, target)
+                self.reused += 1
+                return False
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.replace(temp_path, blob)
+            self._link(blob, target)
+            self.stored += 1
+            return True
+
+    def release(self, digests):
+        """回收不再被任何数据集链接的 blob，返回 (个数, 字节数)"""
+        removed = freed = 0
+        with self._lock:
+            for digest in set(digests):
+                blob = self.path(digest)
+                try:
+                    st = os.stat(blob)
+                except OSError:
+                    continue
+                if st.st_nlink <= 1:
+                    os.remove(blob)
+                    removed += 1
+                    freed += st.st_size
+        return removed, freed
+
+    def sweep(self):
+        """全量回收未被引用的 blob 并清理残留的临时文件（服务启动时后台运行）"""
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        digests = []
+        for prefix in os.listdir(self.blobs_dir):
+            directory = os.path.join(self.blobs_dir, prefix)
+            if prefix == 'tmp' or not os.path.isdir(directory):
+                continue
+            digests.extend(os.listdir(directory))
+        removed, freed = self.release(digests)
+        if removed:
+            print(f"Blob sweep: removed {removed} unreferenced blobs ({freed / 1024 ** 2:.1f}MB)")
+        return removed, freed
+
+    def stats(self):
+        return {'stored': self.stored, 'reused': self.reused}
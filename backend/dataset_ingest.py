@@ -0,0 +1,281 @@
+import os
+import json
+import stat
+import shutil
+import hashlib
+import zipfile
+import threading
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png')
+SPLITS = ('train', 'val')
+BLOB_INDEX = '.blobs.json'  # 解压目录中记录所引用 blob 的索引，删除数据集时据此回收
+MAX_BUFFER = 16 * 1024 * 1024  # 不超过该大小的成员先在内存中计算哈希，已有相同内容时不落盘
+
+
+class ArchiveError(Exception):
+    """压缩包不安全或不符合限制（路径穿越、解压炸弹、文件过多等）"""
+    pass
+
+
+class DatasetIngestor:
+    """数据集压缩包导入
+
+    只读取一次 zip 中央目录即可完成：成员路径与大小的安全检查（zip-slip、解压炸弹）、
+    定位包含 train/val 的数据集根目录、分类任务的类别、文件清单与图片统计；
+    随后用线程池并行解压各成员（zlib 解压时释放 GIL）。
+
+    配置了 blob_store 时解压过程中计算每个成员的 sha256，内容已存在的文件直接硬链接到已有 blob，
+    不再写盘；新内容入库后再链接，重复上传的数据集几乎不占额外空间。
+    """
+
+    def __init__(self, max_workers=None, max_total_size=50 * 1024 ** 3, max_files=1_000_000,
+                 max_ratio=200, ratio_min_size=1024 * 1024, blob_store=None):
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.blob_store = blob_store
+        self.max_total_size = max_total_size
+        self.max_files = max_files
+        self.max_ratio = max_ratio
+        self.ratio_min_size = ratio_min_size  # 小文件压缩率天然很高，只检查超过该大小的成员
+
+    @staticmethod
+    def _safe_name(name):
+        """规范化成员路径，拒绝绝对路径与 .. 穿越"""
+        name = name.replace('\\', '/')
+        if name.startswith('/') or (len(name) > 1 and name[1] == ':'):
+            raise ArchiveError(f'压缩包包含绝对路径: {name}')
+        normalized = posixpath.normpath(name)
+        if normalized == '..' or normalized.startswith('../'):
+            raise ArchiveError(f'压缩包包含非法路径: {name}')
+        return normalized
+
+    def scan(self, zip_ref):
+        """读取中央目录：安全检查并返回 [(ZipInfo, 规范化路径)]，只含普通文件"""
+        infos = zip_ref.infolist()
+        if len(infos) > self.max_files:
+            raise ArchiveError(f'压缩包文件数过多: {len(infos)} > {self.max_files}')
+
+        members = []
+        total_size = 0
+        for info in infos:
+            if info.is_dir():
+                continue
+            mode = info.external_attr >> 16
+            if stat.S_ISLNK(mode):
+                # 符号链接可能指向解压目录之外，直接跳过
+                continue
+            name = self._safe_name(info.filename)
+            if name.startswith('__MACOSX/') or posixpath.basename(name).startswith('._'):
+                continue
+            total_size += info.file_size
+            if total_size > self.max_total_size:
+                raise ArchiveError(f'解压后大小超过限制 {self.max_total_size} 字节')
+            if info.file_size > self.ratio_min_size and info.file_size > self.max_ratio * max(info.compress_size, 1):
+                raise ArchiveError(f'压缩率异常（疑似解压炸弹）: {name}')
+            members.append((info, name))
+        return members
+
+    @staticmethod
+    def find_root(names):
+        """在成员路径中定位同时包含 train 与 val 子目录的最浅目录，返回相对路径（'' 表示顶层）"""
+        children = {}
+        for name in names:
+            parts = name.split('/')
+            for depth in range(len(parts) - 1):
+                parent = '/'.join(parts[:depth])
+                children.setdefault(parent, set()).add(parts[depth])
+        candidates = [d for d, subdirs in children.items() if 'train' in subdirs and 'val' in subdirs]
+        if not candidates:
+            return ''
+        return min(candidates, key=lambda d: (d.count('/') + (1 if d else 0), d))
+
+    @staticmethod
+    def _relative(name, root):
+        if not root:
+            return name
+        return name[len(root) + 1:] if name.startswith(root + '/') else None
+
+    def build_inventory(self, members, root, task_type):
+        """根据成员路径生成文件清单与统计，分类任务同时得到类别（train 下的子目录名）"""
+        inventory = []
+        stats = {'total_images': 0, 'train_images': 0, 'val_images': 0}
+        class_dirs = set()
+        for info, name in members:
+            rel = self._relative(name, root)
+            if rel is None:
+                continue
+            parts = rel.split('/')
+            split = parts[0] if parts[0] in SPLITS else None
+            is_image = rel.lower().endswith(IMAGE_SUFFIXES)
+            is_label = rel.endswith('.txt') and len(parts) >= 3 and parts[1] == 'labels'
+            inventory.append({
+                'path': rel,
+                'size': info.file_size,
+                'split': split,
+                'kind': 'image' if is_image else 'label' if is_label else 'other'
+            })
+            if is_image and split:
+                stats[f'{split}_images'] += 1
+            if task_type == 'classify' and split == 'train' and len(parts) >= 3:
+                class_dirs.add(parts[1])
+        stats['total_images'] = stats['train_images'] + stats['val_images']
+        return inventory, stats, sorted(class_dirs)
+
+    def extract(self, zip_path, dest_dir, members, digests=None, mtimes=None):
+        """并行解压成员到 dest_dir
+
+        实际解压字节数超过中央目录声明的大小时中止（防止伪造头部的解压炸弹）。
+        配置了 blob_store 时文件以硬链接指向 blob，{成员路径: sha256} 写入 digests，
+        返回新入库的字节数（其余内容已存在，只建立了链接）。传入 mtimes 时写入 {成员路径: 落盘后的 mtime}。
+        """
+        dest_dir = os.path.realpath(dest_dir)
+        local = threading.local()
+        handles = []
+        handles_lock = threading.Lock()
+        created_dirs = set()
+        dirs_lock = threading.Lock()
+        stored = []
+
+        def zip_handle():
+            if not hasattr(local, 'zip'):
+                local.zip = zipfile.ZipFile(zip_path, 'r')
+                with handles_lock:
+                    handles.append(local.zip)
+            return local.zip
+
+        def extract_one(item):
+            info, name = item
+            # 成员路径已在 scan 中规范化且跳过了符号链接，这里用 normpath 复核即可，避免逐级 lstat
+            target = os.path.normpath(os.path.join(dest_dir, *name.split('/')))
+            if not target.startswith(dest_dir + os.sep):
+                raise ArchiveError(f'压缩包包含非法路径: {name}')
+            parent = os.path.dirname(target)
+            with dirs_lock:
+                if parent not in created_dirs:
+                    os.makedirs(parent, exist_ok=True)
+                    created_dirs.add(parent)
+
+            if self.blob_store is not None:
+                digests[name] = store_one(info, name, target)
+            else:
+                write_one(info, name, target)
+            if mtimes is not None:
+                mtimes[name] = os.stat(target).st_mtime
+
+        def write_one(info, name, target):
+            written = 0
+            with zip_handle().open(info) as src, open(target, 'wb') as dst:
+                while True:
+                    block = src.read(1024 * 1024)
+                    if not block:
+                        break
+                    written += len(block)
+                    if written > info.file_size:
+                        raise ArchiveError(f'解压大小与声明不符（疑似解压炸弹）: {name}')
+                    dst.write(block)
+
+        def store_one(info, name, target):
+            digest = hashlib.sha256()
+            chunks = []
+            spill = None  # 超过 MAX_BUFFER 的成员边算哈希边写临时文件
+            written = 0
+            try:
+                with zip_handle().open(info) as src:
+                    while True:
+                        block = src.read(1024 * 1024)
+                        if not block:
+                            break
+                        written += len(block)
+                        if written > info.file_size:
+                            raise ArchiveError(f'解压大小与声明不符（疑似解压炸弹）: {name}')
+                        digest.update(block)
+                        if spill is None and written > MAX_BUFFER:
+                            spill = open(self.blob_store.temp_path(), 'wb')
+                            spill.writelines(chunks)
+                            chunks = None
+                        if spill is None:
+                            chunks.append(block)
+                        else:
+                            spill.write(block)
+            except BaseException:
+                if spill is not None:
+                    spill.close()
+                    os.remove(spill.name)
+                raise
+            if spill is None:
+                new = self.blob_store.put(digest.hexdigest(), target, data=b''.join(chunks))
+            else:
+                spill.close()
+                new = self.blob_store.put(digest.hexdigest(), target, temp_path=spill.name)
+            if new:
+                stored.append(written)
+            return digest.hexdigest()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='unzip') as executor:
+                for _ in executor.map(extract_one, members):
+                    pass
+        finally:
+            for handle in handles:
+                handle.close()
+        return sum(stored)
+
+    def ingest(self, zip_path, dest_dir, task_type):
+        """导入压缩包：返回 (数据集根目录, 统计, 分类任务的类别名列表, 文件清单)
+
+        检测/分割任务的类别由调用方用 LabelScanner 扫描清单中的标签文件得到。清单中各文件带有落盘后的
+        mtime，导入后的文件清单表直接由它生成，无需再遍历目录。
+        使用 blob_store 时清单中各文件带有 blob（sha256），引用的 blob 记录在解压目录的 BLOB_INDEX 中。
+        """
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            members = self.scan(zip_ref)
+        names = [name for _, name in members]
+        root = self.find_root(names)
+        inventory, stats, class_dirs = self.build_inventory(members, root, task_type)
+
+        # 只解压到新建的目录：失败时会删除整个目录，不能误删已有数据集
+        try:
+            os.makedirs(dest_dir)
+        except FileExistsError:
+            raise ArchiveError(f'数据集目录已存在: {dest_dir}')
+        digests = {}
+        mtimes = {}
+        try:
+            stored_bytes = self.extract(zip_path, dest_dir, members, digests, mtimes)
+        except Exception:
+            shutil.rmtree(dest_dir, ignore_errors=True)
+            if self.blob_store is not None:
+                self.blob_store.release(digests.values())
+            raise
+
+        for item in inventory:
+            name = posixpath.join(root, item['path']) if root else item['path']
+            item['mtime'] = mtimes.get(name)
+            if self.blob_store is not None:
+                item['blob'] = digests.get(name)
+        if self.blob_store is not None:
+            with open(os.path.join(dest_dir, BLOB_INDEX), 'w', encoding='utf-8') as f:
+                json.dump(sorted(set(digests.values())), f)
+            stats['dedup'] = {
+                'files': len(digests),
+                'unique': len(set(digests.values())),
+                'bytes': sum(info.file_size for info, _ in members),
+                'stored_bytes': stored_bytes
+            }
+
+        dataset_root = os.path.join(dest_dir, *root.split('/')) if root else dest_dir
+        return dataset_root, stats, class_dirs, inventory
+
+    def remove(self, dest_dir):
+        """删除解压目录并回收不再被引用的 blob，返回回收的 (个数, 字节数)"""
+        digests = []
+        try:
+            with open(os.path.join(dest_dir, BLOB_INDEX), 'r', encoding='utf-8') as f:
+                digests = json.load(f)
+        except (OSError, ValueError):
+            pass
+        shutil.rmtree(dest_dir, ignore_errors=True)
+        if self.blob_store is None or not digests:
+            return 0, 0
+        return self.blob_store.release(digests)
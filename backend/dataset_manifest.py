@@ -0,0 +1,254 @@
+import os
+import json
+import yaml
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from sqlalchemy import func, select, insert, update, case, exists
+from models import db, DatasetFile
+from dataset_ingest import IMAGE_SUFFIXES, SPLITS
+from label_scanner import LabelScanner
+
+SQL_BATCH_SIZE = 500  # 低于 SQLite 单条语句的参数个数上限
+
+
+class DatasetManifest:
+    """数据集文件清单（dataset_files 表）
+
+    导入时为每张图片记录相对路径、大小、mtime、宽高（只读图片头）、划分、标签路径、
+    框数量与类别编号，之后的统计、类别直方图与筛选都只查询该表。导入时由导入清单直接生成；
+    之后 refresh 重新遍历目录，只对大小或 mtime（图片或标签）变化的文件重新读取，新增插入、
+    缺失删除；标签有变化时用 LabelScanner 重新生成数据集的标签统计报告（Dataset.label_stats）。
+    """
+
+    def __init__(self, max_workers=None, label_scanner=None):
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.label_scanner = label_scanner or LabelScanner()
+
+    @staticmethod
+    def _label_path(rel):
+        """与 ultralytics 相同的对应规则：.../images/... -> .../labels/...，扩展名改为 .txt"""
+        parts = rel.split('/')
+        if 'images' not in parts:
+            return None
+        index = len(parts) - 1 - parts[::-1].index('images')
+        parts[index] = 'labels'
+        return os.path.splitext('/'.join(parts))[0] + '.txt'
+
+    @staticmethod
+    def _load_names(root):
+        try:
+            with open(os.path.join(root, 'data.yaml'), 'r', encoding='utf-8') as f:
+                names = (yaml.safe_load(f) or {}).get('names') or []
+        except (OSError, yaml.YAMLError):
+            return []
+        return list(names.values()) if isinstance(names, dict) else list(names)
+
+    def _scan(self, root, task_type):
+        """遍历 train/val，返回 ({图片相对路径: 文件信息}, {标签相对路径: mtime})"""
+        images = {}
+        labels = {}
+        for split in SPLITS:
+            stack = [os.path.join(root, split)]
+            while stack:
+                try:
+                    entries = list(os.scandir(stack.pop()))
+                except OSError:
+                    continue
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    rel = os.path.relpath(entry.path, root).replace(os.sep, '/')
+                    name = entry.name.lower()
+                    if name.endswith(IMAGE_SUFFIXES):
+                        st = entry.stat()
+                        images[rel] = {'split': split, 'size': st.st_size, 'mtime': st.st_mtime}
+                    elif name.endswith('.txt') and task_type != 'classify':
+                        labels[rel] = entry.stat().st_mtime
+
+        return self._attach_labels(images, labels, task_type)
+
+    def _from_inventory(self, inventory, task_type):
+        """由导入清单得到与 _scan 相同的结果（清单已含大小与 mtime，不再遍历目录）"""
+        images = {}
+        labels = {}
+        for item in inventory:
+            if item['split'] not in SPLITS:
+                continue
+            if item['kind'] == 'image':
+                images[item['path']] = {'split': item['split'], 'size': item['size'], 'mtime': item['mtime'],
+                                        'blob': item.get('blob')}
+            elif item['path'].endswith('.txt') and task_type != 'classify':
+                labels[item['path']] = item['mtime']
+        return self._attach_labels(images, labels, task_type)
+
+    def _attach_labels(self, images, labels, task_type):
+        """为每张图片填入对应的标签路径与标签 mtime（没有标签文件时为 None）"""
+        for rel, info in images.items():
+            label = self._label_path(rel) if task_type != 'classify' else None
+            info['label_path'] = label if label in labels else None
+            info['label_mtime'] = labels.get(label) if info['label_path'] else None
+        return images, labels
+
+    @staticmethod
+    def _probe(root, rel, info, task_type, class_index, label_files):
+        """读取图片宽高（只解析文件头），框数量与类别编号取自标签扫描结果"""
+        row = dict(info, path=rel, width=None, height=None, box_count=0, class_ids=[])
+        try:
+            with Image.open(os.path.join(root, rel)) as img:
+                row['width'], row['height'] = img.size
+        except Exception:
+            pass
+
+        if task_type == 'classify':
+            row['box_count'] = None
+            parts = rel.split('/')
+            if len(parts) >= 3 and parts[1] in class_index:
+                row['class_ids'] = [class_index[parts[1]]]
+        elif info['label_path'] in label_files:
+            row['box_count'], row['class_ids'] = label_files[info['label_path']]
+        row['class_ids'] = json.dumps(list(row['class_ids']), separators=(',', ':'))
+        return row
+
+    def _scan_labels(self, dataset, label_paths, names):
+        return self.label_scanner.scan(dataset.path, sorted(label_paths), dataset.task_type, nc=len(names) or None)
+
+    def scan_labels(self, dataset):
+        """重新扫描数据集的全部标签文件，返回标签扫描报告（分类任务返回 None）"""
+        if dataset.task_type == 'classify':
+            return None
+        _, label_mtimes = self._scan(dataset.path, dataset.task_type)
+        return self._scan_labels(dataset, label_mtimes, self._load_names(dataset.path))
+
+    def refresh(self, dataset, labels=None, inventory=None):
+        """同步数据集目录与清单表（首次调用即完整构建），返回变化计数；调用方负责提交事务
+
+        labels 为导入时已完成的标签扫描报告，传入时不再重复扫描；inventory 为导入清单
+        （DatasetIngestor.ingest），传入时直接由它生成文件信息与 blob，否则遍历目录。
+        之后被替换的图片不再是 blob 的链接，其 blob 置空。
+        """
+        root = dataset.path
+        if inventory is not None:
+            images, label_mtimes = self._from_inventory(inventory, dataset.task_type)
+        else:
+            images, label_mtimes = self._scan(root, dataset.task_type)
+        names = self._load_names(root)
+        class_index = {name: i for i, name in enumerate(names)}
+
+        existing = {}
+        for row in db.session.execute(
+            select(DatasetFile.id, DatasetFile.path, DatasetFile.size, DatasetFile.mtime, DatasetFile.label_path,
+                   DatasetFile.label_mtime).where(DatasetFile.dataset_id == dataset.id)
+        ):
+            existing[row.path] = row
+        existing_rows = dict(existing)
+
+        changed = []
+        unchanged = 0
+        for rel, info in images.items():
+            old = existing.pop(rel, None)
+            if old is not None and (old.size, old.mtime, old.label_path, old.label_mtime) == (
+                    info['size'], info['mtime'], info['label_path'], info['label_mtime']):
+                unchanged += 1
+                continue
+            changed.append((rel, info, old.id if old is not None else None))
+
+        # 有图片或标签变化（含删除）时重新扫描全部标签，得到变化文件的框信息与最新的整体统计
+        if dataset.task_type != 'classify' and labels is None and (changed or existing or not dataset.label_stats):
+            labels = self._scan_labels(dataset, label_mtimes, names)
+        if labels is not None:
+            dataset.label_stats = json.dumps(self.label_scanner.summary(labels), ensure_ascii=False)
+        label_files = labels['files'] if labels is not None else {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='manifest') as executor:
+            rows = list(executor.map(
+                lambda item: self._probe(root, item[0], item[1], dataset.task_type, class_index, label_files),
+                changed
+            ))
+
+        inserts = []
+        updates = []
+        for (rel, info, file_id), row in zip(changed, rows):
+            old = existing_rows.get(rel)
+            if inventory is None and (old is None or (old.size, old.mtime) != (info['size'], info['mtime'])):
+                row['blob'] = None
+            if file_id is None:
+                inserts.append(dict(row, dataset_id=dataset.id))
+            else:
+                updates.append(dict(row, id=file_id))
+        for start in range(0, len(inserts), SQL_BATCH_SIZE):
+            db.session.execute(insert(DatasetFile), inserts[start:start + SQL_BATCH_SIZE])
+        for start in range(0, len(updates), SQL_BATCH_SIZE):
+            db.session.execute(update(DatasetFile), updates[start:start + SQL_BATCH_SIZE])
+        removed = [row.id for row in existing.values()]
+        for start in range(0, len(removed), SQL_BATCH_SIZE):
+            DatasetFile.query.filter(DatasetFile.id.in_(removed[start:start + SQL_BATCH_SIZE])).delete(
+                synchronize_session=False)
+
+        dataset.file_count = len(images)
+        return {'added': len(inserts), 'updated': len(updates), 'removed': len(removed), 'unchanged': unchanged}
+
+    @staticmethod
+    def exists(dataset_id):
+        return db.session.query(exists().where(DatasetFile.dataset_id == dataset_id)).scalar()
+
+    @staticmethod
+    def delete(dataset_id):
+        DatasetFile.query.filter_by(dataset_id=dataset_id).delete(synchronize_session=False)
+
+    @staticmethod
+    def class_filter(class_id):
+        """图片的类别编号列表包含 class_id"""
+        values = func.json_each(DatasetFile.class_ids).table_valued('value')
+        return exists(select(1).select_from(values).where(values.c.value == class_id))
+
+    @staticmethod
+    def summary(dataset_id):
+        """按划分统计图片数、大小、标注与框数量，以及各类别的图片数（全部在 SQL 中聚合）"""
+        by_split = {}
+        totals = {'images': 0, 'bytes': 0, 'labeled': 0, 'background': 0, 'boxes': 0, 'unreadable': 0}
+        for row in db.session.execute(
+            select(
+                DatasetFile.split, func.count().label('images'), func.sum(DatasetFile.size).label('bytes'),
+                func.count(DatasetFile.label_path).label('labeled'),
+                func.sum(case((DatasetFile.box_count == 0, 1), else_=0)).label('background'),
+                func.sum(DatasetFile.box_count).label('boxes'),
+                func.sum(case((DatasetFile.width.is_(None), 1), else_=0)).label('unreadable'),
+                func.min(DatasetFile.width).label('min_width'), func.max(DatasetFile.width).label('max_width'),
+                func.min(DatasetFile.height).label('min_height'), func.max(DatasetFile.height).label('max_height')
+            ).where(DatasetFile.dataset_id == dataset_id).group_by(DatasetFile.split)
+        ):
+            data = dict(row._mapping)
+            split = data.pop('split')
+            for key in totals:
+                data[key] = data[key] or 0
+                totals[key] += data[key]
+            by_split[split] = data
+
+        values = func.json_each(DatasetFile.class_ids).table_valued('value')
+        histogram = {}
+        for split, class_id, images in db.session.execute(
+            select(DatasetFile.split, values.c.value, func.count())
+            .select_from(DatasetFile).join(values, db.true())
+            .where(DatasetFile.dataset_id == dataset_id)
+            .group_by(DatasetFile.split, values.c.value)
+        ):
+            entry = histogram.setdefault(class_id, {'images': 0})
+            entry['images'] += images
+            entry[split] = images
+
+        sizes = [
+            {'width': w, 'height': h, 'count': c}
+            for w, h, c in db.session.execute(
+                select(DatasetFile.width, DatasetFile.height, func.count().label('count'))
+                .where(DatasetFile.dataset_id == dataset_id, DatasetFile.width.isnot(None))
+                .group_by(DatasetFile.width, DatasetFile.height)
+                .order_by(func.count().desc()).limit(20)
+            )
+        ]
+        return {
+            **totals,
+            'splits': by_split,
+            'classes': {str(k): histogram[k] for k in sorted(histogram)},
+            'image_sizes': sizes
+        }
@@ -0,0 +1,146 @@
+import os
+import io
+import time
+import hashlib
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+
+MIN_IMAGE_SIZE = 10  # ultralytics 要求图片宽高均大于 9 像素
+MAX_EXAMPLES = 20  # 每类问题在报告中保留的示例数
+
+# 标签扫描发现的问题行（ultralytics 会丢弃整张图片的标注）
+LABEL_ERRORS = ('unreadable', 'column_count', 'not_numeric', 'invalid_class', 'class_out_of_range',
+                'coords_out_of_range')
+
+MESSAGES = {
+    'corrupt_image': '图片损坏或无法解码',
+    'image_too_small': f'图片宽或高小于 {MIN_IMAGE_SIZE} 像素',
+    'no_train_images': '训练集没有图片',
+    'no_val_images': '验证集没有图片',
+    'no_labels': '训练集没有任何标注框',
+    'invalid_labels': '标签文件包含格式错误、类别越界或坐标超出 [0, 1] 的行',
+    'unlabeled_images': '图片没有对应的标签文件（按背景图训练）',
+    'orphan_labels': '标签文件没有对应的图片',
+    'duplicate_images': '同一划分内存在内容完全相同的图片',
+    'train_val_overlap': '训练集与验证集存在内容相同的图片'
+}
+
+
+def check_images(root, paths):
+    """校验一批图片（在进程池的工作进程中运行）：完整读取并计算内容哈希，PIL verify 检查文件结构，
+    JPEG 额外检查结束标记（截断的 JPEG 在训练中才会报错），返回 [(路径, 问题或 None, 哈希)]
+    """
+    results = []
+    for path in paths:
+        try:
+            with open(os.path.join(root, path), 'rb') as f:
+                data = f.read()
+        except OSError:
+            results.append((path, 'corrupt_image', None))
+            continue
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        problem = None
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                img.verify()
+                width, height = img.size
+                if img.format == 'JPEG' and not data.rstrip(b'\x00').endswith(b'\xff\xd9'):
+                    problem = 'corrupt_image'
+                elif width < MIN_IMAGE_SIZE or height < MIN_IMAGE_SIZE:
+                    problem = 'image_too_small'
+        except Exception:
+            problem = 'corrupt_image'
+        results.append((path, problem, digest))
+    return results
+
+
+class DatasetValidator:
+    """训练前的数据集完整性校验
+
+    在导入流程中生成清单之后运行：进程池并行校验每张图片并计算内容哈希，结合文件清单检查
+    图片与标签的对应关系，结合标签扫描报告检查标签内容，找出内容重复的图片。报告写入
+    Dataset.validation，status 为 failed（存在阻止训练的错误）、warning 或 passed。
+    """
+
+    def __init__(self, max_workers=None, batch_size=500, min_parallel_files=2000):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.min_parallel_files = min_parallel_files
+
+    def _check(self, root, paths):
+        batches = [paths[i:i + self.batch_size] for i in range(0, len(paths), self.batch_size)]
+        if len(paths) < self.min_parallel_files or self.max_workers <= 1:
+            return [item for batch in batches for item in check_images(root, batch)]
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, len(batches)), mp_context=ctx) as executor:
+            return [item for part in executor.map(check_images, [root] * len(batches), batches) for item in part]
+
+    def validate(self, dataset, labels=None):
+        """校验数据集（需已生成文件清单），返回报告；labels 为标签扫描报告（检测/分割任务）"""
+        # 数据库模块在这里导入：进程池的工作进程只导入本模块，不加载 Flask / SQLAlchemy
+        from sqlalchemy import select
+        from models import db, DatasetFile
+
+        started = time.time()
+        rows = db.session.execute(
+            select(DatasetFile.path, DatasetFile.split, DatasetFile.label_path, DatasetFile.box_count)
+            .where(DatasetFile.dataset_id == dataset.id)
+        ).all()
+        errors = {}
+        warnings = {}
+
+        def add(target, code, example=None, count=1):
+            entry = target.setdefault(code, {'code': code, 'message': MESSAGES[code], 'count': 0, 'examples': []})
+            entry['count'] += count
+            if example is not None and len(entry['examples']) < MAX_EXAMPLES:
+                entry['examples'].append(example)
+
+        # 图片解码与内容哈希
+        splits = {row.path: row.split for row in rows}
+        by_hash = {}
+        for path, problem, digest in self._check(dataset.path, [row.path for row in rows]):
+            if problem:
+                add(errors, problem, path)
+            if digest:
+                by_hash.setdefault(digest, []).append(path)
+        for paths in by_hash.values():
+            if len(paths) < 2:
+                continue
+            groups = {}
+            for path in paths:
+                groups.setdefault(splits[path], []).append(path)
+            for group in groups.values():
+                if len(group) > 1:
+                    add(warnings, 'duplicate_images', group, count=len(group) - 1)
+            if len(groups) > 1:
+                add(warnings, 'train_val_overlap', paths)
+
+        # 划分与标注
+        for split in ('train', 'val'):
+            if not any(row.split == split for row in rows):
+                add(errors, f'no_{split}_images')
+        if dataset.task_type != 'classify':
+            if not any(row.split == 'train' and row.box_count for row in rows):
+                add(errors, 'no_labels')
+            for row in rows:
+                if row.label_path is None:
+                    add(warnings, 'unlabeled_images', row.path)
+            if labels is not None:
+                paired = {row.label_path for row in rows if row.label_path}
+                for path in sorted(set(labels['files']) - paired):
+                    add(warnings, 'orphan_labels', path)
+                label_errors = sum(labels['issue_counts'].get(code, 0) for code in LABEL_ERRORS)
+                if label_errors:
+                    add(errors, 'invalid_labels', count=label_errors)
+                    errors['invalid_labels']['examples'] = labels['issues'][:MAX_EXAMPLES]
+
+        return {
+            'status': 'failed' if errors else 'warning' if warnings else 'passed',
+            'checked_images': len(rows),
+            'errors': list(errors.values()),
+            'warnings': list(warnings.values()),
+            'elapsed': round(time.time() - started, 2),
+            'validated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
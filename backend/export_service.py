@@ -0,0 +1,268 @@
+import os
+import shutil
+import json
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from ultralytics import YOLO
+
+# 导出引擎：引擎名 -> ultralytics export 参数
+EXPORT_ENGINES = {
+    'onnx': {'format': 'onnx', 'dynamic': True, 'simplify': True},
+    'openvino': {'format': 'openvino', 'dynamic': True},
+    'torchscript': {'format': 'torchscript'}
+}
+
+# INT8 训练后量化：需要用数据集 val 划分做校准，精度有损失，只在显式指定 engine 时使用
+QUANTIZE_ENGINES = {
+    'openvino-int8': {'format': 'openvino', 'int8': True}
+}
+
+# CPU 推理速度优先级（快 -> 慢），'pt' 为原始 PyTorch 权重
+ENGINE_PRIORITY = ['openvino', 'onnx', 'torchscript', 'pt']
+
+
+def path_size(path):
+    """文件或目录（如 OpenVINO 导出目录）的总大小"""
+    if os.path.isdir(path):
+        total = 0
+        for root, dirs, files in os.walk(path):
+            total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+        return total
+    return os.path.getsize(path)
+
+
+def remove_path(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+class ExportService:
+    """模型导出服务：将 .pt 权重转换为 CPU 上更快的推理引擎，导出产物与 .pt 放在同一目录"""
+
+    def __init__(self, app, model_cache=None, result_cache=None, max_workers=1):
+        self.app = app
+        self.model_cache = model_cache
+        self.result_cache = result_cache
+        # 导出本身很吃 CPU，默认串行执行
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def export_model(self, model_id, engines):
+        """为模型创建导出记录并在后台执行导出，返回导出记录列表"""
+        from models import db, Model, ModelArtifact
+
+        model = Model.query.get(model_id)
+        if not model:
+            raise ValueError(f'模型不存在: {model_id}')
+
+        artifacts = []
+        for engine in engines:
+            if engine not in EXPORT_ENGINES:
+                raise ValueError(f'不支持的导出引擎: {engine}')
+
+            artifact = ModelArtifact.query.filter_by(model_id=model_id, engine=engine).first()
+            if artifact and artifact.status in ('pending', 'exporting'):
+                # 已在导出队列中
+                artifacts.append(artifact)
+                continue
+            if not artifact:
+                artifact = ModelArtifact(model_id=model_id, engine=engine)
+                db.session.add(artifact)
+            artifact.status = 'pending'
+            artifact.error = None
+            artifacts.append(artifact)
+        db.session.commit()
+
+        for artifact in artifacts:
+            if artifact.status == 'pending':
+                self.executor.submit(self._run_export, artifact.id)
+        return artifacts
+
+    def _run_export(self, artifact_id):
+        """后台执行单个导出任务"""
+        from models import db, ModelArtifact
+
+        with self.app.app_context():
+            artifact = ModelArtifact.query.get(artifact_id)
+            if not artifact:
+                return
+            model = artifact.model
+            try:
+                if not model.weight_path or not os.path.exists(model.weight_path):
+                    raise Exception(f"Weight file does not exist: {model.weight_path}")
+
+                artifact.status = 'exporting'
+                db.session.commit()
+
+                img_size = self._model_img_size(model)
+
+                print(f"Exporting model {model.id} to {artifact.engine}...")
+                if artifact.path and self.model_cache is not None:
+                    self.model_cache.evict(artifact.path)
+                output_path = YOLO(model.weight_path).export(imgsz=img_size, **EXPORT_ENGINES[artifact.engine])
+
+                artifact.path = str(output_path)
+                artifact.size = path_size(artifact.path)
+                artifact.status = 'ready'
+                db.session.commit()
+                self._invalidate_results(model.id)
+                print(f"Model {model.id} exported to: {artifact.path}")
+            except Exception as e:
+                print(f"Export failed for model {model.id} ({artifact.engine}): {e}")
+                print(traceback.format_exc())
+                db.session.rollback()
+                artifact.status = 'failed'
+                artifact.error = str(e)
+                db.session.commit()
+
+    def quantize_model(self, model_id, fraction=1.0):
+        """为模型创建 INT8 量化记录并在后台执行量化与精度对比"""
+        from models import db, Model, ModelArtifact
+
+        model = Model.query.get(model_id)
+        if not model:
+            raise ValueError(f'模型不存在: {model_id}')
+        if self._model_data_path(model) is None:
+            raise ValueError('模型关联的数据集不存在，无法校准')
+
+        engine = 'openvino-int8'
+        artifact = ModelArtifact.query.filter_by(model_id=model_id, engine=engine).first()
+        if artifact and artifact.status in ('pending', 'exporting'):
+            return artifact
+        if not artifact:
+            artifact = ModelArtifact(model_id=model_id, engine=engine)
+            db.session.add(artifact)
+        artifact.status = 'pending'
+        artifact.error = None
+        db.session.commit()
+
+        self.executor.submit(self._run_quantize, artifact.id, fraction)
+        return artifact
+
+    def _run_quantize(self, artifact_id, fraction):
+        """后台执行 INT8 量化，并在 val 划分上对比 FP32 与 INT8 的精度和延迟"""
+        from models import db, ModelArtifact
+
+        with self.app.app_context():
+            artifact = ModelArtifact.query.get(artifact_id)
+            if not artifact:
+                return
+            model = artifact.model
+            try:
+                if not model.weight_path or not os.path.exists(model.weight_path):
+                    raise Exception(f"Weight file does not exist: {model.weight_path}")
+                data_path = self._model_data_path(model)
+                if data_path is None:
+                    raise Exception("Dataset for calibration does not exist")
+
+                artifact.status = 'exporting'
+                db.session.commit()
+
+                img_size = self._model_img_size(model)
+                print(f"Quantizing model {model.id} to INT8 with calibration data: {data_path}")
+                if artifact.path and self.model_cache is not None:
+                    self.model_cache.evict(artifact.path)
+                output_path = str(YOLO(model.weight_path).export(
+                    imgsz=img_size,
+                    data=data_path,
+                    fraction=fraction,
+                    **QUANTIZE_ENGINES[artifact.engine]
+                ))
+
+                # 在同一 val 划分上验证 FP32 与 INT8 模型
+                fp32 = self._validate(YOLO(model.weight_path), data_path, img_size)
+                int8 = self._validate(YOLO(output_path, task=model.task_type), data_path, img_size)
+                delta = {
+                    key: int8['metrics'][key] - fp32['metrics'][key]
+                    for key in fp32['metrics'] if key in int8['metrics']
+                }
+                report = {
+                    'engine': artifact.engine,
+                    'calibration_fraction': fraction,
+                    'fp32': fp32,
+                    'int8': int8,
+                    'metrics_delta': delta,
+                    'latency_delta_ms': int8['latency_ms'] - fp32['latency_ms'],
+                    'speedup': fp32['latency_ms'] / int8['latency_ms'] if int8['latency_ms'] else None
+                }
+
+                metrics_data = {}
+                if model.metrics:
+                    try:
+                        metrics_data = json.loads(model.metrics)
+                    except Exception:
+                        pass
+                metrics_data['quantization'] = report
+                model.metrics = json.dumps(metrics_data)
+
+                artifact.path = output_path
+                artifact.size = path_size(output_path)
+                artifact.status = 'ready'
+                db.session.commit()
+                self._invalidate_results(model.id)
+                print(f"Model {model.id} quantized to: {output_path} (speedup: {report['speedup']})")
+            except Exception as e:
+                print(f"Quantization failed for model {model.id}: {e}")
+                print(traceback.format_exc())
+                db.session.rollback()
+                artifact.status = 'failed'
+                artifact.error = str(e)
+                db.session.commit()
+
+    def _invalidate_results(self, model_id):
+        """导出产物更新后 auto 引擎可能切换，清除该模型的缓存推理结果"""
+        if self.result_cache is not None:
+            self.result_cache.invalidate_model(model_id)
+
+    @staticmethod
+    def _validate(yolo_model, data_path, img_size):
+        """在 val 划分上验证模型，返回精度指标与单张推理延迟"""
+        results = yolo_model.val(data=data_path, imgsz=img_size, split='val', batch=1, plots=False, verbose=False)
+        return {
+            'metrics': {k: float(v) for k, v in results.results_dict.items()},
+            'latency_ms': float(results.speed.get('inference', 0.0))
+        }
+
+    @staticmethod
+    def _model_img_size(model):
+        img_size = 640
+        if model.metrics:
+            try:
+                img_size = json.loads(model.metrics).get('img_size') or img_size
+            except Exception:
+                pass
+        return img_size
+
+    @staticmethod
+    def _model_data_path(model):
+        """模型训练所用数据集：分类任务为数据集目录，检测/分割为 data.yaml"""
+        task = model.training_task
+        if not task or not task.dataset or not os.path.exists(task.dataset.path):
+            return None
+        if model.task_type == 'classify':
+            return task.dataset.path.replace('\\', '/')
+        data_yaml = os.path.join(task.dataset.path, 'data.yaml')
+        return data_yaml.replace('\\', '/') if os.path.exists(data_yaml) else None
+
+    def resolve_engine(self, model, engine='auto'):
+        """选择推理使用的权重：auto 时取最快的可用导出产物，不可用时回退到 .pt，返回 (路径, 引擎名)"""
+        ready = {
+            a.engine: a.path for a in model.artifacts
+            if a.status == 'ready' and a.path and os.path.exists(a.path)
+        }
+        if engine == 'auto':
+            for candidate in ENGINE_PRIORITY:
+                if candidate in ready:
+                    return ready[candidate], candidate
+        elif engine in ready:
+            return ready[engine], engine
+        return model.weight_path, 'pt'
+
+    def delete_artifacts(self, model):
+        """删除模型的所有导出文件"""
+        for artifact in model.artifacts:
+            if artifact.path:
+                if self.model_cache is not None:
+                    self.model_cache.evict(artifact.path)
+                remove_path(artifact.path)
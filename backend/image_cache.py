@@ -0,0 +1,332 @@
+import os
+import json
+import math
+import time
+import shutil
+import hashlib
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import yaml
+from sqlalchemy import select
+from models import db, DatasetFile
+
+MARKER = 'cache.json'  # 缓存条目构建完成的标记，mtime 记录最近使用时间
+
+
+def _try_lock(f):
+    """对已打开的文件加非阻塞独占锁，进程退出时由系统释放；已被其他进程持有时返回 False"""
+    try:
+        if os.name == 'nt':
+            import msvcrt
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+class ImageCacheManager:
+    """训练图片预处理缓存（按数据集与 img_size 共享）
+
+    每个缓存条目是一个可直接训练的数据集目录：图片与标签以硬链接指向原数据集（跨文件系统时复制），
+    每张图片旁放一份按 ultralytics load_image 相同规则（长边缩放到 img_size，INTER_LINEAR）
+    缩放后的 .npy 数组。ultralytics 只要图片旁存在 .npy 就直接加载（不比较修改时间），
+    训练时不再解码 JPEG 与缩放。
+
+    .npy 不会随图片失效：条目一经构建不再修改，目录名包含数据集清单的指纹，数据集变化并刷新清单后
+    使用新条目，旧条目在空闲时删除。原地修改数据集文件后需刷新清单，否则仍会使用旧条目。
+    总大小超过 max_bytes 时按最近使用时间淘汰未被训练引用的条目。
+    """
+
+    def __init__(self, cache_dir, max_bytes=20 * 1024 ** 3, max_workers=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self._lock = threading.Lock()
+        self._refs = {}      # 条目名 -> 引用的训练数
+        self._building = {}  # 条目名 -> threading.Event
+        self._trash = []     # 已改名、待删除的目录
+        self.hits = 0
+        self.misses = 0
+        self._started = False
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def start(self):
+        """服务进程启动后首次调用（幂等）：清理遗留目录"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self.cleanup()
+
+    def cleanup(self):
+        """清理异常退出遗留的构建与删除目录（仅在服务进程启动时调用）
+
+        构建期间 <条目>.building.lock 被构建进程锁定，能拿到锁说明构建进程已退出；
+        其他进程正在进行的构建不会被删除。
+        """
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith('.deleting'):
+                shutil.rmtree(path, ignore_errors=True)
+            elif name.endswith('.building.lock'):
+                try:
+                    lock = open(path, 'a+b')
+                except OSError:
+                    continue
+                with lock:
+                    if not _try_lock(lock):
+                        continue
+                    shutil.rmtree(path[:-len('.lock')], ignore_errors=True)
+                    if os.name != 'nt':
+                        os.remove(path)
+                if os.name == 'nt':
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            elif name.endswith('.building') and not os.path.exists(path + '.lock'):
+                shutil.rmtree(path, ignore_errors=True)
+
+    @staticmethod
+    def _resized_shape(width, height, img_size):
+        """与 ultralytics BaseDataset.load_image（rect_mode）相同的缩放尺寸"""
+        r = img_size / max(width, height)
+        if r == 1:
+            return width, height
+        return min(math.ceil(width * r), img_size), min(math.ceil(height * r), img_size)
+
+    def _entries(self):
+        """已完成的条目：[(名称, 数据集 ID, 大小, 最近使用时间)]"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(('.building', '.deleting')):
+                continue
+            marker = os.path.join(self.cache_dir, name, MARKER)
+            try:
+                with open(marker, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                entries.append((name, meta['dataset_id'], meta['bytes'], os.path.getmtime(marker)))
+            except (OSError, ValueError, KeyError):
+                continue
+        return entries
+
+    def _remove(self, name):
+        """条目改名后不再可用（调用方持有 _lock），目录由 _purge 在锁外删除"""
+        path = os.path.join(self.cache_dir, name)
+        trash = path + '.deleting'
+        try:
+            os.rename(path, trash)
+        except OSError:
+            return
+        self._trash.append(trash)
+        print(f"Image cache entry removed: {name}")
+
+    def _purge(self):
+        with self._lock:
+            trash, self._trash = self._trash, []
+        for path in trash:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _make_room(self, needed):
+        """淘汰空闲条目直到能放下 needed 字节（调用方持有 _lock），返回是否成功"""
+        entries = self._entries()
+        total = sum(size for _, _, size, _ in entries)
+        for name, _, size, _ in sorted(entries, key=lambda e: e[3]):
+            if total + needed <= self.max_bytes:
+                break
+            if self._refs.get(name) or name in self._building:
+                continue
+            self._remove(name)
+            total -= size
+        return total + needed <= self.max_bytes
+
+    @staticmethod
+    def fingerprint(dataset_id, dataset_path):
+        """由文件清单（路径、大小、mtime）与类别配置计算数据集指纹，不访问图片文件"""
+        digest = hashlib.sha1()
+        for row in db.session.execute(
+            select(DatasetFile.path, DatasetFile.size, DatasetFile.mtime, DatasetFile.label_mtime)
+            .where(DatasetFile.dataset_id == dataset_id).order_by(DatasetFile.path)
+        ):
+            digest.update(repr(tuple(row)).encode('utf-8'))
+        try:
+            with open(os.path.join(dataset_path, 'data.yaml'), 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            pass
+        return digest.hexdigest()[:16]
+
+    def acquire(self, dataset_id, dataset_path, img_size):
+        """获取（必要时构建）数据集在 img_size 下的缓存目录并增加引用；无法缓存时返回 None
+
+        返回的目录包含 data.yaml，可直接作为训练的数据集路径；训练结束后调用 release。
+        需在 app context 中调用，读取清单后即释放 session，构建期间不持有数据库连接。
+        """
+        try:
+            rows = db.session.execute(
+                select(DatasetFile.path, DatasetFile.label_path, DatasetFile.width, DatasetFile.height)
+                .where(DatasetFile.dataset_id == dataset_id)
+            ).all()
+            fingerprint = self.fingerprint(dataset_id, dataset_path) if rows else None
+        finally:
+            db.session.remove()
+        if not rows or any(row.width is None for row in rows):
+            return None
+        name = f'{dataset_id}_{fingerprint}_{img_size}'
+        path = os.path.join(self.cache_dir, name)
+        try:
+            return self._acquire(name, path, dataset_id, dataset_path, rows, img_size)
+        finally:
+            self._purge()
+
+    def _acquire(self, name, path, dataset_id, dataset_path, rows, img_size):
+        while True:
+            with self._lock:
+                event = self._building.get(name)
+                if event is None:
+                    if os.path.exists(os.path.join(path, MARKER)):
+                        self._refs[name] = self._refs.get(name, 0) + 1
+                        self.hits += 1
+                        os.utime(os.path.join(path, MARKER))
+                        return path
+                    estimate = sum(3 * w * h for w, h in (
+                        self._resized_shape(row.width, row.height, img_size) for row in rows
+                    ))
+                    # 同一数据集旧版本（指纹不同）的条目已失效
+                    fingerprint = name.split('_')[1]
+                    for entry, entry_dataset, _, _ in self._entries():
+                        if entry_dataset == dataset_id and entry.split('_')[1] != fingerprint \
+                                and not self._refs.get(entry):
+                            self._remove(entry)
+                    if not self._make_room(estimate):
+                        print(f"Image cache skipped for dataset {dataset_id}: "
+                              f"{estimate / 1024 ** 3:.1f}GB exceeds the cache budget")
+                        return None
+                    self.misses += 1
+                    event = self._building[name] = threading.Event()
+                    break
+            # 其他训练正在构建同一条目，等待完成后复用
+            event.wait()
+
+        # 构建锁：其他进程（多个服务进程共用缓存目录时）正在构建同一条目则本次不使用缓存
+        lock_path = path + '.building.lock'
+        built = False
+        with open(lock_path, 'a+b') as lock:
+            owned = _try_lock(lock)
+            if not owned:
+                print(f"Image cache for dataset {dataset_id} is being built by another process, skipped")
+            else:
+                try:
+                    self._build(dataset_id, dataset_path, rows, img_size, path)
+                    built = True
+                except Exception as e:
+                    print(f"Failed to build image cache for dataset {dataset_id}: {e}")
+                    shutil.rmtree(path + '.building', ignore_errors=True)
+                if os.name != 'nt':
+                    os.remove(lock_path)  # 持有锁时删除，其他进程不会在删除前后拿到同一把锁
+        if owned and os.name == 'nt':
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+        if not built:
+            with self._lock:
+                self._building.pop(name).set()
+            return None
+        with self._lock:
+            self._building.pop(name).set()
+            self._refs[name] = self._refs.get(name, 0) + 1
+        return path
+
+    def release(self, path):
+        """训练结束，释放对缓存目录的引用"""
+        name = os.path.basename(path)
+        with self._lock:
+            if self._refs.get(name, 0) <= 1:
+                self._refs.pop(name, None)
+            else:
+                self._refs[name] -= 1
+            marker = os.path.join(path, MARKER)
+            if os.path.exists(marker):
+                os.utime(marker)
+            self._make_room(0)
+        self._purge()
+
+    def invalidate(self, dataset_id):
+        """删除数据集的全部空闲缓存条目（数据集删除时调用）"""
+        with self._lock:
+            for name, entry_dataset, _, _ in self._entries():
+                if entry_dataset == dataset_id and not self._refs.get(name):
+                    self._remove(name)
+        self._purge()
+
+    def _build(self, dataset_id, root, rows, img_size, path):
+        """在 <条目>.building 中并行链接文件、生成 .npy，完成后改名为正式条目"""
+        import cv2
+        import numpy as np
+        from ultralytics.utils.patches import imread
+
+        started = time.time()
+        building = path + '.building'
+        shutil.rmtree(building, ignore_errors=True)
+
+        def link(rel):
+            src = os.path.join(root, rel)
+            dst = os.path.join(building, rel)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+
+        def prepare(row):
+            link(row.path)
+            if row.label_path:
+                link(row.label_path)
+            im = imread(os.path.join(root, row.path))
+            if im is None:
+                return 0
+            h0, w0 = im.shape[:2]
+            w, h = self._resized_shape(w0, h0, img_size)
+            if (w, h) != (w0, h0):
+                im = cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
+            npy = os.path.splitext(os.path.join(building, row.path))[0] + '.npy'
+            np.save(npy, im, allow_pickle=False)
+            return os.path.getsize(npy)
+
+        print(f"Building image cache for dataset {dataset_id} (img_size={img_size}, {len(rows)} images)")
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='image-cache') as executor:
+            total = sum(executor.map(prepare, rows))
+
+        with open(os.path.join(root, 'data.yaml'), 'r', encoding='utf-8') as f:
+            data_config = yaml.safe_load(f) or {}
+        data_config['path'] = path.replace('\\', '/')
+        with open(os.path.join(building, 'data.yaml'), 'w', encoding='utf-8') as f:
+            yaml.dump(data_config, f, allow_unicode=True)
+        with open(os.path.join(building, MARKER), 'w', encoding='utf-8') as f:
+            json.dump({
+                'dataset_id': dataset_id,
+                'img_size': img_size,
+                'images': len(rows),
+                'bytes': total,
+                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }, f)
+        os.rename(building, path)
+        print(f"Image cache for dataset {dataset_id} ready: {total / 1024 ** 2:.1f}MB in {time.time() - started:.1f}s")
+
+    def stats(self):
+        with self._lock:
+            entries = self._entries()
+            return {
+                'entries': len(entries),
+                'bytes': sum(size for _, _, size, _ in entries),
+                'max_bytes': self.max_bytes,
+                'in_use': {name: count for name, count in self._refs.items()},
+                'building': list(self._building),
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -0,0 +1,140 @@
+import os
+import time
+import threading
+from collections import deque
+
+
+class _PendingRequest:
+    """等待批处理的单个推理请求"""
+
+    def __init__(self, img):
+        self.img = img
+        self.enqueued_at = time.time()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class InferenceScheduler:
+    """动态微批推理调度器
+
+    将相同 (模型, imgsz, conf, iou) 的并发请求在 window_ms 时间窗口内合并
+    （或达到 max_batch_size 立即发出），一次批量前向推理后再把结果分发回各请求。
+    每个模型一个工作线程，同一模型的推理天然串行，不与其他请求争用 predictor。
+    """
+
+    def __init__(self, model_cache, window_ms=10, max_batch_size=8, idle_timeout=60):
+        self.model_cache = model_cache
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.idle_timeout = idle_timeout
+        self._cond = threading.Condition()
+        self._queues = {}   # weight_path -> {(imgsz, conf, iou): [request, ...]}
+        self._workers = {}  # weight_path -> Thread
+        self._tasks = {}    # weight_path -> task_type（导出引擎加载时需要）
+
+        # 统计信息
+        self.total_requests = 0
+        self.total_batches = 0
+        self.max_queue_depth = 0
+        self.batch_size_hist = {}
+        self._wait_samples = deque(maxlen=2000)
+
+    def predict(self, weight_path, img, conf=0.25, iou=0.45, imgsz=None, task=None):
+        """提交单张图片并阻塞等待结果，返回 ultralytics Results 对象"""
+        path = os.path.abspath(weight_path)
+        request = _PendingRequest(img)
+        with self._cond:
+            self._tasks[path] = task
+            buckets = self._queues.setdefault(path, {})
+            buckets.setdefault((imgsz, conf, iou), []).append(request)
+            self.total_requests += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._queue_depth())
+            if path not in self._workers:
+                worker = threading.Thread(target=self._worker_loop, args=(path,), daemon=True)
+                self._workers[path] = worker
+                worker.start()
+            self._cond.notify_all()
+
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _queue_depth(self):
+        return sum(len(reqs) for buckets in self._queues.values() for reqs in buckets.values())
+
+    def _next_batch(self, path):
+        """取出下一批请求：优先最早入队的分组，等待窗口结束或批次已满"""
+        with self._cond:
+            idle_since = time.time()
+            while True:
+                buckets = self._queues.get(path)
+                if buckets:
+                    params, reqs = min(buckets.items(), key=lambda item: item[1][0].enqueued_at)
+                    deadline = reqs[0].enqueued_at + self.window
+                    now = time.time()
+                    if len(reqs) >= self.max_batch_size or now >= deadline:
+                        batch = reqs[:self.max_batch_size]
+                        del reqs[:self.max_batch_size]
+                        if not reqs:
+                            del buckets[params]
+                        return params, batch
+                    self._cond.wait(deadline - now)
+                else:
+                    if time.time() - idle_since >= self.idle_timeout:
+                        # 长时间空闲，退出线程
+                        self._queues.pop(path, None)
+                        self._workers.pop(path, None)
+                        self._tasks.pop(path, None)
+                        return None, None
+                    self._cond.wait(self.idle_timeout)
+
+    def _worker_loop(self, path):
+        while True:
+            params, batch = self._next_batch(path)
+            if batch is None:
+                return
+            imgsz, conf, iou = params
+            started = time.time()
+            try:
+                model = self.model_cache.get(path, task=self._tasks.get(path))
+                kwargs = {'conf': conf, 'iou': iou, 'verbose': False}
+                if imgsz:
+                    kwargs['imgsz'] = imgsz
+                with self.model_cache.model_lock(path):
+                    results = model.predict([r.img for r in batch], **kwargs)
+                for request, result in zip(batch, results):
+                    request.result = result
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+            finally:
+                with self._cond:
+                    self.total_batches += 1
+                    size = len(batch)
+                    self.batch_size_hist[size] = self.batch_size_hist.get(size, 0) + 1
+                    for request in batch:
+                        self._wait_samples.append(started - request.enqueued_at)
+                for request in batch:
+                    request.done.set()
+
+    def stats(self):
+        with self._cond:
+            waits = sorted(self._wait_samples)
+            p50 = waits[len(waits) // 2] if waits else 0.0
+            p99 = waits[min(len(waits) - 1, int(len(waits) * 0.99))] if waits else 0.0
+            processed = sum(size * count for size, count in self.batch_size_hist.items())
+            return {
+                'window_ms': self.window * 1000,
+                'max_batch_size': self.max_batch_size,
+                'queue_depth': self._queue_depth(),
+                'max_queue_depth': self.max_queue_depth,
+                'active_workers': len(self._workers),
+                'total_requests': self.total_requests,
+                'total_batches': self.total_batches,
+                'avg_batch_size': processed / self.total_batches if self.total_batches else 0.0,
+                'batch_size_hist': {str(k): v for k, v in sorted(self.batch_size_hist.items())},
+                'queue_wait_p50_ms': round(p50 * 1000, 2),
+                'queue_wait_p99_ms': round(p99 * 1000, 2)
+            }
@@ -0,0 +1,129 @@
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff')
+
+# 结果图片编码格式：格式名 -> (扩展名, MIME 类型, 质量参数)
+IMAGE_FORMATS = {
+    'jpeg': ('.jpg', 'image/jpeg', cv2.IMWRITE_JPEG_QUALITY),
+    'webp': ('.webp', 'image/webp', cv2.IMWRITE_WEBP_QUALITY),
+    'png': ('.png', 'image/png', None)
+}
+
+
+def decode_image(image_bytes):
+    """将上传的图片字节解码为 BGR 数组，无效图片返回 None"""
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+
+def class_names_array(names):
+    """将 ultralytics 的 {id: name} 映射预先转换为按 id 索引的数组"""
+    arr = np.empty(max(names) + 1 if names else 0, dtype=object)
+    for idx, name in names.items():
+        arr[idx] = name
+    return arr
+
+
+def mask_to_rle(mask):
+    """二值掩码转为 COCO 风格的未压缩 RLE（列优先，从 0 值开始计数）"""
+    flat = np.asarray(mask, dtype=bool).ravel(order='F')
+    change = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    bounds = np.concatenate(([0], change, [flat.size]))
+    counts = np.diff(bounds)
+    if flat.size and flat[0]:
+        counts = np.concatenate(([0], counts))
+    return {'size': [int(mask.shape[0]), int(mask.shape[1])], 'counts': counts.tolist()}
+
+
+def _extract_masks(result, mask_format):
+    """提取分割掩码：polygon 为原图坐标的多边形，rle 为原图尺寸的 RLE"""
+    masks = getattr(result, 'masks', None)
+    if masks is None or mask_format == 'none':
+        return None
+    polygons = masks.xy
+    if mask_format == 'rle':
+        height, width = result.orig_shape
+        rles = []
+        for polygon in polygons:
+            canvas = np.zeros((height, width), dtype=np.uint8)
+            if len(polygon):
+                cv2.fillPoly(canvas, [np.round(polygon).astype(np.int32)], 1)
+            rles.append(mask_to_rle(canvas))
+        return rles
+    return [np.round(polygon, 1).tolist() for polygon in polygons]
+
+
+def extract_detections(result, task_type, names_array=None, mask_format='polygon'):
+    """从 ultralytics 推理结果中提取检测信息（不做任何绘制）
+
+    每个结果只做一次整张量到 NumPy 的拷贝，类别名通过预先构建的数组映射。
+    同一模型多次调用时可传入 class_names_array(result.names) 避免重复构建。
+    """
+    if names_array is None:
+        names_array = class_names_array(result.names)
+
+    if task_type == 'classify':
+        # 分类任务：返回 top5
+        if getattr(result, 'probs', None) is None:
+            return []
+        probs = result.probs.data.cpu().numpy()
+        top5_idx = probs.argsort()[::-1][:5]
+        return [
+            {'class': name, 'confidence': conf, 'bbox': None}
+            for name, conf in zip(names_array[top5_idx].tolist(), probs[top5_idx].astype(float).tolist())
+        ]
+
+    if task_type not in ['detect', 'segment']:
+        return []
+
+    # 检测/分割任务
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return []
+
+    xyxy = boxes.xyxy.cpu().numpy().astype(float).tolist()
+    confs = boxes.conf.cpu().numpy().astype(float).tolist()
+    class_names = names_array[boxes.cls.cpu().numpy().astype(np.int64)].tolist()
+
+    detections = [
+        {'class': name, 'confidence': conf, 'bbox': bbox}
+        for name, conf, bbox in zip(class_names, confs, xyxy)
+    ]
+
+    if task_type == 'segment':
+        segments = _extract_masks(result, mask_format)
+        if segments is not None:
+            for detection, segment in zip(detections, segments):
+                detection['segmentation'] = segment
+
+    return detections
+
+
+def render_result(result, task_type, img, detections):
+    """绘制标注后的结果图片"""
+    if task_type == 'classify':
+        # 分类任务只显示原图+文字
+        if not detections:
+            return img
+        annotated_img = img.copy()
+        top = detections[0]
+        cv2.putText(annotated_img, f"{top['class']}: {top['confidence']:.2f}",
+                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        return annotated_img
+
+    # 检测/分割及未知任务类型使用 ultralytics 默认绘制
+    return result.plot()
+
+
+def encode_image(img, fmt='jpeg', quality=95):
+    """按指定格式编码图片，返回 (字节, MIME 类型)"""
+    fmt = 'jpeg' if fmt == 'jpg' else fmt
+    if fmt not in IMAGE_FORMATS:
+        raise ValueError(f'不支持的图片格式: {fmt}')
+    ext, mimetype, quality_flag = IMAGE_FORMATS[fmt]
+    params = [int(quality_flag), int(quality)] if quality_flag is not None else []
+    ok, buffer = cv2.imencode(ext, img, params)
+    if not ok:
+        raise ValueError('图片编码失败')
+    return buffer.tobytes(), mimetype
@@ -0,0 +1,233 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# 框边长（sqrt(w*h)，归一化）与宽高比 w/h 的直方图分桶
+SIZE_BINS = (0.0, 0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0)
+ASPECT_BINS = (0.0, 0.125, 0.25, 0.5, 0.8, 1.25, 2.0, 4.0, 8.0, np.inf)
+MAX_ISSUE_EXAMPLES = 100  # 报告中保留的问题行示例数
+MAX_CLASSES = 5000  # 未指定类别数时允许的类别编号上限，超出的行按 class_out_of_range 报告
+
+
+def _parse_rows(text, segment):
+    """解析一个标签文件（bytes），返回 (有效行 [N, 5] 的 class/cx/cy/w/h, 各有效行的行号, 问题列表 [(行号, 原因)])
+
+    先按空白切分并检查每行的列数（检测 5 列，分割 1 + 偶数个且至少 3 个点），只有列数正确的行才转换为
+    浮点数；检测标签每行都是 5 列时整个文件一次转换，含多边形或异常行时逐行转换。
+    不使用 np.fromstring：numpy 1.x 遇到非数字时只截断并给出警告，不会报错。
+    """
+    lines = text.splitlines()
+    tokens = [line.split() for line in lines]
+    numbers = [n for n, columns in enumerate(tokens, start=1) if columns]
+    if not segment and all(len(columns) in (0, 5) for columns in tokens):
+        try:
+            values = np.array([value for columns in tokens for value in columns], dtype=float)
+            return values.reshape(-1, 5), numbers, []
+        except ValueError:
+            pass
+
+    rows = []
+    kept = []
+    issues = []
+    for number in numbers:
+        columns = tokens[number - 1]
+        count = len(columns)
+        if count != 5 and not (segment and count >= 7 and count % 2 == 1):
+            issues.append((number, 'column_count'))
+            continue
+        try:
+            values = np.array(columns, dtype=float)
+        except ValueError:
+            issues.append((number, 'not_numeric'))
+            continue
+        kept.append(number)
+        if count == 5:
+            rows.append(values)
+            continue
+        # 多边形：越界坐标单独报告后截断，用外接框统计尺寸
+        points = values[1:]
+        if ((points < 0) | (points > 1)).any():
+            issues.append((number, 'coords_out_of_range'))
+            points = np.clip(points, 0, 1)
+        xs, ys = points[0::2], points[1::2]
+        x0, x1, y0, y1 = xs.min(), xs.max(), ys.min(), ys.max()
+        rows.append(np.array([values[0], (x0 + x1) / 2, (y0 + y1) / 2, x1 - x0, y1 - y0]))
+    return (np.vstack(rows) if rows else np.empty((0, 5))), kept, issues
+
+
+def scan_files(root, paths, segment=False, nc=MAX_CLASSES):
+    """扫描一批标签文件（在进程池的工作进程中运行），返回部分结果，由 LabelScanner 合并
+
+    逐文件只做读取与解析，类别计数、范围检查与直方图在整批拼接后的数组上一次完成。
+    类别编号不小于 nc 的行报告为 class_out_of_range，不计入统计；类别计数用 np.unique，
+    内存只与实际出现的类别数有关。
+    """
+    files = {}
+    issue_counts = {}
+    issues = []
+    empty = 0
+    owners = []   # 有框的文件
+    blocks = []   # 对应的 [N, 5] 数组
+    numbers = []  # 对应的有效行行号
+
+    def report(path, line, reason):
+        issue_counts[reason] = issue_counts.get(reason, 0) + 1
+        if len(issues) < MAX_ISSUE_EXAMPLES:
+            issues.append({'file': path, 'line': line, 'reason': reason})
+
+    for path in paths:
+        try:
+            with open(os.path.join(root, path), 'rb') as f:
+                text = f.read()
+        except OSError:
+            report(path, 0, 'unreadable')
+            files[path] = (0, [])
+            continue
+        rows, kept, bad = _parse_rows(text, segment)
+        for line, reason in bad:
+            report(path, line, reason)
+        if len(rows):
+            owners.append(path)
+            blocks.append(rows)
+            numbers.append(kept)
+        else:
+            files[path] = (0, [])
+            if not bad:
+                empty += 1
+
+    class_counts = {}
+    class_images = {}
+    sizes = aspects = np.empty(0)
+    if blocks:
+        rows = np.concatenate(blocks)
+        lengths = np.array([len(b) for b in blocks])
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        owner = np.repeat(np.arange(len(blocks)), lengths)
+
+        cls = rows[:, 0]
+        xywh = rows[:, 1:]
+        valid = np.isfinite(cls) & (cls == np.floor(cls)) & (cls >= 0)
+        coords_bad = ~np.isfinite(xywh).all(axis=1) | ((xywh < 0) | (xywh > 1)).any(axis=1) \
+            | (xywh[:, 2] <= 0) | (xywh[:, 3] <= 0)
+        out_of_range = valid & (cls >= nc)
+        # 问题行通常很少，只对它们逐行生成报告
+        for index in np.flatnonzero(~valid | out_of_range | (valid & coords_bad)):
+            block = owner[index]
+            line = numbers[block][index - offsets[block]]
+            if not valid[index]:
+                report(owners[block], line, 'invalid_class')
+                continue
+            if out_of_range[index]:
+                report(owners[block], line, 'class_out_of_range')
+            if coords_bad[index]:
+                report(owners[block], line, 'coords_out_of_range')
+
+        counted = valid & ~out_of_range
+        ids = cls[counted].astype(np.int64)
+        own = owner[counted]
+        classes, counts = np.unique(ids, return_counts=True)
+        class_counts = dict(zip(classes.tolist(), counts.tolist()))
+        # (文件, 类别) 去重后得到每个文件的类别集合与每类出现的图片数（ids < nc，编码不会溢出）
+        pairs = np.unique(own * nc + ids)
+        pair_owner, pair_class = np.divmod(pairs, nc)
+        classes, counts = np.unique(pair_class, return_counts=True)
+        class_images = dict(zip(classes.tolist(), counts.tolist()))
+        boxes = np.bincount(own, minlength=len(blocks))
+        bounds = np.searchsorted(pair_owner, np.arange(len(blocks) + 1))
+        pair_class = pair_class.tolist()
+        for block, path in enumerate(owners):
+            files[path] = (int(boxes[block]), pair_class[bounds[block]:bounds[block + 1]])
+
+        good = xywh[valid & ~coords_bad]
+        sizes = np.sqrt(good[:, 2] * good[:, 3])
+        aspects = good[:, 2] / good[:, 3]
+
+    return {
+        'files': files,
+        'class_counts': class_counts,
+        'class_images': class_images,
+        'size_hist': np.histogram(sizes, bins=SIZE_BINS)[0],
+        'aspect_hist': np.histogram(aspects, bins=ASPECT_BINS)[0],
+        'issue_counts': issue_counts,
+        'issues': issues,
+        'empty': empty
+    }
+
+
+class LabelScanner:
+    """YOLO 标签全量扫描
+
+    按批分发到进程池（spawn），每个文件整体转为 NumPy 数组后向量化统计：精确的类别集合、
+    每类实例数与出现的图片数、框尺寸/宽高比直方图、格式错误与越界行。文件数较少时在当前进程
+    内扫描，避免启动进程的开销。
+    """
+
+    def __init__(self, max_workers=None, batch_size=2000, min_parallel_files=5000, max_classes=MAX_CLASSES):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.min_parallel_files = min_parallel_files
+        self.max_classes = max_classes
+
+    def scan(self, root, paths, task_type='detect', nc=None):
+        """扫描 root 下的标签文件（相对路径），返回报告；report['files'] 为 {路径: (框数量, 类别编号列表)}
+
+        nc 为已知的类别数；未指定时（导入时由扫描结果推断类别数）以 max_classes 为上限。
+        """
+        paths = list(paths)
+        nc = nc or self.max_classes
+        segment = task_type == 'segment'
+        batches = [paths[i:i + self.batch_size] for i in range(0, len(paths), self.batch_size)]
+        if len(paths) < self.min_parallel_files or self.max_workers <= 1:
+            parts = [scan_files(root, batch, segment, nc) for batch in batches]
+        else:
+            ctx = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(batches)), mp_context=ctx) as executor:
+                parts = list(executor.map(scan_files, [root] * len(batches), batches,
+                                          [segment] * len(batches), [nc] * len(batches)))
+        return self._merge(parts, len(paths))
+
+    @staticmethod
+    def _merge(parts, file_count):
+        files = {}
+        class_counts = {}
+        class_images = {}
+        size_hist = np.zeros(len(SIZE_BINS) - 1, dtype=np.int64)
+        aspect_hist = np.zeros(len(ASPECT_BINS) - 1, dtype=np.int64)
+        issue_counts = {}
+        issues = []
+        empty = 0
+        for part in parts:
+            files.update(part['files'])
+            for c, count in part['class_counts'].items():
+                class_counts[c] = class_counts.get(c, 0) + count
+            for c, count in part['class_images'].items():
+                class_images[c] = class_images.get(c, 0) + count
+            size_hist += part['size_hist']
+            aspect_hist += part['aspect_hist']
+            for reason, count in part['issue_counts'].items():
+                issue_counts[reason] = issue_counts.get(reason, 0) + count
+            issues.extend(part['issues'][:MAX_ISSUE_EXAMPLES - len(issues)])
+            empty += part['empty']
+
+        classes = sorted(class_counts)
+        return {
+            'files': files,
+            'label_files': file_count,
+            'empty_files': empty,
+            'boxes': sum(class_counts.values()),
+            'classes': classes,
+            'nc': classes[-1] + 1 if classes else 0,
+            'class_instances': {str(c): class_counts[c] for c in classes},
+            'class_images': {str(c): class_images[c] for c in classes},
+            'box_size_hist': {'bins': list(SIZE_BINS), 'counts': size_hist.tolist()},
+            'aspect_ratio_hist': {'bins': [b if np.isfinite(b) else None for b in ASPECT_BINS],
+                                  'counts': aspect_hist.tolist()},
+            'issue_counts': issue_counts,
+            'issues': issues
+        }
+
+    @staticmethod
+    def summary(report):
+        """去掉逐文件结果，得到可存库的统计报告"""
+        return {k: v for k, v in report.items() if k != 'files'}
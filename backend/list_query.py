@@ -0,0 +1,122 @@
+import json
+from datetime import datetime
+from flask import request, jsonify
+from sqlalchemy.orm import load_only, joinedload, selectinload
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def parse_fields(model_cls):
+    """解析 ?fields= 投影字段；未指定时返回除大字段外的全部字段，含未知字段时抛出 ValueError"""
+    columns = [attr.key for attr in model_cls.__mapper__.column_attrs]
+    allowed = columns + list(getattr(model_cls, 'EXTRA_FIELDS', {}))
+    raw = request.args.get('fields')
+    if not raw:
+        heavy = getattr(model_cls, 'HEAVY_FIELDS', ())
+        return [f for f in allowed if f not in heavy]
+
+    fields = []
+    for field in raw.split(','):
+        field = field.strip()
+        if not field or field in fields:
+            continue
+        if field not in allowed:
+            raise ValueError(f'未知字段: {field}')
+        fields.append(field)
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return fields
+
+
+def build_query(model_cls, fields, filters=()):
+    """只加载投影需要的列，关联字段一次性预加载（避免逐行查询），并应用 ?<列名>=a,b 过滤"""
+    mapper = model_cls.__mapper__
+    columns = {'id'}
+    options = []
+    for field in fields:
+        relation = getattr(model_cls, 'EXTRA_FIELDS', {}).get(field)
+        if relation is None:
+            columns.add(field)
+            continue
+        prop = mapper.relationships[relation]
+        # 多对一关联需要外键列
+        columns.update(column.key for column in prop.local_columns if column.key in mapper.columns)
+        loader = selectinload if prop.uselist else joinedload
+        option = loader(getattr(model_cls, relation))
+        # 关联对象只加载白名单中的列（如任务列表只需数据集名称，不加载其统计与校验报告）
+        relation_columns = getattr(model_cls, 'RELATION_COLUMNS', {}).get(relation)
+        if relation_columns:
+            option = option.load_only(*[getattr(prop.mapper.class_, c) for c in relation_columns])
+        options.append(option)
+
+    query = model_cls.query.options(load_only(*[getattr(model_cls, c) for c in sorted(columns)]), *options)
+
+    for name in filters:
+        raw = request.args.get(name)
+        if not raw:
+            continue
+        column = getattr(model_cls, name)
+        python_type = column.type.python_type
+        try:
+            values = [python_type(v) for v in raw.split(',') if v]
+        except ValueError:
+            raise ValueError(f'参数 {name} 格式错误')
+        query = query.filter(column.in_(values))
+    return query
+
+
+def paginate(query, model_cls, default_limit=DEFAULT_PAGE_SIZE):
+    """按 id 倒序的 keyset 分页：?cursor=<上一页最后一条的 id>&limit=
+
+    未指定 limit 时每页 default_limit 条（不超过 MAX_PAGE_SIZE），需要全部结果时按 next_cursor 依次请求。
+    返回 (rows, pagination)。
+    """
+    limit = request.args.get('limit', type=int, default=default_limit)
+    cursor = request.args.get('cursor', type=int)
+
+    query = query.order_by(model_cls.id.desc())
+    if cursor:
+        query = query.filter(model_cls.id < cursor)
+
+    limit = min(max(limit or default_limit, 1), MAX_PAGE_SIZE)
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, {
+        'next_cursor': rows[-1].id if has_more else None,
+        'has_more': has_more,
+        'limit': limit
+    }
+
+
+def serialize(obj, fields):
+    """按投影字段序列化，格式与各模型的 to_dict 一致"""
+    json_fields = getattr(obj, 'JSON_FIELDS', ())
+    data = {}
+    for field in fields:
+        value = getattr(obj, field)
+        if isinstance(value, datetime):
+            value = value.strftime('%Y-%m-%d %H:%M:%S')
+        elif field in json_fields:
+            try:
+                value = json.loads(value) if value else {}
+            except ValueError:
+                value = {}
+        elif isinstance(value, list):
+            value = [item.to_dict() for item in value]
+        data[field] = value
+    return data
+
+
+def list_response(items, pagination):
+    """列表响应：附带分页信息与 ETag，内容未变化时返回 304"""
+    response = jsonify({
+        'code': 200,
+        'data': items,
+        'pagination': pagination,
+        'message': '获取成功'
+    })
+    response.headers['Cache-Control'] = 'no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
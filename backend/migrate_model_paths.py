@@ -13,7 +13,7 @@ import sys
 # Add backend directory to path
 sys.path.insert(0, os.path.dirname(__file__))
 
-from app import app
+from server import app
 from models import db, Model, TrainingTask
 
 def fix_model_paths():
@@ -0,0 +1,137 @@
+import os
+import threading
+from collections import OrderedDict
+from ultralytics import YOLO
+from export_service import path_size
+
+
+class ModelCache:
+    """进程级 YOLO 模型缓存
+
+    以 (权重绝对路径, mtime, size) 为键缓存已加载的模型，权重文件被替换后
+    自动失效；按估算的内存占用做 LRU 淘汰，总量不超过 max_bytes。
+    除 .pt 外也可缓存 ONNX / OpenVINO / TorchScript 导出产物。
+    """
+
+    def __init__(self, max_bytes=1024 * 1024 * 1024, max_items=None):
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self._entries = OrderedDict()  # key -> (model, cost)
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._model_locks = {}
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _make_key(weight_path):
+        path = os.path.abspath(weight_path)
+        st = os.stat(path)
+        return (path, st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def _estimate_cost(model, weight_path):
+        """估算模型常驻内存（字节），取参数与缓冲区大小，失败时（如导出引擎）退回文件大小"""
+        try:
+            module = model.model
+            cost = sum(p.numel() * p.element_size() for p in module.parameters())
+            cost += sum(b.numel() * b.element_size() for b in module.buffers())
+            if cost > 0:
+                return cost
+        except Exception:
+            pass
+        return path_size(weight_path)
+
+    def get(self, weight_path, task=None):
+        """获取已加载的模型，未命中时加载并放入缓存（导出引擎需指定 task）"""
+        key = self._make_key(weight_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # 同一权重只加载一次，其余请求等待加载结果
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self.misses += 1
+
+            try:
+                model = YOLO(key[0], task=task)
+                cost = self._estimate_cost(model, key[0])
+
+                with self._lock:
+                    # 同一路径的旧版本（权重已被替换）直接丢弃
+                    for old_key in [k for k in self._entries if k[0] == key[0]]:
+                        self._remove(old_key)
+                        self.evictions += 1
+                    self._entries[key] = (model, cost)
+                    self.current_bytes += cost
+                    self._shrink(keep=key)
+                return model
+            finally:
+                # 加载成功或失败都移除加载锁，失败的路径不会一直留在字典中
+                with self._lock:
+                    self._load_locks.pop(key, None)
+
+    def model_lock(self, weight_path):
+        """同一模型的推理锁（ultralytics 的 predictor 不是线程安全的）"""
+        path = os.path.abspath(weight_path)
+        with self._lock:
+            return self._model_locks.setdefault(path, threading.Lock())
+
+    def evict(self, weight_path):
+        """移除某个权重文件的所有缓存版本"""
+        path = os.path.abspath(weight_path)
+        with self._lock:
+            keys = [k for k in self._entries if k[0] == path]
+            for key in keys:
+                self._remove(key)
+                self.evictions += 1
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self.evictions += len(self._entries)
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _remove(self, key):
+        _, cost = self._entries.pop(key)
+        self.current_bytes -= cost
+
+    def _shrink(self, keep=None):
+        """按 LRU 顺序淘汰，直到满足内存预算（刚加载的模型始终保留）"""
+        while self._entries:
+            over_bytes = self.current_bytes > self.max_bytes
+            over_items = self.max_items is not None and len(self._entries) > self.max_items
+            if not over_bytes and not over_items:
+                break
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            self._remove(oldest)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'current_bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+                'models': [os.path.basename(k[0]) for k in self._entries]
+            }
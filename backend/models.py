@@ -1,12 +1,65 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from datetime import datetime
+import sqlite3
 import json
 
 db = SQLAlchemy()
 
+# 已有数据库的增量字段：表名 -> {列名: 列定义}（db.create_all 不会给已存在的表加列）
+SCHEMA_UPGRADES = {
+    'datasets': {
+        'error': 'TEXT',
+        'label_stats': 'TEXT',
+        'validation': 'TEXT'
+    },
+    'training_tasks': {
+        'priority': 'INTEGER DEFAULT 0'
+    },
+    'dataset_files': {
+        'blob': 'VARCHAR(64)'
+    }
+}
+
+# 已有数据库补建的索引：索引名 -> (表名, 列名)，与列定义中 index=True 生成的名称一致
+SCHEMA_INDEXES = {
+    'ix_training_tasks_status': ('training_tasks', 'status'),
+    'ix_training_tasks_created_at': ('training_tasks', 'created_at'),
+    'ix_training_tasks_dataset_id': ('training_tasks', 'dataset_id'),
+    'ix_models_task_id': ('models', 'task_id')
+}
+
+SQLITE_BUSY_TIMEOUT_MS = 30000
+
+@event.listens_for(Engine, 'connect')
+def _configure_sqlite(dbapi_connection, connection_record):
+    """SQLite 连接设置：WAL 模式下读写互不阻塞，写锁冲突时等待而不是立即报 database is locked"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+    cursor.close()
+
+def upgrade_schema():
+    """为已存在的表补齐新增字段和索引（需在 app context 中、db.create_all 之后调用）"""
+    with db.engine.begin() as conn:
+        for table, columns in SCHEMA_UPGRADES.items():
+            existing = {row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info({table})')}
+            for column, ddl in columns.items():
+                if column not in existing:
+                    conn.exec_driver_sql(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}')
+                    print(f"Schema upgraded: {table}.{column}")
+        for index, (table, column) in SCHEMA_INDEXES.items():
+            conn.exec_driver_sql(f'CREATE INDEX IF NOT EXISTS {index} ON {table} ({column})')
+
 class Dataset(db.Model):
     """数据集模型"""
     __tablename__ = 'datasets'
+    JSON_FIELDS = ('label_stats', 'validation')  # 以 JSON 字符串存储、序列化时解析的字段
+    HEAVY_FIELDS = ('label_stats', 'validation')  # 列表接口默认不加载的大字段
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
@@ -17,12 +70,25 @@ class Dataset(db.Model):
     size = db.Column(db.BigInteger, default=0)  # bytes
     format = db.Column(db.String(50), default='zip')
     status = db.Column(db.String(50), default='processing')  # processing, ready, error
+    error = db.Column(db.Text)  # 处理失败原因
+    label_stats = db.Column(db.Text)  # JSON: 标签扫描报告（类别、实例数、框尺寸分布、问题行）
+    validation = db.Column(db.Text)  # JSON: 完整性校验报告，status 为 failed 时不能创建训练任务
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
     
     # 关联关系
     training_tasks = db.relationship('TrainingTask', backref='dataset', lazy=True, cascade='all, delete-orphan')
     
+    @property
+    def validation_status(self):
+        """完整性校验结果：passed / warning / failed，未校验（旧数据集）为 None"""
+        if not self.validation:
+            return None
+        try:
+            return json.loads(self.validation).get('status')
+        except ValueError:
+            return None
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -34,6 +100,9 @@ class Dataset(db.Model):
             'size': self.size,
             'format': self.format,
             'status': self.status,
+            'error': self.error,
+            'label_stats': json.loads(self.label_stats) if self.label_stats else None,
+            'validation': json.loads(self.validation) if self.validation else None,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
             'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S') if self.updated_at else None
         }
@@ -41,10 +110,12 @@ class Dataset(db.Model):
 class Model(db.Model):
     """模型模型"""
     __tablename__ = 'models'
+    JSON_FIELDS = ('metrics',)  # 以 JSON 字符串存储、序列化时解析的字段
+    EXTRA_FIELDS = {'artifacts': 'artifacts'}  # 非列字段 -> 需预加载的关联关系
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
-    task_id = db.Column(db.Integer, db.ForeignKey('training_tasks.id'))
+    task_id = db.Column(db.Integer, db.ForeignKey('training_tasks.id'), index=True)
     task_type = db.Column(db.String(50), nullable=False)  # detect, classify, segment
     model_type = db.Column(db.String(50), nullable=False)  # yolo11n, yolo11s, etc.
     weight_path = db.Column(db.String(500))
@@ -53,6 +124,9 @@ class Model(db.Model):
     size = db.Column(db.BigInteger, default=0)
     created_at = db.Column(db.DateTime, default=datetime.now)
     
+    # 关联关系
+    artifacts = db.relationship('ModelArtifact', backref='model', lazy=True, cascade='all, delete-orphan')
+    
     def to_dict(self):
         metrics_data = {}
         if self.metrics:
@@ -71,45 +145,83 @@ class Model(db.Model):
             'config_path': self.config_path,
             'metrics': metrics_data,
             'size': self.size,
+            'artifacts': [a.to_dict() for a in self.artifacts],
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
         }
 
+class ModelArtifact(db.Model):
+    """模型导出产物（ONNX / OpenVINO / TorchScript）"""
+    __tablename__ = 'model_artifacts'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    model_id = db.Column(db.Integer, db.ForeignKey('models.id'), nullable=False)
+    engine = db.Column(db.String(50), nullable=False)  # onnx, openvino, torchscript
+    path = db.Column(db.String(500))
+    size = db.Column(db.BigInteger, default=0)
+    status = db.Column(db.String(50), default='pending')  # pending, exporting, ready, failed
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'model_id': self.model_id,
+            'engine': self.engine,
+            'path': self.path,
+            'size': self.size,
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
+            'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S') if self.updated_at else None
+        }
+
 class TrainingTask(db.Model):
     """训练任务模型"""
     __tablename__ = 'training_tasks'
+    HEAVY_FIELDS = ('logs',)  # 列表接口默认不加载的大字段
+    EXTRA_FIELDS = {'dataset_name': 'dataset'}  # 非列字段 -> 需预加载的关联关系
+    RELATION_COLUMNS = {'dataset': ('id', 'name')}  # 预加载关联时只加载的列
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
-    dataset_id = db.Column(db.Integer, db.ForeignKey('datasets.id'), nullable=False)
+    dataset_id = db.Column(db.Integer, db.ForeignKey('datasets.id'), nullable=False, index=True)
     model_type = db.Column(db.String(50), nullable=False)  # yolo11n, yolo11s, yolo11m, yolo11l, yolo11x
     task_type = db.Column(db.String(50), nullable=False)  # detect, classify, segment
     epochs = db.Column(db.Integer, default=100)
     batch_size = db.Column(db.Integer, default=16)
     img_size = db.Column(db.Integer, default=640)
-    status = db.Column(db.String(50), default='pending')  # pending, training, completed, failed, stopped
+    status = db.Column(db.String(50), default='pending', index=True)  # pending, training, completed, failed, stopped
+    priority = db.Column(db.Integer, default=0)  # 数值越大越优先调度
     progress = db.Column(db.Float, default=0.0)
     current_epoch = db.Column(db.Integer, default=0)
     logs = db.Column(db.Text)
     output_path = db.Column(db.String(500))
-    created_at = db.Column(db.DateTime, default=datetime.now)
+    created_at = db.Column(db.DateTime, default=datetime.now, index=True)
     started_at = db.Column(db.DateTime)
     completed_at = db.Column(db.DateTime)
     
     # 关联关系
     models = db.relationship('Model', backref='training_task', lazy=True)
+    metric_records = db.relationship('TrainingMetric', backref='training_task', lazy=True, cascade='all, delete-orphan')
+    
+    @property
+    def dataset_name(self):
+        return self.dataset.name if self.dataset else None
     
     def to_dict(self):
         return {
             'id': self.id,
             'name': self.name,
             'dataset_id': self.dataset_id,
-            'dataset_name': self.dataset.name if self.dataset else None,
+            'dataset_name': self.dataset_name,
             'model_type': self.model_type,
             'task_type': self.task_type,
             'epochs': self.epochs,
             'batch_size': self.batch_size,
             'img_size': self.img_size,
             'status': self.status,
+            'priority': self.priority,
             'progress': self.progress,
             'current_epoch': self.current_epoch,
             'logs': self.logs,
@@ -118,3 +230,60 @@ class TrainingTask(db.Model):
             'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S') if self.started_at else None,
             'completed_at': self.completed_at.strftime('%Y-%m-%d %H:%M:%S') if self.completed_at else None
         }
+
+class TrainingMetric(db.Model):
+    """训练指标时间序列：每轮一行（训练损失、学习率、验证指标、耗时），final 行为训练结束后对 best.pt 的验证"""
+    __tablename__ = 'training_metrics'
+    __table_args__ = (db.Index('ix_training_metrics_task_epoch', 'task_id', 'epoch'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, db.ForeignKey('training_tasks.id'), nullable=False)
+    epoch = db.Column(db.Integer, nullable=False)
+    final = db.Column(db.Boolean, default=False)
+    epoch_time = db.Column(db.Float)  # 秒
+    values = db.Column(db.Text)  # JSON: {字段名: 数值}
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    
+    def to_dict(self):
+        return {
+            'epoch': self.epoch,
+            'final': self.final,
+            'epoch_time': self.epoch_time,
+            'values': json.loads(self.values) if self.values else {},
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
+        }
+
+class DatasetFile(db.Model):
+    """数据集文件清单：每张图片一行，导入时生成，之后的统计与筛选直接查表而不扫描磁盘"""
+    __tablename__ = 'dataset_files'
+    __table_args__ = (db.Index('ix_dataset_files_dataset_split', 'dataset_id', 'split'),)
+    JSON_FIELDS = ('class_ids',)
+    HEAVY_FIELDS = ('dataset_id', 'mtime', 'label_mtime')  # 列表接口默认不返回的内部字段
+    
+    id = db.Column(db.Integer, primary_key=True)
+    dataset_id = db.Column(db.Integer, db.ForeignKey('datasets.id'), nullable=False)
+    path = db.Column(db.String(1000), nullable=False)  # 相对数据集根目录，使用 /
+    split = db.Column(db.String(20))  # train, val
+    size = db.Column(db.BigInteger, default=0)
+    mtime = db.Column(db.Float)
+    width = db.Column(db.Integer)  # 无法读取图片头时为空
+    height = db.Column(db.Integer)
+    label_path = db.Column(db.String(1000))  # 检测/分割任务的标签文件，不存在时为空
+    label_mtime = db.Column(db.Float)
+    box_count = db.Column(db.Integer, default=0)
+    class_ids = db.Column(db.Text)  # JSON: 升序去重的类别编号列表
+    blob = db.Column(db.String(64))  # 内容 sha256（文件是内容寻址存储中 blob 的硬链接时）
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'path': self.path,
+            'split': self.split,
+            'size': self.size,
+            'width': self.width,
+            'height': self.height,
+            'label_path': self.label_path,
+            'box_count': self.box_count,
+            'class_ids': json.loads(self.class_ids) if self.class_ids else [],
+            'blob': self.blob
+        }
@@ -0,0 +1,97 @@
+import threading
+from sqlalchemy.exc import OperationalError
+
+
+class ProgressWriter:
+    """训练进度写回缓冲（write-behind）
+
+    训练监控线程每轮的进度更新先合并到内存（同一任务只保留最新值），指标行先排队，
+    由后台线程每 interval 秒用一个事务批量写入数据库；状态变化前调用 flush() 立即落库，
+    保证进度不会晚于状态写入。数据库忙时保留数据，下次重试。
+    """
+
+    def __init__(self, app, interval=2.0):
+        self.app = app
+        self.interval = interval
+        self._pending = {}   # task_id -> {列名: 值}
+        self._inserts = []   # (模型类, {列名: 值})
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.flushes = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def update(self, task_id, **fields):
+        """合并一个任务的字段更新"""
+        with self._lock:
+            pending = self._pending.setdefault(task_id, {})
+            if pending:
+                self.coalesced += 1
+            pending.update(fields)
+
+    def insert(self, model_cls, **values):
+        """排队插入一行"""
+        with self._lock:
+            self._inserts.append((model_cls, values))
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Progress writer error: {e}")
+
+    def flush(self):
+        """立即把缓冲写入数据库（使用独立的 app context 与 session）"""
+        from models import db, TrainingTask
+
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                inserts, self._inserts = self._inserts, []
+            if not pending and not inserts:
+                return
+
+            with self.app.app_context():
+                try:
+                    for task_id, fields in pending.items():
+                        TrainingTask.query.filter_by(id=task_id).update(fields, synchronize_session=False)
+                    for model_cls, values in inserts:
+                        db.session.add(model_cls(**values))
+                    db.session.commit()
+                    self.flushes += 1
+                except OperationalError as e:
+                    db.session.rollback()
+                    self.errors += 1
+                    print(f"Progress flush failed, will retry: {e}")
+                    self._requeue(pending, inserts)
+                finally:
+                    db.session.remove()
+
+    def _requeue(self, pending, inserts):
+        with self._lock:
+            for task_id, fields in pending.items():
+                # 失败期间到达的新值优先
+                self._pending[task_id] = {**fields, **self._pending.get(task_id, {})}
+            self._inserts = inserts + self._inserts
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending_tasks': len(self._pending),
+                'pending_inserts': len(self._inserts),
+                'flushes': self.flushes,
+                'coalesced': self.coalesced,
+                'errors': self.errors
+            }
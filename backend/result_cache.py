@@ -0,0 +1,117 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class ResultCache:
+    """推理结果缓存
+
+    以 (图片内容哈希, 模型 ID, 权重路径/mtime/size, 推理与返回参数) 为键，缓存已编码的响应内容，
+    相同图片重复提交时跳过解码与前向推理。支持 TTL 过期、条目数/字节数上限下的 LRU 淘汰，
+    以及按模型失效（模型删除或导出产物更新时）。
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=256 * 1024 * 1024, ttl=300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, expires_at, size, model_id)
+        self._model_keys = {}          # model_id -> set(key)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(image_bytes, model_id, weight_path, params):
+        """生成缓存键；weight_path 的 mtime/size 纳入键中，权重被替换后旧结果自然失效"""
+        digest = hashlib.blake2b(image_bytes, digest_size=20).hexdigest()
+        st = os.stat(weight_path)
+        return (digest, model_id, os.path.abspath(weight_path), st.st_mtime_ns, st.st_size, params)
+
+    @staticmethod
+    def _estimate_size(value):
+        size = 256 + len(value.get('image') or b'')
+        for detection in value.get('detections', []):
+            size += 256
+            segmentation = detection.get('segmentation')
+            if isinstance(segmentation, dict):
+                size += 16 * len(segmentation.get('counts', []))
+            elif segmentation:
+                size += 32 * len(segmentation)
+        return size
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[1] < time.time():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, model_id):
+        size = self._estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.time() + self.ttl, size, model_id)
+            self._model_keys.setdefault(model_id, set()).add(key)
+            self.current_bytes += size
+            while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_model(self, model_id):
+        """移除某个模型的全部缓存结果"""
+        with self._lock:
+            keys = list(self._model_keys.get(model_id, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._model_keys.clear()
+            self.current_bytes = 0
+
+    def _remove(self, key):
+        _, _, size, model_id = self._entries.pop(key)
+        self.current_bytes -= size
+        keys = self._model_keys.get(model_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._model_keys[model_id]
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'current_bytes': self.current_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / total if total else 0.0
+            }
@@ -0,0 +1,1323 @@
+"""Flask 应用：配置、数据库初始化、各服务的创建与 API 路由（由入口 app.py 启动）"""
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
+from flask_cors import CORS
+from werkzeug.utils import secure_filename
+from sqlalchemy.orm import joinedload
+import os
+from datetime import datetime
+from models import db, Dataset, DatasetFile, Model, TrainingTask, TrainingMetric, upgrade_schema
+from train_service import TrainingService
+from training_scheduler import TrainingScheduler
+from progress_writer import ProgressWriter
+from model_cache import ModelCache
+from export_service import ExportService, EXPORT_ENGINES
+from inference_scheduler import InferenceScheduler
+from tiled_inference import predict_tiled
+from video_service import VideoInferenceService
+from result_cache import ResultCache
+from stats_service import StatsService
+from upload_service import UploadService, UploadError
+from dataset_ingest import DatasetIngestor, ArchiveError
+from dataset_manifest import DatasetManifest
+from label_scanner import LabelScanner
+from dataset_validator import DatasetValidator
+from image_cache import ImageCacheManager
+from blob_store import BlobStore
+from list_query import parse_fields, build_query, paginate, serialize, list_response
+from inference_utils import (
+    IMAGE_EXTENSIONS, IMAGE_FORMATS, class_names_array, decode_image, encode_image,
+    extract_detections, render_result
+)
+import json
+import base64
+
+app = Flask(__name__)
+CORS(app)
+
+# 配置
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(BASE_DIR, "yolo_platform.db")}'
+app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}  # SQLite 写锁等待时间（秒）
+app.config['UPLOAD_FOLDER'] = os.path.join(BASE_DIR, 'uploads')
+app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max upload
+app.config['UPLOAD_CHUNK_SIZE'] = 8 * 1024 * 1024  # 分片上传建议的分片大小，整体文件大小不受 MAX_CONTENT_LENGTH 限制
+app.config['DATASET_PROCESS_WORKERS'] = 1  # 后台处理数据集的线程数
+app.config['DATASET_EXTRACT_WORKERS'] = min(8, os.cpu_count() or 1)  # 并行解压线程数
+app.config['DATASET_MAX_UNCOMPRESSED_BYTES'] = 50 * 1024 ** 3  # 解压后总大小上限 50GB
+app.config['DATASET_MAX_FILES'] = 1_000_000  # 压缩包成员数上限
+app.config['DATASET_MAX_COMPRESSION_RATIO'] = 200  # 单个成员压缩率上限（防解压炸弹）
+app.config['DATASET_BLOB_DIR'] = os.path.join(BASE_DIR, 'blobs')  # 数据集文件内容寻址存储（应与 datasets 同一文件系统以便硬链接），设为 None 时直接解压
+app.config['DATASET_MANIFEST_WORKERS'] = min(8, os.cpu_count() or 1)  # 生成文件清单时并行读取图片头的线程数
+app.config['LABEL_SCAN_WORKERS'] = os.cpu_count() or 1  # 标签扫描进程数（标签文件较少时在当前进程内扫描）
+app.config['LABEL_MAX_CLASSES'] = 5000  # 导入检测/分割数据集时允许的类别编号上限，超出的标签行报告为 class_out_of_range
+app.config['DATASET_VALIDATION_WORKERS'] = os.cpu_count() or 1  # 数据集完整性校验（图片解码与哈希）进程数
+app.config['PROGRESS_FLUSH_INTERVAL'] = 2  # 训练进度批量写入数据库的间隔（秒）
+app.config['MAX_CONCURRENT_TRAININGS'] = 1  # 同时运行的训练任务数，其余任务排队
+app.config['TRAINING_THREADS_PER_PROCESS'] = max(1, (os.cpu_count() or 1) // app.config['MAX_CONCURRENT_TRAININGS'])  # 每个训练进程的计算线程数
+app.config['TRAINING_DATALOADER_WORKERS'] = 2  # 每个训练进程的数据加载进程数
+app.config['IMAGE_CACHE_DIR'] = os.path.join(BASE_DIR, 'cache', 'images')  # 训练图片预处理缓存目录
+app.config['IMAGE_CACHE_MAX_BYTES'] = 20 * 1024 ** 3  # 训练图片预处理缓存磁盘预算 20GB，超出时淘汰最久未用的条目
+app.config['IMAGE_CACHE_WORKERS'] = min(8, os.cpu_count() or 1)  # 构建缓存时并行解码缩放的线程数
+app.config['MODEL_CACHE_MAX_BYTES'] = 2 * 1024 * 1024 * 1024  # 推理模型缓存内存预算 2GB
+app.config['INFERENCE_BATCH_WINDOW_MS'] = 10  # 微批合并等待窗口
+app.config['INFERENCE_MAX_BATCH_SIZE'] = 8  # 单次批量推理的最大图片数
+app.config['INFERENCE_DECODE_WORKERS'] = 4  # 批量推理时并行解码图片的线程数
+app.config['INFERENCE_ARCHIVE_MAX_FILES'] = 10000  # 批量推理压缩包成员数上限
+app.config['INFERENCE_ARCHIVE_MAX_BYTES'] = 2 * 1024 ** 3  # 批量推理压缩包解压后总大小上限 2GB
+app.config['INFERENCE_ARCHIVE_MAX_IMAGE_BYTES'] = 50 * 1024 * 1024  # 批量推理压缩包中单张图片大小上限 50MB
+app.config['INFERENCE_IMAGE_FORMAT'] = 'jpeg'  # 结果图片默认编码格式：jpeg / webp / png
+app.config['INFERENCE_IMAGE_QUALITY'] = 95  # 结果图片默认编码质量（jpeg / webp）
+app.config['INFERENCE_DEFAULT_ENGINE'] = 'auto'  # 推理引擎：auto（最快可用）/ pt / onnx / openvino / torchscript / openvino-int8
+app.config['AUTO_EXPORT_ENGINES'] = ['onnx', 'openvino']  # 训练完成后自动导出的引擎
+app.config['VIDEO_FRAME_QUEUE_SIZE'] = 32  # 视频推理读帧队列长度
+app.config['RESULT_CACHE_MAX_ENTRIES'] = 1024  # 推理结果缓存最大条目数
+app.config['RESULT_CACHE_MAX_BYTES'] = 256 * 1024 * 1024  # 推理结果缓存内存上限 256MB
+app.config['RESULT_CACHE_TTL'] = 300  # 推理结果缓存有效期（秒）
+app.config['STATS_CACHE_TTL'] = 60  # 统计信息缓存有效期（秒），数据变化时提前失效
+app.config['VIDEO_STREAM_URLS_ENABLED'] = False  # 是否允许视频推理直接拉取 http/rtsp 流地址
+
+# 创建必要的目录
+os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+os.makedirs(os.path.join(BASE_DIR, 'datasets'), exist_ok=True)
+os.makedirs(os.path.join(BASE_DIR, 'models'), exist_ok=True)
+os.makedirs(os.path.join(BASE_DIR, 'runs'), exist_ok=True)
+
+# 初始化数据库
+db.init_app(app)
+
+with app.app_context():
+    db.create_all()
+    upgrade_schema()
+
+# 训练服务
+training_service = TrainingService(
+    datasets_dir=os.path.join(BASE_DIR, 'datasets'),
+    models_dir=os.path.join(BASE_DIR, 'models'),
+    runs_dir=os.path.join(BASE_DIR, 'runs')
+)
+training_service.app = app
+training_service.progress_writer = ProgressWriter(app, interval=app.config['PROGRESS_FLUSH_INTERVAL'])
+training_service.threads_per_process = app.config['TRAINING_THREADS_PER_PROCESS']
+training_service.dataloader_workers = app.config['TRAINING_DATALOADER_WORKERS']
+training_service.image_cache = ImageCacheManager(
+    app.config['IMAGE_CACHE_DIR'],
+    max_bytes=app.config['IMAGE_CACHE_MAX_BYTES'],
+    max_workers=app.config['IMAGE_CACHE_WORKERS']
+)
+training_service.ingestor = DatasetIngestor(
+    max_workers=app.config['DATASET_EXTRACT_WORKERS'],
+    max_total_size=app.config['DATASET_MAX_UNCOMPRESSED_BYTES'],
+    max_files=app.config['DATASET_MAX_FILES'],
+    max_ratio=app.config['DATASET_MAX_COMPRESSION_RATIO'],
+    blob_store=BlobStore(app.config['DATASET_BLOB_DIR']) if app.config['DATASET_BLOB_DIR'] else None
+)
+training_service.label_scanner = LabelScanner(max_workers=app.config['LABEL_SCAN_WORKERS'],
+                                              max_classes=app.config['LABEL_MAX_CLASSES'])
+
+# 训练任务调度器（首个请求到达时启动，避免 debug 重载器的监控进程也调度任务）
+training_scheduler = TrainingScheduler(
+    app,
+    training_service,
+    max_concurrent=app.config['MAX_CONCURRENT_TRAININGS']
+)
+
+# 数据集分片上传与后台处理
+upload_service = UploadService(
+    app,
+    training_service,
+    upload_dir=os.path.join(app.config['UPLOAD_FOLDER'], 'chunked'),
+    chunk_size=app.config['UPLOAD_CHUNK_SIZE'],
+    max_workers=app.config['DATASET_PROCESS_WORKERS']
+)
+
+# 数据集文件清单（导入时生成，统计与筛选不再扫描磁盘）
+dataset_manifest = DatasetManifest(
+    max_workers=app.config['DATASET_MANIFEST_WORKERS'],
+    label_scanner=training_service.label_scanner
+)
+upload_service.manifest = dataset_manifest
+
+# 数据集完整性校验（导入时运行，校验失败的数据集不能创建训练任务）
+dataset_validator = DatasetValidator(max_workers=app.config['DATASET_VALIDATION_WORKERS'])
+upload_service.validator = dataset_validator
+
+@app.before_request
+def _start_training_scheduler():
+    training_service.progress_writer.start()
+    training_service.image_cache.start()
+    upload_service.start()
+    training_scheduler.start()
+
+# 推理模型缓存
+model_cache = ModelCache(max_bytes=app.config['MODEL_CACHE_MAX_BYTES'])
+
+# 仪表盘统计缓存
+stats_service = StatsService(ttl=app.config['STATS_CACHE_TTL'])
+
+# 推理结果缓存（相同图片重复提交时直接返回）
+result_cache = ResultCache(
+    max_entries=app.config['RESULT_CACHE_MAX_ENTRIES'],
+    max_bytes=app.config['RESULT_CACHE_MAX_BYTES'],
+    ttl=app.config['RESULT_CACHE_TTL']
+)
+
+# 模型导出服务（训练完成后自动导出 CPU 推理引擎）
+export_service = ExportService(app, model_cache=model_cache, result_cache=result_cache)
+training_service.export_service = export_service
+training_service.auto_export_engines = app.config['AUTO_EXPORT_ENGINES']
+
+# 视频推理服务
+video_service = VideoInferenceService(model_cache, queue_size=app.config['VIDEO_FRAME_QUEUE_SIZE'])
+
+# 推理微批调度器
+inference_scheduler = InferenceScheduler(
+    model_cache,
+    window_ms=app.config['INFERENCE_BATCH_WINDOW_MS'],
+    max_batch_size=app.config['INFERENCE_MAX_BATCH_SIZE']
+)
+
+# 批量推理压缩包的安全检查（成员数、解压后大小、压缩率，与数据集导入相同的规则）
+inference_archive_checker = DatasetIngestor(
+    max_total_size=app.config['INFERENCE_ARCHIVE_MAX_BYTES'],
+    max_files=app.config['INFERENCE_ARCHIVE_MAX_FILES'],
+    max_ratio=app.config['DATASET_MAX_COMPRESSION_RATIO']
+)
+
+# ==================== 数据集管理 API ====================
+
+@app.route('/api/datasets', methods=['GET'])
+def get_datasets():
+    """获取数据集列表：支持 cursor/limit 分页、fields 投影、status/task_type 过滤"""
+    try:
+        fields = parse_fields(Dataset)
+        query = build_query(Dataset, fields, filters=('status', 'task_type'))
+    except ValueError as e:
+        return jsonify({'code': 400, 'message': str(e)}), 400
+    datasets, pagination = paginate(query, Dataset)
+    return list_response([serialize(d, fields) for d in datasets], pagination)
+
+@app.route('/api/datasets/<int:dataset_id>', methods=['GET'])
+def get_dataset(dataset_id):
+    """获取单个数据集详情"""
+    dataset = Dataset.query.get_or_404(dataset_id)
+    return jsonify({
+        'code': 200,
+        'data': dataset.to_dict(),
+        'message': '获取成功'
+    })
+
+def _ensure_manifest(dataset):
+    """清单功能上线前导入的数据集首次查询时补建清单"""
+    if not dataset_manifest.exists(dataset.id):
+        dataset_manifest.refresh(dataset)
+        db.session.commit()
+
+@app.route('/api/datasets/<int:dataset_id>/manifest', methods=['GET'])
+def get_dataset_manifest(dataset_id):
+    """查询数据集文件清单：支持 split/class_id/labeled 过滤、cursor/limit 分页、fields 投影"""
+    dataset = Dataset.query.get_or_404(dataset_id)
+    if dataset.status != 'ready':
+        return jsonify({'code': 409, 'message': '数据集尚未处理完成'}), 409
+    _ensure_manifest(dataset)
+    try:
+        fields = parse_fields(DatasetFile)
+        query = build_query(DatasetFile, fields, filters=('split',)).filter(DatasetFile.dataset_id == dataset_id)
+    except ValueError as e:
+        return jsonify({'code': 400, 'message': str(e)}), 400
+
+    class_id = request.args.get('class_id', type=int)
+    if class_id is not None:
+        query = query.filter(dataset_manifest.class_filter(class_id))
+    labeled = request.args.get('labeled')
+    if labeled in ('1', 'true'):
+        query = query.filter(DatasetFile.box_count > 0)
+    elif labeled in ('0', 'false'):
+        query = query.filter(DatasetFile.box_count == 0)
+
+    files, pagination = paginate(query, DatasetFile, default_limit=100)
+    return list_response([serialize(f, fields) for f in files], pagination)
+
+@app.route('/api/datasets/<int:dataset_id>/manifest/summary', methods=['GET'])
+def get_dataset_manifest_summary(dataset_id):
+    """数据集统计：各划分的图片数、大小、标注情况，类别直方图、常见图片尺寸与标签扫描报告"""
+    dataset = Dataset.query.get_or_404(dataset_id)
+    if dataset.status != 'ready':
+        return jsonify({'code': 409, 'message': '数据集尚未处理完成'}), 409
+    _ensure_manifest(dataset)
+    summary = dataset_manifest.summary(dataset_id)
+    summary['labels'] = json.loads(dataset.label_stats) if dataset.label_stats else None
+    return jsonify({
+        'code': 200,
+        'data': summary,
+        'message': '获取成功'
+    })
+
+@app.route('/api/datasets/<int:dataset_id>/manifest/refresh', methods=['POST'])
+def refresh_dataset_manifest(dataset_id):
+    """数据集目录被修改后增量刷新清单（只重新读取大小或修改时间变化的文件）"""
+    dataset = Dataset.query.get_or_404(dataset_id)
+    if dataset.status != 'ready':
+        return jsonify({'code': 409, 'message': '数据集尚未处理完成'}), 409
+    try:
+        changes = dataset_manifest.refresh(dataset)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'code': 500, 'message': f'刷新失败: {str(e)}'}), 500
+    return jsonify({
+        'code': 200,
+        'data': changes,
+        'message': '刷新成功'
+    })
+
+@app.route('/api/datasets/<int:dataset_id>/validate', methods=['POST'])
+def validate_dataset(dataset_id):
+    """重新校验数据集（修改数据集目录后调用）：刷新标签统计与文件清单，再生成完整性报告"""
+    dataset = Dataset.query.get_or_404(dataset_id)
+    if dataset.status != 'ready':
+        return jsonify({'code': 409, 'message': '数据集尚未处理完成'}), 409
+    try:
+        labels = dataset_manifest.scan_labels(dataset)
+        dataset_manifest.refresh(dataset, labels=labels)
+        report = dataset_validator.validate(dataset, labels)
+        dataset.validation = json.dumps(report, ensure_ascii=False)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'code': 500, 'message': f'校验失败: {str(e)}'}), 500
+    return jsonify({
+        'code': 200,
+        'data': report,
+        'message': '校验完成'
+    })
+
+@app.route('/api/datasets/upload', methods=['POST'])
+def upload_dataset():
+    """上传数据集"""
+    if 'file' not in request.files:
+        return jsonify({'code': 400, 'message': '没有上传文件'}), 400
+    
+    file = request.files['file']
+    name = request.form.get('name')
+    task_type = request.form.get('task_type', 'detect')
+    description = request.form.get('description', '')
+    
+    if not file or not name:
+        return jsonify({'code': 400, 'message': '缺少必要参数'}), 400
+    
+    if file.filename == '':
+        return jsonify({'code': 400, 'message': '文件名为空'}), 400
+    
+    try:
+        # 保存上传的文件
+        filename = secure_filename(file.filename)
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+        upload_path = os.path.join(app.config['UPLOAD_FOLDER'], f'{timestamp}_{filename}')
+        file.save(upload_path)
+        
+        # 创建数据集记录（processing），后台解压处理
+        dataset = upload_service.submit(upload_path, name, task_type, description)
+        
+        return jsonify({
+            'code': 200,
+            'data': dataset.to_dict(),
+            'message': '数据集上传成功，正在处理'
+        })
+    except Exception as e:
+        return jsonify({'code': 500, 'message': f'上传失败: {str(e)}'}), 500
+
+def _upload_error(e):
+    return jsonify({'code': e.status, 'message': str(e), 'data': e.extra or None}), e.status
+
+def _upload_dict(meta):
+    return {
+        'upload_id': meta['upload_id'],
+        'filename': meta['filename'],
+        'name': meta['name'],
+        'total_size': meta.get('total_size'),
+        'chunk_size': meta['chunk_size'],
+        'offset': meta['offset']
+    }
+
+@app.route('/api/datasets/uploads', methods=['POST'])
+def init_dataset_upload():
+    """分片上传：创建上传会话"""
+    data = request.json or {}
+    total_size = data.get('total_size')
+    try:
+        meta = upload_service.init_upload(
+            filename=data.get('filename'),
+            name=data.get('name'),
+            task_type=data.get('task_type', 'detect'),
+            description=data.get('description', ''),
+            total_size=int(total_size) if total_size is not None else None
+        )
+    except UploadError as e:
+        return _upload_error(e)
+    return jsonify({'code': 200, 'data': _upload_dict(meta), 'message': '上传会话已创建'})
+
+@app.route('/api/datasets/uploads/<upload_id>', methods=['GET'])
+def get_dataset_upload(upload_id):
+    """分片上传：查询已接收的字节数（断线续传时从 offset 继续）"""
+    try:
+        meta = upload_service.get_upload(upload_id)
+    except UploadError as e:
+        return _upload_error(e)
+    return jsonify({'code': 200, 'data': _upload_dict(meta), 'message': '获取成功'})
+
+@app.route('/api/datasets/uploads/<upload_id>', methods=['PUT'])
+def put_dataset_upload_chunk(upload_id):
+    """分片上传：请求体为分片原始数据，?offset= 为分片起始位置，X-Chunk-Checksum 为分片 sha256（可选 X-Checksum-Algorithm: md5）"""
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'code': 400, 'message': '缺少 offset 参数'}), 400
+    try:
+        meta = upload_service.put_chunk(
+            upload_id,
+            offset,
+            request.stream,
+            checksum=request.headers.get('X-Chunk-Checksum'),
+            algorithm=request.headers.get('X-Checksum-Algorithm', 'sha256').lower()
+        )
+    except UploadError as e:
+        return _upload_error(e)
+    return jsonify({'code': 200, 'data': _upload_dict(meta), 'message': '分片已接收'})
+
+@app.route('/api/datasets/uploads/<upload_id>/complete', methods=['POST'])
+def complete_dataset_upload(upload_id):
+    """分片上传：结束上传，可附整个文件的 checksum 校验；数据集进入后台处理（status=processing）"""
+    data = request.json or {}
+    try:
+        dataset = upload_service.complete(
+            upload_id,
+            checksum=data.get('checksum'),
+            algorithm=data.get('algorithm', 'sha256').lower()
+        )
+    except UploadError as e:
+        return _upload_error(e)
+    return jsonify({'code': 200, 'data': dataset.to_dict(), 'message': '上传完成，正在处理'})
+
+@app.route('/api/datasets/uploads/<upload_id>', methods=['DELETE'])
+def abort_dataset_upload(upload_id):
+    """分片上传：放弃上传并删除已接收的数据"""
+    try:
+        upload_service.abort(upload_id)
+    except UploadError as e:
+        return _upload_error(e)
+    return jsonify({'code': 200, 'message': '上传已取消'})
+
+@app.route('/api/datasets/<int:dataset_id>', methods=['DELETE'])
+def delete_dataset(dataset_id):
+    """删除数据集"""
+    dataset = Dataset.query.get_or_404(dataset_id)
+    
+    try:
+        # 先删除缓存条目（其中的硬链接也引用 blob），再删除文件并回收不再被引用的 blob
+        training_service.image_cache.invalidate(dataset.id)
+        if dataset.path:
+            training_service.delete_dataset_files(dataset.path)
+        
+        # 删除数据库记录
+        dataset_manifest.delete(dataset.id)
+        db.session.delete(dataset)
+        db.session.commit()
+        
+        return jsonify({
+            'code': 200,
+            'message': '数据集删除成功'
+        })
+    except Exception as e:
+        return jsonify({'code': 500, 'message': f'删除失败: {str(e)}'}), 500
+
+@app.route('/api/datasets/<int:dataset_id>/download', methods=['GET'])
+def download_dataset(dataset_id):
+    """下载数据集"""
+    dataset = Dataset.query.get_or_404(dataset_id)
+    
+    if not dataset.path or not os.path.exists(dataset.path):
+        return jsonify({'code': 404, 'message': '数据集文件不存在'}), 404
+    
+    try:
+        import shutil
+        import tempfile
+        
+        # 创建临时zip文件
+        temp_dir = tempfile.gettempdir()
+        zip_filename = f"{dataset.name}_{dataset_id}.zip"
+        zip_path = os.path.join(temp_dir, zip_filename)
+        
+        # 压缩数据集目录
+        shutil.make_archive(
+            zip_path.replace('.zip', ''),
+            'zip',
+            dataset.path
+        )
+        
+        return send_file(
+            zip_path,
+            as_attachment=True,
+            download_name=zip_filename,
+            mimetype='application/zip'
+        )
+    except Exception as e:
+        return jsonify({'code': 500, 'message': f'下载失败: {str(e)}'}), 500
+
+# ==================== 模型管理 API ====================
+
+@app.route('/api/models', methods=['GET'])
+def get_models():
+    """获取模型列表：支持 cursor/limit 分页、fields 投影、task_type/model_type/task_id 过滤"""
+    try:
+        fields = parse_fields(Model)
+        query = build_query(Model, fields, filters=('task_type', 'model_type', 'task_id'))
+    except ValueError as e:
+        return jsonify({'code': 400, 'message': str(e)}), 400
+    models, pagination = paginate(query, Model)
+    return list_response([serialize(m, fields) for m in models], pagination)
+
+@app.route('/api/models/<int:model_id>', methods=['GET'])
+def get_model(model_id):
+    """获取模型详情"""
+    model = Model.query.get_or_404(model_id)
+    return jsonify({
+        'code': 200,
+        'data': model.to_dict(),
+        'message': '获取成功'
+    })
+
+@app.route('/api/models/<int:model_id>', methods=['DELETE'])
+def delete_model(model_id):
+    """删除模型"""
+    model = Model.query.get_or_404(model_id)
+    
+    try:
+        # 删除模型文件及导出产物
+        result_cache.invalidate_model(model.id)
+        export_service.delete_artifacts(model)
+        if model.weight_path:
+            model_cache.evict(model.weight_path)
+        if model.weight_path and os.path.exists(model.weight_path):
+            os.remove(model.weight_path)
+        
+        # 删除数据库记录
+        db.session.delete(model)
+        db.session.commit()
+        
+        return jsonify({
+            'code': 200,
+            'message': '模型删除成功'
+        })
+    except Exception as e:
+        return jsonify({'code': 500, 'message': f'删除失败: {str(e)}'}), 500
+
+@app.route('/api/models/<int:model_id>/download', methods=['GET'])
+def download_model(model_id):
+    """下载模型"""
+    model = Model.query.get_or_404(model_id)
+    
+    if not model.weight_path or not os.path.exists(model.weight_path):
+        return jsonify({'code': 404, 'message': '模型文件不存在'}), 404
+    
+    # 获取文件名
+    filename = os.path.basename(model.weight_path)
+    
+    return send_file(
+        model.weight_path,
+        as_attachment=True,
+        download_name=filename,
+        mimetype='application/octet-stream'
+    )
+
+@app.route('/api/models/<int:model_id>/artifacts', methods=['GET'])
+def get_model_artifacts(model_id):
+    """获取模型导出产物列表"""
+    model = Model.query.get_or_404(model_id)
+    return jsonify({
+        'code': 200,
+        'data': [a.to_dict() for a in model.artifacts],
+        'message': '获取成功'
+    })
+
+@app.route('/api/models/<int:model_id>/export', methods=['POST'])
+def export_model(model_id):
+    """导出模型为 CPU 推理引擎（后台执行）"""
+    model = Model.query.get_or_404(model_id)
+    data = request.json or {}
+    engines = data.get('engines', app.config['AUTO_EXPORT_ENGINES'])
+    
+    if not model.weight_path or not os.path.exists(model.weight_path):
+        return jsonify({'code': 404, 'message': '模型文件不存在'}), 404
+    
+    unsupported = [e for e in engines if e not in EXPORT_ENGINES]
+    if unsupported:
+        return jsonify({'code': 400, 'message': f'不支持的导出引擎: {", ".join(unsupported)}'}), 400
+    
+    try:
+        artifacts = export_service.export_model(model_id, engines)
+        return jsonify({
+            'code': 200,
+            'data': [a.to_dict() for a in artifacts],
+            'message': '导出任务已提交'
+        })
+    except Exception as e:
+        return jsonify({'code': 500, 'message': f'导出失败: {str(e)}'}), 500
+
+@app.route('/api/models/<int:model_id>/quantize', methods=['POST'])
+def quantize_model(model_id):
+    """INT8 训练后量化（后台执行），完成后 FP32/INT8 精度与延迟对比写入模型 metrics.quantization"""
+    model = Model.query.get_or_404(model_id)
+    data = request.json or {}
+    fraction = float(data.get('fraction', 1.0))
+    
+    if not model.weight_path or not os.path.exists(model.weight_path):
+        return jsonify({'code': 404, 'message': '模型文件不存在'}), 404
+    
+    if not 0 < fraction <= 1:
+        return jsonify({'code': 400, 'message': '校准数据比例需在 (0, 1] 之间'}), 400
+    
+    try:
+        artifact = export_service.quantize_model(model_id, fraction)
+        return jsonify({
+            'code': 200,
+            'data': artifact.to_dict(),
+            'message': '量化任务已提交'
+        })
+    except ValueError as e:
+        return jsonify({'code': 400, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'code': 500, 'message': f'量化失败: {str(e)}'}), 500
+
+@app.route('/api/models/<int:model_id>/training-images', methods=['GET'])
+def get_training_images(model_id):
+    """获取模型训练结果图片列表"""
+    model = Model.query.get_or_404(model_id)
+    
+    print(f"DEBUG: Getting training images for model {model_id}")
+    print(f"DEBUG: config_path = {model.config_path}")
+    
+    images = []
+    
+    # 从 metrics中获取图片路径，或从 config_path 查找
+    if model.config_path and os.path.exists(model.config_path):
+        train_dir = os.path.join(model.config_path, 'train')
+        print(f"DEBUG: train_dir = {train_dir}")
+        print(f"DEBUG: train_dir exists = {os.path.exists(train_dir)}")
+        
+        if os.path.exists(train_dir):
+            # 常见的训练结果图片
+            image_files = [
+                'results.png',
+                'confusion_matrix.png',
+                'confusion_matrix_normalized.png',
+                'F1_curve.png',
+                'P_curve.png',
+                'R_curve.png',
+                'PR_curve.png'
+            ]
+            
+            for img_file in image_files:
+                img_path = os.path.join(train_dir, img_file)
+                if os.path.exists(img_path):
+                    images.append({
+                        'name': img_file,
+                        'url': f'/models/{model_id}/training-images/{img_file}'
+                    })
+                    print(f"DEBUG: Found image: {img_file}")
+    
+    print(f"DEBUG: Total images found: {len(images)}")
+    
+    return jsonify({
+        'code': 200,
+        'data': images,
+        'message': '获取成功'
+    })
+
+@app.route('/api/models/<int:model_id>/training-images/<path:filename>', methods=['GET'])
+def get_training_image(model_id, filename):
+    """获取具体的训练图片"""
+    model = Model.query.get_or_404(model_id)
+    
+    if not model.config_path:
+        return jsonify({'code': 404, 'message': '训练结果不存在'}), 404
+    
+    img_path = os.path.join(model.config_path, 'train', filename)
+    
+    if not os.path.exists(img_path):
+        return jsonify({'code': 404, 'message': '图片不存在'}), 404
+    
+    return send_file(img_path, mimetype='image/png')
+
+# ==================== 训练任务 API ====================
+
+def _task_dict(task, queue=None):
+    """任务详情，排队中的任务附带队列位置与预计开始时间"""
+    data = task.to_dict()
+    if task.status == 'pending':
+        if queue is None:
+            queue = training_scheduler.queue_snapshot()
+        data.update(queue.get(task.id, {'queue_position': None, 'estimated_start': None}))
+    return data
+
+@app.route('/api/tasks', methods=['GET'])
+def get_tasks():
+    """获取训练任务列表：支持 cursor/limit 分页、fields 投影（默认不含 logs）、status/task_type/dataset_id 过滤"""
+    try:
+        fields = parse_fields(TrainingTask)
+        query = build_query(TrainingTask, fields, filters=('status', 'task_type', 'dataset_id'))
+    except ValueError as e:
+        return jsonify({'code': 400, 'message': str(e)}), 400
+    tasks, pagination = paginate(query, TrainingTask)
+    
+    items = [serialize(t, fields) for t in tasks]
+    # 排队中的任务附带队列位置与预计开始时间
+    if 'status' in fields and any(t.status == 'pending' for t in tasks):
+        queue = training_scheduler.queue_snapshot()
+        for item in items:
+            if item['status'] == 'pending':
+                item.update(queue.get(item['id'], {'queue_position': None, 'estimated_start': None}))
+    return list_response(items, pagination)
+
+@app.route('/api/tasks/<int:task_id>', methods=['GET'])
+def get_task(task_id):
+    """获取训练任务详情"""
+    task = TrainingTask.query.get_or_404(task_id)
+    return jsonify({
+        'code': 200,
+        'data': _task_dict(task),
+        'message': '获取成功'
+    })
+
+@app.route('/api/tasks/create', methods=['POST'])
+def create_task():
+    """创建训练任务"""
+    data = request.json
+    
+    dataset_id = data.get('dataset_id')
+    task_name = data.get('task_name')
+    model_type = data.get('model_type', 'yolo11n')
+    epochs = data.get('epochs', 100)
+    batch_size = data.get('batch_size', 16)
+    img_size = data.get('img_size', 640)
+    task_type = data.get('task_type', 'detect')
+    priority = int(data.get('priority', 0))
+    
+    if not dataset_id or not task_name:
+        return jsonify({'code': 400, 'message': '缺少必要参数'}), 400
+    
+    dataset = Dataset.query.get(dataset_id)
+    if not dataset:
+        return jsonify({'code': 404, 'message': '数据集不存在'}), 404
+    if dataset.status != 'ready':
+        return jsonify({'code': 400, 'message': f'数据集尚未就绪（{dataset.status}）'}), 400
+    if dataset.validation_status == 'failed':
+        return jsonify({'code': 400, 'message': '数据集校验未通过，请根据校验报告修复后重新校验'}), 400
+    
+    try:
+        # 创建训练任务记录
+        task = TrainingTask(
+            name=task_name,
+            dataset_id=dataset_id,
+            model_type=model_type,
+            task_type=task_type,
+            epochs=epochs,
+            batch_size=batch_size,
+            img_size=img_size,
+            status='pending',
+            priority=priority
+        )
+        db.session.add(task)
+        db.session.commit()
+        
+        # 进入调度队列，有空闲槽位时启动训练
+        training_scheduler.notify()
+        
+        return jsonify({
+            'code': 200,
+            'data': _task_dict(task),
+            'message': '训练任务创建成功'
+        })
+    except Exception as e:
+        return jsonify({'code': 500, 'message': f'创建失败: {str(e)}'}), 500
+
+@app.route('/api/tasks/queue', methods=['GET'])
+def get_task_queue():
+    """获取训练队列：排队任务按调度顺序返回"""
+    queue = training_scheduler.queue_snapshot()
+    # 数据集只加载名称，不加载其统计与校验报告
+    tasks = TrainingTask.query.options(
+        joinedload(TrainingTask.dataset).load_only(Dataset.id, Dataset.name)
+    ).filter(TrainingTask.id.in_(list(queue))).all() if queue else []
+    tasks.sort(key=lambda t: queue[t.id]['queue_position'])
+    return jsonify({
+        'code': 200,
+        'data': {
+            'scheduler': training_scheduler.stats(),
+            'events': training_service.events.stats(),
+            'logs': training_service.logs.stats(),
+            'progress_writer': training_service.progress_writer.stats(),
+            'image_cache': training_service.image_cache.stats(),
+            'blob_store': training_service.ingestor.blob_store.stats() if training_service.ingestor.blob_store else None,
+            'tasks': [_task_dict(t, queue) for t in tasks]
+        },
+        'message': '获取成功'
+    })
+
+@app.route('/api/tasks/<int:task_id>/stop', methods=['POST'])
+def stop_task(task_id):
+    """停止训练任务"""
+    task = TrainingTask.query.get_or_404(task_id)
+    
+    try:
+        training_service.stop_training(task_id)
+        
+        task.status = 'stopped'
+        db.session.commit()
+        
+        return jsonify({
+            'code': 200,
+            'message': '任务已停止'
+        })
+    except Exception as e:
+        return jsonify({'code': 500, 'message': f'停止失败: {str(e)}'}), 500
+
+@app.route('/api/tasks/<int:task_id>/progress', methods=['GET'])
+def get_task_progress(task_id):
+    """获取训练进度"""
+    task = TrainingTask.query.get_or_404(task_id)
+    progress = training_service.get_training_progress(task_id)
+    
+    return jsonify({
+        'code': 200,
+        'data': {
+            'task': _task_dict(task),
+            'progress': progress
+        },
+        'message': '获取成功'
+    })
+
+@app.route('/api/tasks/<int:task_id>/events', methods=['GET'])
+def task_events(task_id):
+    """训练事件流（Server-Sent Events）：status / epoch / metric / log 事件，支持 Last-Event-ID 续传"""
+    task = TrainingTask.query.get_or_404(task_id)
+    snapshot = {
+        'status': task.status,
+        'progress': task.progress,
+        'current_epoch': task.current_epoch,
+        'epochs': task.epochs
+    }
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else 0
+    except ValueError:
+        last_event_id = 0
+    # 订阅期间不占用数据库连接
+    db.session.remove()
+    
+    response = Response(
+        training_service.events.subscribe(task_id, last_event_id, snapshot),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/tasks/<int:task_id>/logs', methods=['GET'])
+def get_task_logs(task_id):
+    """训练日志：after 为上次读取到的行号（游标），返回其后的至多 limit 行"""
+    TrainingTask.query.get_or_404(task_id)
+    after = max(request.args.get('after', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', 500, type=int), 1), 5000)
+    
+    lines = training_service.logs.read(task_id, after, limit)
+    return jsonify({
+        'code': 200,
+        'data': {
+            'lines': [{'seq': seq, 'line': line} for seq, line in lines],
+            'next_cursor': lines[-1][0] if lines else after,
+            'has_more': len(lines) >= limit
+        },
+        'message': '获取成功'
+    })
+
+def _downsample_indices(count, limit):
+    """在 [0, count) 中均匀选取至多 limit 个下标，保留首尾"""
+    if limit <= 0 or count <= limit:
+        return list(range(count))
+    if limit == 1:
+        return [count - 1]
+    return sorted({round(i * (count - 1) / (limit - 1)) for i in range(limit)})
+
+@app.route('/api/tasks/<int:task_id>/metrics', methods=['GET'])
+def get_task_metrics(task_id):
+    """训练指标时间序列：返回按轮对齐的数组，fields 逗号分隔筛选字段，downsample 限制点数"""
+    TrainingTask.query.get_or_404(task_id)
+    fields = [f for f in request.args.get('fields', '').split(',') if f]
+    downsample = request.args.get('downsample', 0, type=int)
+    
+    rows = db.session.query(
+        TrainingMetric.epoch, TrainingMetric.epoch_time, TrainingMetric.values
+    ).filter_by(task_id=task_id, final=False).order_by(TrainingMetric.epoch.asc()).all()
+    final_row = TrainingMetric.query.filter_by(task_id=task_id, final=True).first()
+    
+    # 可用字段取首尾两行的并集（各轮字段一致，仅首轮可能缺少部分指标）
+    available = []
+    for row in rows[:1] + rows[-1:]:
+        for key in json.loads(row.values or '{}'):
+            if key not in available:
+                available.append(key)
+    fields = fields or available
+    
+    # 先抽样再解析 JSON，长任务只解析需要返回的行
+    selected = [rows[i] for i in _downsample_indices(len(rows), downsample)]
+    series = {field: [] for field in fields}
+    for row in selected:
+        values = json.loads(row.values or '{}')
+        for field in fields:
+            series[field].append(values.get(field))
+    
+    return jsonify({
+        'code': 200,
+        'data': {
+            'epoch': [row.epoch for row in selected],
+            'epoch_time': [row.epoch_time for row in selected],
+            'series': series,
+            'fields': available,
+            'total': len(rows),
+            'final': final_row.to_dict() if final_row else None
+        },
+        'message': '获取成功'
+    })
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """获取统计信息（进程内缓存，数据变化时失效）"""
+    return jsonify({
+        'code': 200,
+        'data': stats_service.get(),
+        'message': '获取成功'
+    })
+
+# ==================== 模型推理 API ====================
+
+def _predict_response(return_mode, output, cached=False):
+    """按返回模式构造推理响应"""
+    if return_mode == 'image':
+        return _image_response(output, cached)
+    
+    img_data_url = None
+    if return_mode == 'dataurl':
+        # 将结果图片转为base64
+        img_base64 = base64.b64encode(output['image']).decode('utf-8')
+        img_data_url = f"data:{output['mimetype']};base64,{img_base64}"
+    
+    return jsonify({
+        'code': 200,
+        'data': {
+            'image': img_data_url,
+            'detections': output['detections'],
+            'inference_time': output['inference_time'],
+            'task_type': output['task_type'],
+            'engine': output['engine'],
+            'cached': cached
+        },
+        'message': '识别成功'
+    })
+
+def _image_response(output, cached=False):
+    """二进制图片响应：客户端接受 multipart/mixed 时返回 JSON + 图片两部分，否则检测结果放在响应头"""
+    meta = {
+        'detections': output['detections'],
+        'inference_time': output['inference_time'],
+        'task_type': output['task_type'],
+        'engine': output['engine'],
+        'cached': cached
+    }
+    mimetype = output['mimetype']
+    
+    if 'multipart/mixed' in request.headers.get('Accept', ''):
+        import uuid
+        boundary = uuid.uuid4().hex
+        body = b''.join([
+            f'--{boundary}\r\nContent-Type: application/json\r\n\r\n'.encode('utf-8'),
+            json.dumps(meta, ensure_ascii=False).encode('utf-8'),
+            f'\r\n--{boundary}\r\nContent-Type: {mimetype}\r\n\r\n'.encode('utf-8'),
+            output['image'],
+            f'\r\n--{boundary}--\r\n'.encode('utf-8')
+        ])
+        return Response(body, mimetype=f'multipart/mixed; boundary={boundary}')
+    
+    response = Response(output['image'], mimetype=mimetype)
+    response.headers['X-Detections'] = json.dumps(output['detections'])  # ASCII 转义，保证头部合法
+    response.headers['X-Inference-Time'] = str(output['inference_time'])
+    response.headers['X-Task-Type'] = output['task_type']
+    response.headers['X-Engine'] = output['engine']
+    response.headers['X-Cache'] = 'HIT' if cached else 'MISS'
+    return response
+
+@app.route('/api/inference/predict', methods=['POST'])
+def predict():
+    """模型推理/验证"""
+    if 'image' not in request.files:
+        return jsonify({'code': 400, 'message': '没有上传图片'}), 400
+    
+    image_file = request.files['image']
+    model_id = request.form.get('model_id')
+    confidence = float(request.form.get('confidence', 0.25))
+    iou = float(request.form.get('iou', 0.45))
+    imgsz = request.form.get('imgsz', type=int)
+    # 返回模式：dataurl（默认，JSON 内嵌 base64 图片）/ detections（仅检测结果，不绘制）/ image（二进制图片）
+    return_mode = request.form.get('return', 'dataurl')
+    image_format = request.form.get('format', app.config['INFERENCE_IMAGE_FORMAT']).lower()
+    image_quality = request.form.get('quality', app.config['INFERENCE_IMAGE_QUALITY'], type=int)
+    # 分割掩码格式：polygon（默认）/ rle / none
+    mask_format = request.form.get('masks', 'polygon')
+    engine = request.form.get('engine', app.config['INFERENCE_DEFAULT_ENGINE'])
+    # 切片推理：指定 tile_size 时启用，适用于高分辨率图片中的小目标
+    tile_size = request.form.get('tile_size', type=int)
+    tile_overlap = request.form.get('tile_overlap', 0.2, type=float)
+    tile_batch = request.form.get('tile_batch', app.config['INFERENCE_MAX_BATCH_SIZE'], type=int)
+    
+    if not model_id:
+        return jsonify({'code': 400, 'message': '缺少模型 ID'}), 400
+    
+    if tile_size is not None and (tile_size < 32 or not 0 <= tile_overlap < 1):
+        return jsonify({'code': 400, 'message': '切片参数无效'}), 400
+    
+    if return_mode not in ('dataurl', 'detections', 'image'):
+        return jsonify({'code': 400, 'message': f'不支持的返回模式: {return_mode}'}), 400
+    
+    if image_format not in IMAGE_FORMATS and image_format != 'jpg':
+        return jsonify({'code': 400, 'message': f'不支持的图片格式: {image_format}'}), 400
+    
+    try:
+        # 获取模型
+        model = Model.query.get(model_id)
+        if not model:
+            return jsonify({'code': 404, 'message': '模型不存在'}), 404
+        
+        if not model.weight_path or not os.path.exists(model.weight_path):
+            return jsonify({'code': 404, 'message': '模型文件不存在'}), 404
+        
+        # 选择推理引擎（优先使用导出的 CPU 引擎，不可用时回退到 .pt）
+        weight_path, used_engine = export_service.resolve_engine(model, engine)
+        task_type = model.task_type
+        
+        if tile_size and task_type == 'classify':
+            return jsonify({'code': 400, 'message': '分类模型不支持切片推理'}), 400
+        
+        # 相同图片 + 相同模型/参数直接返回缓存结果
+        image_bytes = image_file.read()
+        cache_params = (confidence, iou, imgsz, return_mode, mask_format, tile_size, tile_overlap,
+                        image_format if return_mode != 'detections' else None,
+                        image_quality if return_mode != 'detections' else None)
+        cache_key = result_cache.make_key(image_bytes, model.id, weight_path, cache_params)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return _predict_response(return_mode, cached, cached=True)
+        
+        # 读取图片
+        img = decode_image(image_bytes)
+        
+        if img is None:
+            return jsonify({'code': 400, 'message': '无效的图片文件'}), 400
+        
+        import time
+        start_time = time.time()
+        if tile_size:
+            # 切片推理：分批推理切片后全局 NMS 合并到原图坐标（分割任务仅返回框）
+            result = predict_tiled(
+                model_cache.get(weight_path, task=task_type),
+                img,
+                tile_size=tile_size,
+                overlap=tile_overlap,
+                batch_size=max(1, tile_batch),
+                conf=confidence,
+                iou=iou,
+                imgsz=imgsz,
+                lock=model_cache.model_lock(weight_path)
+            )
+        else:
+            # 执行推理（经调度器与并发请求合并为批量推理，模型来自缓存）
+            result = inference_scheduler.predict(
+                weight_path,
+                img,
+                conf=confidence,
+                iou=iou,
+                imgsz=imgsz,
+                task=task_type
+            )
+        inference_time = int((time.time() - start_time) * 1000)
+        
+        # 解析结果
+        output = {
+            'detections': extract_detections(result, task_type, mask_format=mask_format),
+            'image': None,
+            'mimetype': None,
+            'inference_time': inference_time,
+            'task_type': task_type,
+            'engine': used_engine
+        }
+        
+        if return_mode != 'detections':
+            # 仅返回检测结果时跳过绘制与编码
+            annotated_img = render_result(result, task_type, img, output['detections'])
+            output['image'], output['mimetype'] = encode_image(annotated_img, image_format, image_quality)
+        
+        result_cache.put(cache_key, output, model.id)
+        return _predict_response(return_mode, output)
+    except Exception as e:
+        import traceback
+        error_trace = traceback.format_exc()
+        print(f"Inference error: {str(e)}")
+        print(error_trace)
+        return jsonify({'code': 500, 'message': f'识别失败: {str(e)}'}), 500
+
+@app.route('/api/inference/predict-batch', methods=['POST'])
+def predict_batch():
+    """批量推理：上传多张图片（images 字段）或压缩包（archive 字段），以 NDJSON 流式返回每张图片的结果"""
+    model_id = request.form.get('model_id')
+    confidence = float(request.form.get('confidence', 0.25))
+    iou = float(request.form.get('iou', 0.45))
+    imgsz = request.form.get('imgsz', type=int)
+    batch_size = request.form.get('batch_size', app.config['INFERENCE_MAX_BATCH_SIZE'], type=int)
+    batch_size = max(1, min(batch_size, 64))
+    mask_format = request.form.get('masks', 'polygon')
+    engine = request.form.get('engine', app.config['INFERENCE_DEFAULT_ENGINE'])
+    
+    if not model_id:
+        return jsonify({'code': 400, 'message': '缺少模型 ID'}), 400
+    
+    model = Model.query.get(model_id)
+    if not model:
+        return jsonify({'code': 404, 'message': '模型不存在'}), 404
+    
+    if not model.weight_path or not os.path.exists(model.weight_path):
+        return jsonify({'code': 404, 'message': '模型文件不存在'}), 404
+    
+    # 上传文件在流式响应开始前就会关闭，先落盘到临时目录，推理结束后清理
+    import shutil
+    import tempfile
+    import zipfile
+    temp_dir = tempfile.mkdtemp(prefix='batch_', dir=app.config['UPLOAD_FOLDER'])
+    
+    def read_file(path):
+        with open(path, 'rb') as f:
+            return f.read()
+    
+    # 收集待推理的图片来源：(文件名, 读取字节的函数)
+    sources = []
+    archive = None
+    try:
+        if 'archive' in request.files:
+            archive_path = os.path.join(temp_dir, 'archive.zip')
+            request.files['archive'].save(archive_path)
+            archive = zipfile.ZipFile(archive_path)
+            # 读取前按中央目录检查，zipfile 读取成员时不会超出声明的大小
+            max_image_bytes = app.config['INFERENCE_ARCHIVE_MAX_IMAGE_BYTES']
+            for info, name in inference_archive_checker.scan(archive):
+                if not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                if info.file_size > max_image_bytes:
+                    raise ArchiveError(f'图片超过 {max_image_bytes} 字节: {name}')
+                sources.append((info.filename, lambda info=info: archive.read(info)))
+        for i, image_file in enumerate(request.files.getlist('images')):
+            image_path = os.path.join(temp_dir, f'{i}_{secure_filename(image_file.filename or "")}')
+            image_file.save(image_path)
+            sources.append((image_file.filename, lambda image_path=image_path: read_file(image_path)))
+    except zipfile.BadZipFile:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        return jsonify({'code': 400, 'message': '无效的压缩包'}), 400
+    except ArchiveError as e:
+        archive.close()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        return jsonify({'code': 400, 'message': str(e)}), 400
+    
+    if not sources:
+        if archive is not None:
+            archive.close()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        return jsonify({'code': 400, 'message': '没有上传图片'}), 400
+    
+    weight_path, used_engine = export_service.resolve_engine(model, engine)
+    task_type = model.task_type
+    predict_kwargs = {'conf': confidence, 'iou': iou, 'verbose': False}
+    if imgsz:
+        predict_kwargs['imgsz'] = imgsz
+    
+    def generate():
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        
+        total_start = time.time()
+        yolo_model = model_cache.get(weight_path, task=task_type)
+        names_array = class_names_array(yolo_model.names)
+        
+        def load(source):
+            filename, read = source
+            try:
+                return filename, decode_image(read())
+            except Exception:
+                return filename, None
+        
+        chunks = [sources[i:i + batch_size] for i in range(0, len(sources), batch_size)]
+        with ThreadPoolExecutor(max_workers=app.config['INFERENCE_DECODE_WORKERS']) as executor:
+            # 解码下一批的同时推理当前批，内存中最多保留两批图片
+            pending = [executor.submit(load, s) for s in chunks[0]]
+            index = 0
+            for chunk_idx in range(len(chunks)):
+                decoded = [f.result() for f in pending]
+                if chunk_idx + 1 < len(chunks):
+                    pending = [executor.submit(load, s) for s in chunks[chunk_idx + 1]]
+                
+                valid = [(i, item) for i, item in enumerate(decoded) if item[1] is not None]
+                results = []
+                start_time = time.time()
+                if valid:
+                    try:
+                        with model_cache.model_lock(weight_path):
+                            results = yolo_model.predict([item[1] for _, item in valid], **predict_kwargs)
+                    except Exception as e:
+                        print(f"Batch inference error: {str(e)}")
+                        for filename, _ in decoded:
+                            yield json.dumps({'index': index, 'filename': filename, 'error': str(e)}, ensure_ascii=False) + '\n'
+                            index += 1
+                        continue
+                inference_time = int((time.time() - start_time) * 1000)
+                
+                result_map = {i: r for (i, _), r in zip(valid, results)}
+                for i, (filename, _) in enumerate(decoded):
+                    if i not in result_map:
+                        line = {'index': index, 'filename': filename, 'error': '无效的图片文件'}
+                    else:
+                        line = {
+                            'index': index,
+                            'filename': filename,
+                            'detections': extract_detections(
+                                result_map[i], task_type, names_array=names_array, mask_format=mask_format
+                            ),
+                            'inference_time': inference_time,
+                            'batch_size': len(valid),
+                            'task_type': task_type
+                        }
+                    yield json.dumps(line, ensure_ascii=False) + '\n'
+                    index += 1
+        
+        yield json.dumps({
+            'done': True,
+            'count': len(sources),
+            'engine': used_engine,
+            'total_time': int((time.time() - total_start) * 1000)
+        }) + '\n'
+    
+    def generate_and_cleanup():
+        try:
+            yield from generate()
+        finally:
+            if archive is not None:
+                archive.close()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    return Response(stream_with_context(generate_and_cleanup()), mimetype='application/x-ndjson')
+
+@app.route('/api/inference/video', methods=['POST'])
+def predict_video():
+    """视频推理：上传视频文件（video 字段）或指定流地址（stream_url），逐帧流式返回检测结果
+
+    output=ndjson（默认）每帧一行 JSON；output=mjpeg 返回带标注的 MJPEG 流，每帧检测结果放在 X-Frame-Meta 头。
+    """
+    model_id = request.form.get('model_id')
+    confidence = float(request.form.get('confidence', 0.25))
+    iou = float(request.form.get('iou', 0.45))
+    imgsz = request.form.get('imgsz', type=int)
+    stride = request.form.get('stride', 1, type=int)
+    target_fps = request.form.get('target_fps', type=float)
+    batch_size = request.form.get('batch_size', app.config['INFERENCE_MAX_BATCH_SIZE'], type=int)
+    output = request.form.get('output', 'ndjson')
+    engine = request.form.get('engine', app.config['INFERENCE_DEFAULT_ENGINE'])
+    image_format = request.form.get('format', app.config['INFERENCE_IMAGE_FORMAT']).lower()
+    image_quality = request.form.get('quality', 80, type=int)
+    stream_url = request.form.get('stream_url')
+    
+    if not model_id:
+        return jsonify({'code': 400, 'message': '缺少模型 ID'}), 400
+    
+    if output not in ('ndjson', 'mjpeg'):
+        return jsonify({'code': 400, 'message': f'不支持的输出格式: {output}'}), 400
+    
+    if image_format not in IMAGE_FORMATS and image_format != 'jpg':
+        return jsonify({'code': 400, 'message': f'不支持的图片格式: {image_format}'}), 400
+    
+    model = Model.query.get(model_id)
+    if not model:
+        return jsonify({'code': 404, 'message': '模型不存在'}), 404
+    
+    if not model.weight_path or not os.path.exists(model.weight_path):
+        return jsonify({'code': 404, 'message': '模型文件不存在'}), 404
+    
+    cleanup_path = None
+    if 'video' in request.files:
+        # 上传的视频先落盘，由读帧线程按帧解码，不丢帧
+        video_file = request.files['video']
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        source = os.path.join(app.config['UPLOAD_FOLDER'], f'video_{timestamp}_{secure_filename(video_file.filename or "")}')
+        video_file.save(source)
+        cleanup_path = source
+        drop_frames = False
+    elif stream_url:
+        if not app.config['VIDEO_STREAM_URLS_ENABLED']:
+            return jsonify({'code': 403, 'message': '未启用流地址推理'}), 403
+        if not stream_url.startswith(('http://', 'https://', 'rtsp://')):
+            return jsonify({'code': 400, 'message': '不支持的流地址'}), 400
+        # 实时流：推理跟不上时丢帧，避免延迟累积
+        source = stream_url
+        drop_frames = True
+    else:
+        return jsonify({'code': 400, 'message': '没有上传视频'}), 400
+    
+    def cleanup():
+        if cleanup_path and os.path.exists(cleanup_path):
+            os.remove(cleanup_path)
+    
+    try:
+        weight_path, _ = export_service.resolve_engine(model, engine)
+        generator = video_service.stream(
+            source,
+            weight_path,
+            model.task_type,
+            conf=confidence,
+            iou=iou,
+            imgsz=imgsz,
+            stride=stride,
+            target_fps=target_fps,
+            batch_size=max(1, batch_size),
+            output=output,
+            drop_frames=drop_frames,
+            image_format=image_format,
+            quality=image_quality
+        )
+    except Exception:
+        cleanup()
+        raise
+    
+    if output == 'mjpeg':
+        response = Response(generator, mimetype='multipart/x-mixed-replace; boundary=frame')
+    else:
+        response = Response(generator, mimetype='application/x-ndjson')
+    # 响应关闭时（先关闭生成器、停止读帧线程）删除上传的临时视频；生成器从未被迭代时同样会执行
+    response.call_on_close(cleanup)
+    return response
+
+@app.route('/api/inference/stats', methods=['GET'])
+def get_inference_stats():
+    """获取推理缓存统计信息"""
+    return jsonify({
+        'code': 200,
+        'data': {
+            'model_cache': model_cache.stats(),
+            'scheduler': inference_scheduler.stats(),
+            'video': video_service.stats(),
+            'result_cache': result_cache.stats()
+        },
+        'message': '获取成功'
+    })
@@ -0,0 +1,135 @@
+import time
+import threading
+from sqlalchemy import event, func, literal, null, union_all, select, case, inspect
+from sqlalchemy.orm import Session
+from models import db, Dataset, Model, TrainingTask
+
+# 影响统计结果的字段：行新增/删除，或这些字段变化时缓存失效
+_TRACKED_FIELDS = {
+    Dataset: ('status', 'task_type', 'size'),
+    Model: ('task_type', 'size'),
+    TrainingTask: ('status', 'task_type', 'started_at', 'completed_at')
+}
+
+
+class StatsService:
+    """仪表盘统计
+
+    一条 UNION ALL + GROUP BY 查询统计三张表：任务按状态/类型计数与平均训练时长，
+    数据集按状态/类型计数与总大小，模型按类型计数与总大小。结果缓存在进程内，
+    通过 SQLAlchemy session 事件在相关行新增、删除或状态变化并提交后失效；
+    ttl 兜底其他进程直接修改数据库的情况。
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._cached = None
+        self._expires_at = 0
+        self._generation = 0
+        self._register_events()
+
+    def get(self):
+        with self._lock:
+            if self._cached is not None and time.time() < self._expires_at:
+                return self._cached
+            generation = self._generation
+        stats = self._compute()
+        with self._lock:
+            # 计算期间发生失效则不缓存这次结果
+            if generation == self._generation:
+                self._cached = stats
+                self._expires_at = time.time() + self.ttl
+        return stats
+
+    def invalidate(self):
+        with self._lock:
+            self._cached = None
+            self._generation += 1
+
+    def _compute(self):
+        completed = TrainingTask.status == 'completed'
+        duration = (func.julianday(TrainingTask.completed_at) - func.julianday(TrainingTask.started_at)) * 86400
+        tasks = select(
+            literal('task').label('kind'), TrainingTask.status.label('status'),
+            TrainingTask.task_type.label('task_type'), func.count().label('count'),
+            null().label('bytes'),
+            func.avg(case((completed, duration))).label('avg_duration'),
+            func.count(case((completed, duration))).label('timed')
+        ).group_by(TrainingTask.status, TrainingTask.task_type)
+        datasets = select(
+            literal('dataset'), Dataset.status, Dataset.task_type, func.count(),
+            func.sum(Dataset.size), null(), literal(0)
+        ).group_by(Dataset.status, Dataset.task_type)
+        models = select(
+            literal('model'), null(), Model.task_type, func.count(),
+            func.sum(Model.size), null(), literal(0)
+        ).group_by(Model.task_type)
+
+        stats = {
+            'dataset_count': 0, 'model_count': 0, 'task_count': 0, 'training_count': 0,
+            'tasks_by_status': {}, 'tasks_by_type': {},
+            'datasets_by_status': {}, 'datasets_by_type': {}, 'models_by_type': {},
+            'dataset_total_bytes': 0, 'model_total_bytes': 0, 'avg_training_duration': None
+        }
+        duration_sum = 0.0
+        duration_count = 0
+        for kind, status, task_type, count, size, avg_duration, timed in db.session.execute(union_all(tasks, datasets, models)):
+            if kind == 'task':
+                stats['task_count'] += count
+                stats['tasks_by_status'][status] = stats['tasks_by_status'].get(status, 0) + count
+                stats['tasks_by_type'][task_type] = stats['tasks_by_type'].get(task_type, 0) + count
+                if timed:
+                    duration_sum += avg_duration * timed
+                    duration_count += timed
+            elif kind == 'dataset':
+                stats['dataset_count'] += count
+                stats['dataset_total_bytes'] += size or 0
+                stats['datasets_by_status'][status] = stats['datasets_by_status'].get(status, 0) + count
+                stats['datasets_by_type'][task_type] = stats['datasets_by_type'].get(task_type, 0) + count
+            else:
+                stats['model_count'] += count
+                stats['model_total_bytes'] += size or 0
+                stats['models_by_type'][task_type] = stats['models_by_type'].get(task_type, 0) + count
+
+        stats['training_count'] = stats['tasks_by_status'].get('training', 0)
+        if duration_count:
+            stats['avg_training_duration'] = round(duration_sum / duration_count, 1)  # 秒
+        return stats
+
+    def _register_events(self):
+        def mark(session):
+            session.info['stats_dirty'] = True
+
+        @event.listens_for(Session, 'after_flush')
+        def after_flush(session, flush_context):
+            for obj in list(session.new) + list(session.deleted):
+                if type(obj) in _TRACKED_FIELDS:
+                    return mark(session)
+            for obj in session.dirty:
+                fields = _TRACKED_FIELDS.get(type(obj))
+                if fields and session.is_modified(obj) and any(
+                    inspect(obj).attrs[f].history.has_changes() for f in fields
+                ):
+                    return mark(session)
+
+        @event.listens_for(Session, 'after_bulk_update')
+        def after_bulk_update(update_context):
+            fields = _TRACKED_FIELDS.get(update_context.mapper.class_)
+            keys = {getattr(k, 'key', k) for k in (update_context.values or {})}
+            if fields and keys & set(fields):
+                mark(update_context.session)
+
+        @event.listens_for(Session, 'after_bulk_delete')
+        def after_bulk_delete(delete_context):
+            if delete_context.mapper.class_ in _TRACKED_FIELDS:
+                mark(delete_context.session)
+
+        @event.listens_for(Session, 'after_commit')
+        def after_commit(session):
+            if session.info.pop('stats_dirty', False):
+                self.invalidate()
+
+        @event.listens_for(Session, 'after_rollback')
+        def after_rollback(session):
+            session.info.pop('stats_dirty', None)
@@ -0,0 +1,119 @@
+import json
+import threading
+from collections import OrderedDict, deque
+
+TERMINAL_STATUSES = ('completed', 'failed', 'stopped')
+
+
+class _TaskChannel:
+    """单个任务的事件通道：自增事件 ID + 有界历史，订阅者阻塞在条件变量上等待新事件"""
+
+    def __init__(self, history_size):
+        self.events = deque(maxlen=history_size)  # (event_id, event_type, data)
+        self.next_id = 1
+        self.cond = threading.Condition()
+        self.closed = False
+
+
+class TaskEventBus:
+    """训练任务事件总线（Server-Sent Events）
+
+    训练监控线程发布 status / epoch / metric / log 事件，订阅者按任务订阅。
+    每个任务保留最近 history_size 条事件，客户端通过 Last-Event-ID 断线续传；
+    空闲订阅者只阻塞在条件变量上，定期发送一次心跳注释，几乎不占用资源。
+    """
+
+    def __init__(self, history_size=500, max_tasks=256, keepalive=15):
+        self.history_size = history_size
+        self.max_tasks = max_tasks
+        self.keepalive = keepalive
+        self._channels = OrderedDict()  # task_id -> _TaskChannel
+        self._lock = threading.Lock()
+        self.subscribers = 0
+        self.published = 0
+
+    def _channel(self, task_id):
+        with self._lock:
+            channel = self._channels.get(task_id)
+            if channel is None:
+                channel = self._channels[task_id] = _TaskChannel(self.history_size)
+                # 超出上限时丢弃最久未使用的通道（已连接的订阅者仍持有引用）
+                if len(self._channels) > self.max_tasks:
+                    for old_id in list(self._channels):
+                        if old_id != task_id:
+                            del self._channels[old_id]
+                            break
+            else:
+                self._channels.move_to_end(task_id)
+            return channel
+
+    def publish(self, task_id, event_type, data):
+        """发布事件，返回事件 ID"""
+        channel = self._channel(task_id)
+        with channel.cond:
+            event_id = channel.next_id
+            channel.next_id += 1
+            channel.events.append((event_id, event_type, data))
+            if event_type == 'status':
+                channel.closed = data.get('status') in TERMINAL_STATUSES
+            channel.cond.notify_all()
+        self.published += 1
+        return event_id
+
+    def subscribe(self, task_id, last_event_id=0, snapshot=None):
+        """生成 SSE 文本流
+
+        last_event_id 之后的历史事件先补发；无 Last-Event-ID 时先发送 snapshot（当前状态）。
+        任务进入终止状态后，事件发完即结束流。
+        """
+        channel = self._channel(task_id)
+        with self._lock:
+            self.subscribers += 1
+        try:
+            yield 'retry: 3000\n\n'
+            if snapshot is not None and not last_event_id:
+                yield self.format_event(None, 'snapshot', snapshot)
+                if snapshot.get('status') in TERMINAL_STATUSES and not channel.events:
+                    return
+
+            cursor = last_event_id or 0
+            with channel.cond:
+                if cursor >= channel.next_id:
+                    # 服务重启后事件 ID 重新编号，从头补发
+                    cursor = 0
+            while True:
+                with channel.cond:
+                    pending = [e for e in channel.events if e[0] > cursor]
+                    if not pending and not channel.closed:
+                        channel.cond.wait(self.keepalive)
+                        pending = [e for e in channel.events if e[0] > cursor]
+                    closed = channel.closed
+
+                if pending:
+                    for event_id, event_type, data in pending:
+                        yield self.format_event(event_id, event_type, data)
+                    cursor = pending[-1][0]
+                elif closed:
+                    return
+                else:
+                    yield ': keep-alive\n\n'
+        finally:
+            with self._lock:
+                self.subscribers -= 1
+
+    @staticmethod
+    def format_event(event_id, event_type, data):
+        lines = []
+        if event_id is not None:
+            lines.append(f'id: {event_id}')
+        lines.append(f'event: {event_type}')
+        lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+        return '\n'.join(lines) + '\n\n'
+
+    def stats(self):
+        with self._lock:
+            return {
+                'channels': len(self._channels),
+                'subscribers': self.subscribers,
+                'published': self.published
+            }
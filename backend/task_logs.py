@@ -0,0 +1,114 @@
+import os
+import threading
+from collections import deque
+
+
+class _TaskLog:
+    def __init__(self, max_lines):
+        self.lines = deque(maxlen=max_lines)  # (seq, line)
+        self.next_seq = 1
+        self.file = None
+
+
+class TaskLogStore:
+    """训练日志存储
+
+    训练中的任务在内存中只保留最近 max_lines 行（环形缓冲，内存占用与训练轮数无关），
+    完整日志逐行追加写入 logs_dir/task_<id>.log，训练结束后释放内存缓冲。行号 seq 从 1 开始，
+    与日志文件行号一致，客户端以 after=<seq> 游标增量读取：缓冲内的行直接返回，其余从文件读取。
+    """
+
+    def __init__(self, logs_dir, max_lines=1000, max_line_length=2000):
+        self.logs_dir = logs_dir
+        self.max_lines = max_lines
+        self.max_line_length = max_line_length
+        self._logs = {}  # task_id -> _TaskLog
+        self._lock = threading.Lock()
+        os.makedirs(logs_dir, exist_ok=True)
+
+    def log_path(self, task_id):
+        return os.path.join(self.logs_dir, f'task_{task_id}.log')
+
+    def _get(self, task_id):
+        log = self._logs.get(task_id)
+        if log is None:
+            log = self._logs[task_id] = _TaskLog(self.max_lines)
+            # 服务重启后续写已有日志文件，保持行号连续
+            path = self.log_path(task_id)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    log.next_seq = sum(1 for _ in f) + 1
+        return log
+
+    def append(self, task_id, line):
+        """追加一行日志，返回行号"""
+        line = line.rstrip('\r\n').replace('\n', ' ')
+        if len(line) > self.max_line_length:
+            line = line[:self.max_line_length] + '...'
+        with self._lock:
+            log = self._get(task_id)
+            seq = log.next_seq
+            log.next_seq += 1
+            log.lines.append((seq, line))
+            try:
+                if log.file is None:
+                    log.file = open(self.log_path(task_id), 'a', encoding='utf-8')
+                log.file.write(line + '\n')
+                log.file.flush()
+            except OSError as e:
+                print(f"Failed to write log for task {task_id}: {e}")
+            return seq
+
+    def close(self, task_id):
+        """训练结束后关闭日志文件并释放内存缓冲，之后的读取走日志文件"""
+        with self._lock:
+            log = self._logs.pop(task_id, None)
+            if log is not None and log.file is not None:
+                log.file.close()
+
+    def remove(self, task_id):
+        self.close(task_id)
+        path = self.log_path(task_id)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def tail(self, task_id, count=100):
+        """最近 count 行"""
+        with self._lock:
+            log = self._logs.get(task_id)
+            if log is not None:
+                return [line for _, line in list(log.lines)[-count:]]
+        path = self.log_path(task_id)
+        if not os.path.exists(path):
+            return []
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return [line.rstrip('\n') for line in deque(f, maxlen=count)]
+
+    def read(self, task_id, after=0, limit=500):
+        """读取行号大于 after 的至多 limit 行，返回 [(seq, line)]"""
+        with self._lock:
+            log = self._logs.get(task_id)
+            buffered = list(log.lines) if log is not None else []
+        if buffered and buffered[0][0] <= after + 1:
+            return [item for item in buffered if item[0] > after][:limit]
+
+        # 游标早于内存缓冲（或服务重启后），从日志文件读取
+        path = self.log_path(task_id)
+        if not os.path.exists(path):
+            return []
+        result = []
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for seq, line in enumerate(f, start=1):
+                if seq <= after:
+                    continue
+                result.append((seq, line.rstrip('\n')))
+                if len(result) >= limit:
+                    break
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tasks': len(self._logs),
+                'buffered_lines': sum(len(log.lines) for log in self._logs.values())
+            }
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from dataset_validator import DatasetValidator, check_images
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('app', 'server', 'models', 'flask', 'flask_sqlalchemy', 'torch', 'ultralytics')
+
+
+def _loaded_modules():
+    return sorted(sys.modules)
+
+
+def _make_images(root, count=4):
+    paths = []
+    for i in range(count):
+        path = f'img_{i}.png'
+        Image.new('RGB', (32, 32), (i * 40, 0, 0)).save(os.path.join(root, path))
+        paths.append(path)
+    with open(os.path.join(root, 'broken.jpg'), 'wb') as f:
+        f.write(b'\xff\xd8\xff\xe0not a jpeg')
+    return paths + ['broken.jpg']
+
+
+def test_parallel_check_matches_in_process(tmp_path):
+    paths = _make_images(str(tmp_path))
+    validator = DatasetValidator(max_workers=2, batch_size=2, min_parallel_files=0)
+    parallel = sorted(validator._check(str(tmp_path), paths))
+    assert parallel == sorted(check_images(str(tmp_path), paths))
+    assert [problem for path, problem, _ in parallel if path == 'broken.jpg'] == ['corrupt_image']
+
+
+def test_validation_worker_does_not_import_app(tmp_path):
+    paths = _make_images(str(tmp_path))
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+        executor.submit(check_images, str(tmp_path), paths).result()
+        modules = executor.submit(_loaded_modules).result()
+    assert not [name for name in modules if name.split('.')[0] in HEAVY_MODULES]
+
+
+def test_app_entry_is_inert_when_reexecuted_by_spawn():
+    # spawn 子进程以 __mp_main__ 重新执行入口文件 app.py，不应创建应用或导入 server
+    code = (
+        "import runpy, sys\n"
+        "runpy.run_path('app.py', run_name='__mp_main__')\n"
+        f"print(sorted(m for m in sys.modules if m.split('.')[0] in {HEAVY_MODULES!r}))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == '[]'
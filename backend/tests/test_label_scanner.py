@@ -0,0 +1,73 @@
+from label_scanner import LabelScanner, _parse_rows
+
+
+def _scan(tmp_path, files, task_type='detect', nc=None):
+    for name, text in files.items():
+        (tmp_path / name).write_text(text)
+    return LabelScanner(max_workers=1).scan(str(tmp_path), list(files), task_type, nc)
+
+
+def test_parse_rows_reports_non_numeric_class():
+    rows, kept, issues = _parse_rows(b'x 0.5 0.5 0.1 0.1\n0 0.5 0.5 0.2 0.2\n', segment=False)
+    assert rows.shape == (1, 5)
+    assert kept == [2]
+    assert issues == [(1, 'not_numeric')]
+
+
+def test_parse_rows_reports_non_numeric_coordinate():
+    rows, kept, issues = _parse_rows(b'0 0.5 abc 0.1 0.1\n1 0.5 0.5 0.2 0.2\n', segment=False)
+    assert rows.tolist() == [[1, 0.5, 0.5, 0.2, 0.2]]
+    assert kept == [2]
+    assert issues == [(1, 'not_numeric')]
+
+
+def test_parse_rows_reports_short_row():
+    rows, kept, issues = _parse_rows(b'0 0.5 0.5 0.1\n1 0.5 0.5 0.2 0.2\n', segment=False)
+    assert rows.shape == (1, 5)
+    assert issues == [(1, 'column_count')]
+
+
+def test_parse_rows_segment_polygon():
+    rows, kept, issues = _parse_rows(b'2 0.1 0.1 0.5 0.1 0.5 0.3\n2 0.1 x 0.5 0.1 0.5 0.3\n', segment=True)
+    assert kept == [1]
+    assert rows[0, 0] == 2
+    assert rows[0, 3:].round(6).tolist() == [0.4, 0.2]
+    assert issues == [(2, 'not_numeric')]
+
+
+def test_scan_survives_malformed_rows(tmp_path):
+    report = _scan(tmp_path, {
+        'a.txt': '0 0.5 abc 0.1 0.1\n1 0.5 0.5 0.2 0.2\n',
+        'b.txt': 'x 0.5 0.5 0.1 0.1\n',
+        'c.txt': '0 0.5 0.5 0.1\n',
+        'd.txt': '0 0.5 0.5 nan 0.1\n2 0.5 0.5 0.3 0.3\n',
+    })
+    assert report['files']['a.txt'] == (1, [1])
+    assert report['files']['b.txt'] == (0, [])
+    assert report['files']['c.txt'] == (0, [])
+    assert report['issue_counts'] == {'not_numeric': 2, 'column_count': 1, 'coords_out_of_range': 1}
+    assert {(i['file'], i['line']) for i in report['issues']} == {
+        ('a.txt', 1), ('b.txt', 1), ('c.txt', 1), ('d.txt', 1)
+    }
+    assert report['classes'] == [0, 1, 2]
+
+
+def test_scan_reports_huge_class_id(tmp_path):
+    report = _scan(tmp_path, {
+        'a.txt': '3000000000 0.5 0.5 0.1 0.1\n0 0.5 0.5 0.2 0.2\n',
+    })
+    assert report['files']['a.txt'] == (1, [0])
+    assert report['issue_counts'] == {'class_out_of_range': 1}
+    assert report['classes'] == [0]
+    assert report['nc'] == 1
+
+
+def test_scan_stray_class_id_does_not_inflate_nc(tmp_path):
+    report = _scan(tmp_path, {
+        'a.txt': '0 0.5 0.5 0.1 0.1\n1 0.5 0.5 0.2 0.2\n',
+        'b.txt': '300000 0.5 0.5 0.1 0.1\n1 0.5 0.5 0.2 0.2\n',
+    })
+    assert report['nc'] == 2
+    assert report['class_instances'] == {'0': 1, '1': 2}
+    assert report['class_images'] == {'0': 1, '1': 2}
+    assert report['issues'] == [{'file': 'b.txt', 'line': 1, 'reason': 'class_out_of_range'}]
@@ -0,0 +1,81 @@
+import numpy as np
+import torch
+import torchvision
+from ultralytics.engine.results import Results
+
+
+def iter_tiles(height, width, tile_size=640, overlap=0.2):
+    """按行生成切片窗口 (x0, y0, x1, y1)，末尾切片贴齐图像边缘"""
+    stride = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, stride))
+        positions.append(length - tile_size)
+        return positions
+
+    for y0 in starts(height):
+        for x0 in starts(width):
+            yield x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height)
+
+
+def _take(iterator, n):
+    batch = []
+    for item in iterator:
+        batch.append(item)
+        if len(batch) >= n:
+            break
+    return batch
+
+
+def predict_tiled(yolo_model, img, tile_size=640, overlap=0.2, batch_size=8, conf=0.25, iou=0.45,
+                  imgsz=None, include_full=True, lock=None):
+    """切片推理：大图按重叠切片分批送入模型，框映射回原图坐标后做全局 NMS
+
+    切片窗口惰性生成、逐批推理，任意时刻只保留一个批次的切片（numpy 视图，不拷贝原图），
+    内存占用与原图分辨率无关。include_full 时额外对整图做一次缩放推理，保留大目标。
+    返回 ultralytics Results 对象，可直接用于 extract_detections / render_result。
+    """
+    height, width = img.shape[:2]
+    kwargs = {'conf': conf, 'iou': iou, 'verbose': False, 'imgsz': imgsz or tile_size}
+    collected = []  # 每项为原图坐标下的 (N, 6) [x1, y1, x2, y2, conf, cls]
+    names = yolo_model.names
+    num_tiles = 0
+
+    def run(crops, offsets):
+        if lock is not None:
+            with lock:
+                results = yolo_model.predict(crops, **kwargs)
+        else:
+            results = yolo_model.predict(crops, **kwargs)
+        for result, (dx, dy) in zip(results, offsets):
+            if result.boxes is None or len(result.boxes) == 0:
+                continue
+            data = result.boxes.data[:, :6].cpu().numpy().copy()
+            data[:, [0, 2]] += dx
+            data[:, [1, 3]] += dy
+            collected.append(data)
+
+    tiles = iter_tiles(height, width, tile_size, overlap)
+    while True:
+        windows = _take(tiles, batch_size)
+        if not windows:
+            break
+        num_tiles += len(windows)
+        run([img[y0:y1, x0:x1] for x0, y0, x1, y1 in windows], [(x0, y0) for x0, y0, _, _ in windows])
+
+    if include_full and num_tiles > 1:
+        run([img], [(0, 0)])
+
+    if collected:
+        data = torch.from_numpy(np.concatenate(collected).astype(np.float32))
+        # 按类别做全局 NMS，合并重叠区域内的重复框
+        keep = torchvision.ops.batched_nms(data[:, :4], data[:, 4], data[:, 5].long(), iou)
+        data = data[keep]
+    else:
+        data = torch.zeros((0, 6), dtype=torch.float32)
+
+    result = Results(img, path='tiled', names=names, boxes=data)
+    result.num_tiles = num_tiles
+    return result
@@ -1,103 +1,98 @@
 import os
 import shutil
-import zipfile
 import threading
+import multiprocessing
+import queue
 import json
+import uuid
 from datetime import datetime
-from ultralytics import YOLO
 import yaml
+from train_worker import run_training_worker
+from task_events import TaskEventBus
+from task_logs import TaskLogStore
+from progress_writer import ProgressWriter
+from dataset_ingest import DatasetIngestor
+from label_scanner import LabelScanner
 os.environ["KMP_DUPLICATE_LIB_OK"]="TRUE"
+
+class TrainingProcessError(Exception):
+    """训练进程内部抛出的异常，携带子进程中的堆栈"""
+    def __init__(self, message, child_traceback):
+        super().__init__(message)
+        self.child_traceback = child_traceback
+
+# TrainingTask.logs 只保存错误摘要，完整输出见日志文件
+MAX_TASK_LOG_CHARS = 8000
+
 class TrainingService:
     def __init__(self, datasets_dir, models_dir, runs_dir):
         self.datasets_dir = datasets_dir
         self.models_dir = models_dir
         self.runs_dir = runs_dir
         self.training_threads = {}
+        self.training_processes = {}
         self.training_progress = {}
+        # 停止请求：stop_training 总会登记，训练线程在启动进程前与标记完成前持锁检查
+        self.stop_requested = set()
+        self._stop_lock = threading.Lock()
+        # 训练事件总线（SSE 推送）
+        self.events = TaskEventBus()
+        # 数据集压缩包导入（可由 app 按配置替换）
+        self.ingestor = DatasetIngestor()
+        # 检测/分割标签全量扫描（类别与标注统计）
+        self.label_scanner = LabelScanner()
+        # 训练日志：内存环形缓冲 + 日志文件
+        self.logs = TaskLogStore(os.path.join(runs_dir, 'logs'))
+        # 每个训练进程的计算线程数与数据加载进程数（None 表示使用默认值）
+        self.threads_per_process = None
+        self.dataloader_workers = None
+        # 由 app 注入：Flask 应用、进度写回缓冲、导出服务、任务结束回调（通知调度器）
+        self.app = None
+        self.progress_writer = None
+        self.export_service = None
+        self.image_cache = None  # ImageCacheManager，检测/分割训练共享的预处理图片缓存
+        self.auto_export_engines = []
+        self.on_task_finished = None
         
-    def process_dataset(self, zip_path, name, task_type):
-        """处理上传的数据集压缩包"""
+    def process_dataset(self, zip_path, name, task_type, dataset_id=None):
+        """处理上传的数据集压缩包，返回 (数据集根目录, 统计)
+
+        检测/分割任务扫描全部标签文件得到类别数，扫描报告放在 stats['labels']；
+        stats['inventory'] 为导入时的文件清单（相对路径、大小、mtime、划分与 blob），用于生成文件清单表。
+        """
         # 创建数据集目录
+        # 目录名以数据集 ID（或随机串）开头，同一秒内同名上传也不会解压到同一目录
         timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        dataset_dir = os.path.join(self.datasets_dir, f"{timestamp}_{name}")
-        os.makedirs(dataset_dir, exist_ok=True)
+        prefix = dataset_id if dataset_id is not None else uuid.uuid4().hex[:8]
+        dataset_dir = os.path.join(self.datasets_dir, f"{prefix}_{timestamp}_{name}")
         
-        # 解压文件
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(dataset_dir)
+        # 按中央目录检查并并行解压，同时得到数据集根目录、类别与统计
+        actual_dataset_dir, stats, names, inventory = self.ingestor.ingest(zip_path, dataset_dir, task_type)
         
-        # 验证数据集结构并返回实际的数据集根目录
-        actual_dataset_dir = self._validate_dataset_structure(dataset_dir, task_type)
+        if task_type != 'classify':
+            label_paths = [item['path'] for item in inventory if item['kind'] == 'label']
+            report = self.label_scanner.scan(actual_dataset_dir, label_paths, task_type)
+            names = [f'class_{i}' for i in range(report['nc'])]
+            stats['labels'] = report
+        stats['inventory'] = inventory
         
-        return actual_dataset_dir
+        self._generate_data_yaml(actual_dataset_dir, task_type, names)
+        return actual_dataset_dir, stats
     
-    def _validate_dataset_structure(self, dataset_dir, task_type):
-        """验证数据集结构"""
-        # 查找实际的数据集根目录
-        actual_dataset_dir = dataset_dir
-        for root, dirs, files in os.walk(dataset_dir):
-            if 'train' in dirs and 'val' in dirs:
-                actual_dataset_dir = root
-                break
-        
-        # 检查是否存在 data.yaml
-        yaml_path = os.path.join(actual_dataset_dir, 'data.yaml')
-        if not os.path.exists(yaml_path):
-            # 自动生成 data.yaml
-            actual_dataset_dir = self._generate_data_yaml(actual_dataset_dir, task_type)
-        else:
-            # 更新现有的data.yaml以修复路径
-            actual_dataset_dir = self._generate_data_yaml(actual_dataset_dir, task_type)
-        
-        return actual_dataset_dir
-    
-    def _generate_data_yaml(self, dataset_dir, task_type):
-        """自动生成 data.yaml 配置文件"""
-        # 检查是否有嵌套的数据集目录
-        actual_dataset_dir = dataset_dir
-        
-        # 查找实际的数据集根目录（包含train和val的目录）
-        for root, dirs, files in os.walk(dataset_dir):
-            if 'train' in dirs and 'val' in dirs:
-                actual_dataset_dir = root
-                break
-        
-        yaml_path = os.path.join(actual_dataset_dir, 'data.yaml')
-        
-        # 查找类别
-        names = []
-        if task_type == 'detect' or task_type == 'segment':
-            # 从 labels 文件夹中推断类别
-            train_labels = os.path.join(actual_dataset_dir, 'train', 'labels')
-            if os.path.exists(train_labels):
-                # 读取第一个标签文件获取类别信息
-                label_files = [f for f in os.listdir(train_labels) if f.endswith('.txt')]
-                if label_files:
-                    # 简化处理：假设类别从0开始连续编号
-                    max_class = -1
-                    for label_file in label_files[:10]:  # 只检查前10个文件
-                        label_path = os.path.join(train_labels, label_file)
-                        try:
-                            with open(label_path, 'r', encoding='utf-8') as f:
-                                for line in f:
-                                    parts = line.strip().split()
-                                    if parts:
-                                        max_class = max(max_class, int(parts[0]))
-                        except:
-                            pass
-                    names = [f'class_{i}' for i in range(max_class + 1)]
-        elif task_type == 'classify':
-            # 从文件夹名称推断类别
-            train_dir = os.path.join(actual_dataset_dir, 'train')
-            if os.path.exists(train_dir):
-                names = [d for d in os.listdir(train_dir) if os.path.isdir(os.path.join(train_dir, d))]
+    def _generate_data_yaml(self, dataset_dir, task_type, names):
+        """生成 data.yaml 配置文件（覆盖压缩包中已有的 data.yaml 以修复路径）"""
+        yaml_path = os.path.join(dataset_dir, 'data.yaml')
         
         if not names:
             names = ['class_0']  # 默认至少一个类别
         
         # 生成配置 - 使用绝对路径确保YOLO能找到数据
         # 将Windows路径转换为正斜杠，避免中文路径问题
-        path_normalized = actual_dataset_dir.replace('\\', '/')
+        path_normalized = dataset_dir.replace('\\', '/')
+        
+        # 压缩包中的 data.yaml 可能是共享 blob 的硬链接，先解除链接再写，不能原地覆盖
+        if os.path.exists(yaml_path):
+            os.remove(yaml_path)
         
         data_config = {
             'path': path_normalized,
@@ -109,44 +104,33 @@ class TrainingService:
         
         with open(yaml_path, 'w', encoding='utf-8') as f:
             yaml.dump(data_config, f, allow_unicode=True)
-        
-        return actual_dataset_dir
     
-    def get_dataset_stats(self, dataset_path):
-        """获取数据集统计信息"""
-        stats = {'total_images': 0, 'train_images': 0, 'val_images': 0}
-        
-        # 统计训练集
-        train_images = os.path.join(dataset_path, 'train', 'images')
-        if os.path.exists(train_images):
-            stats['train_images'] = len([f for f in os.listdir(train_images) 
-                                        if f.lower().endswith(('.jpg', '.jpeg', '.png'))])
-        else:
-            train_dir = os.path.join(dataset_path, 'train')
-            if os.path.exists(train_dir):
-                for root, dirs, files in os.walk(train_dir):
-                    stats['train_images'] += len([f for f in files 
-                                                 if f.lower().endswith(('.jpg', '.jpeg', '.png'))])
-        
-        # 统计验证集
-        val_images = os.path.join(dataset_path, 'val', 'images')
-        if os.path.exists(val_images):
-            stats['val_images'] = len([f for f in os.listdir(val_images) 
-                                      if f.lower().endswith(('.jpg', '.jpeg', '.png'))])
-        else:
-            val_dir = os.path.join(dataset_path, 'val')
-            if os.path.exists(val_dir):
-                for root, dirs, files in os.walk(val_dir):
-                    stats['val_images'] += len([f for f in files 
-                                               if f.lower().endswith(('.jpg', '.jpeg', '.png'))])
-        
-        stats['total_images'] = stats['train_images'] + stats['val_images']
-        return stats
+    def delete_dataset_files(self, dataset_path):
+        """删除数据集文件：删除整个解压目录（根目录可能是其子目录），回收不再被引用的 blob"""
+        top = dataset_path
+        rel = os.path.relpath(os.path.realpath(dataset_path), os.path.realpath(self.datasets_dir))
+        if rel == '.':
+            return
+        if not rel.startswith('..'):
+            top = os.path.join(self.datasets_dir, rel.split(os.sep)[0])
+        if not os.path.exists(top):
+            return
+        removed, freed = self.ingestor.remove(top)
+        if removed:
+            print(f"Released {removed} blobs ({freed / 1024 ** 2:.1f}MB) of {top}")
+    
+    def is_running(self, task_id):
+        thread = self.training_threads.get(task_id)
+        return thread is not None and thread.is_alive()
+    
+    def running_count(self):
+        """当前正在运行的训练数"""
+        return sum(1 for thread in self.training_threads.values() if thread.is_alive())
     
     def start_training(self, task_id, dataset_path, task_type, model_type, epochs, batch_size, img_size):
         """启动训练任务"""
         thread = threading.Thread(
-            target=self._train_model,
+            target=self._run_training,
             args=(task_id, dataset_path, task_type, model_type, epochs, batch_size, img_size)
         )
         thread.daemon = True
@@ -154,16 +138,46 @@ class TrainingService:
         self.training_progress[task_id] = {
             'status': 'starting',
             'progress': 0,
-            'current_epoch': 0,
-            'logs': []
+            'current_epoch': 0
         }
         thread.start()
     
+    def _run_training(self, *args):
+        """训练线程入口：训练结束后通知调度器"""
+        try:
+            self._train_model(*args)
+        finally:
+            if self.on_task_finished:
+                self.on_task_finished(args[0])
+    
     def _train_model(self, task_id, dataset_path, task_type, model_type, epochs, batch_size, img_size):
-        """训练模型的实际逻辑"""
+        """训练模型：在独立工作进程中训练，当前线程接收进度并写入数据库"""
         import traceback
-        from models import db, TrainingTask, Model
-        from app import app
+        from models import db, TrainingTask, Model, TrainingMetric
+        if self.app is not None:
+            app = self.app
+        else:
+            from server import app
+        
+        if self.progress_writer is None:
+            self.progress_writer = ProgressWriter(app)
+            self.progress_writer.start()
+        writer = self.progress_writer
+        cache_path = None
+        project_dir = None
+        
+        def finish_stopped():
+            """已被停止：丢弃未提交的修改，清理训练输出目录并更新状态"""
+            db.session.rollback()
+            if project_dir:
+                shutil.rmtree(project_dir, ignore_errors=True)
+            task = TrainingTask.query.get(task_id)
+            if task:
+                task.status = 'stopped'
+                task.completed_at = datetime.now()
+                db.session.commit()
+            self._set_status(task_id, 'stopped')
+            print(f"Task {task_id} stopped, output removed: {project_dir}")
         
         with app.app_context():
             try:
@@ -175,132 +189,133 @@ class TrainingService:
                     self.training_progress[task_id]['error'] = 'Task not found'
                     return
                 
+                if task.status == 'stopped':
+                    # 启动前已被停止
+                    self._set_status(task_id, 'stopped')
+                    return
+                
                 print(f"Starting training for task {task_id}...")
                 task.status = 'training'
                 task.started_at = datetime.now()
+                task_name = task.name
+                dataset_id = task.dataset_id
                 db.session.commit()
+                # 训练期间不持有 session，进度由写回缓冲批量落库
+                db.session.remove()
                 
-                self.training_progress[task_id]['status'] = 'training'
-                
-                # 验证数据集路径
-                if not os.path.exists(dataset_path):
-                    raise Exception(f"Dataset path does not exist: {dataset_path}")
-                
-                data_yaml = os.path.join(dataset_path, 'data.yaml')
-                if not os.path.exists(data_yaml):
-                    raise Exception(f"data.yaml not found at: {data_yaml}")
-                
-                # 对于分类任务，YOLO需要数据集目录路径（包含train/val子目录），而不是data.yaml文件路径
-                # 对于检测/分割任务，YOLO需要data.yaml文件路径
-                if task_type == 'classify':
-                    # 分类任务：传递数据集目录路径
-                    training_data_path = dataset_path.replace('\\', '/')
-                    print(f"Classification task - using dataset directory: {training_data_path}")
-                else:
-                    # 检测/分割任务：传递data.yaml文件路径
-                    training_data_path = data_yaml.replace('\\', '/')
-                    print(f"Detection/Segmentation task - using data.yaml: {training_data_path}")
+                self._set_status(task_id, 'training', epochs=epochs)
                 
-                print(f"Dataset path: {dataset_path}")
-                print(f"data.yaml path: {data_yaml}")
-                print(f"Training data path: {training_data_path}")
-                
-                # 选择模型
-                model_map = {
-                    'detect': f'{model_type}.pt',
-                    'classify': f'{model_type}-cls.pt',
-                    'segment': f'{model_type}-seg.pt'
-                }
-                model_file = model_map.get(task_type, f'{model_type}.pt')
-                
-                # 检查models目录中是否有预下载的模型
-                local_model_path = os.path.join(self.models_dir, model_file)
-                if os.path.exists(local_model_path):
-                    model_path = local_model_path
-                    print(f"Using local model: {model_path}")
-                else:
-                    model_path = model_file
-                    print(f"Model will be downloaded: {model_file}")
-                
-                # 加载模型（处理下载错误）
-                try:
-                    model = YOLO(model_path)
-                    print(f"Model loaded successfully!")
-                except Exception as download_error:
-                    # 如果GitHub下载失败，提供清晰的错误信息
-                    error_msg = str(download_error)
-                    if 'ProxyError' in error_msg or 'github.com' in error_msg:
-                        raise Exception(
-                            f"无法从GitHub下载模型文件 {model_file}。\n"
-                            f"解决方案：\n"
-                            f"1. 手动下载模型文件到 backend/models/ 目录：\n"
-                            f"   - yolo11n.pt: https://github.com/ultralytics/assets/releases/download/v8.1.0/yolo11n.pt\n"
-                            f"   - yolo11s.pt: https://github.com/ultralytics/assets/releases/download/v8.1.0/yolo11s.pt\n"
-                            f"   - yolo11m.pt: https://github.com/ultralytics/assets/releases/download/v8.1.0/yolo11m.pt\n"
-                            f"2. 或配置网络代理\n"
-                            f"\n原始错误: {error_msg}"
-                        )
-                    else:
-                        raise
+                # 检测/分割任务使用按数据集与 img_size 共享的预处理图片缓存（首次使用时构建）
+                if self.image_cache is not None and task_type in ('detect', 'segment'):
+                    self._log(task_id, f'Preparing image cache (img_size={img_size})...')
+                    cache_path = self.image_cache.acquire(dataset_id, dataset_path, img_size)
+                    self._log(task_id, f'Image cache: {cache_path}' if cache_path else 'Image cache unavailable, using original images')
+                    stopped = TrainingTask.query.get(task_id).status == 'stopped'
+                    db.session.remove()
+                    if stopped:
+                        # 准备缓存期间被停止
+                        self._set_status(task_id, 'stopped')
+                        return
                 
                 # 训练配置
                 project_dir = os.path.join(self.runs_dir, f'task_{task_id}')
-                print(f"Training output directory: {project_dir}")
+                config = {
+                    'task_id': task_id,
+                    'dataset_path': cache_path or dataset_path,
+                    'task_type': task_type,
+                    'model_type': model_type,
+                    'epochs': epochs,
+                    'batch_size': batch_size,
+                    'img_size': img_size,
+                    'project_dir': project_dir,
+                    'models_dir': self.models_dir,
+                    'threads': self.threads_per_process,
+                    'workers': self.dataloader_workers
+                }
                 
-                # 自定义回调函数
-                def on_train_epoch_end(trainer):
-                    try:
-                        epoch = trainer.epoch + 1
-                        progress = (epoch / epochs) * 100
-                        
+                # 启动训练进程（spawn 方式，不继承主进程的线程与数据库连接）
+                ctx = multiprocessing.get_context('spawn')
+                messages = ctx.Queue()
+                process = ctx.Process(target=run_training_worker, args=(config, messages))
+                with self._stop_lock:
+                    # 与 stop_training 互斥：检查之后到登记进程之前发出的停止不会丢失
+                    stopped = task_id in self.stop_requested
+                    if not stopped:
+                        process.start()
+                        self.training_processes[task_id] = process
+                if stopped:
+                    finish_stopped()
+                    return
+                print(f"Training process for task {task_id} started (pid={process.pid})")
+                
+                outcome = None
+                epoch_losses = {}  # epoch -> 训练损失与学习率，等验证指标到达后一起落库
+                for kind, payload in self._iter_messages(process, messages):
+                    if kind == 'epoch':
+                        epoch = payload['epoch']
+                        progress = payload['progress']
                         self.training_progress[task_id].update({
                             'progress': progress,
-                            'current_epoch': epoch,
-                            'logs': self.training_progress[task_id].get('logs', []) + 
-                                   [f'Epoch {epoch}/{epochs} completed']
+                            'current_epoch': epoch
+                        })
+                        self.events.publish(task_id, 'epoch', {
+                            'epoch': epoch,
+                            'epochs': epochs,
+                            'progress': progress,
+                            'loss': payload.get('loss', {}),
+                            'lr': payload.get('lr', {})
                         })
+                        epoch_losses[epoch] = {**payload.get('loss', {}), **payload.get('lr', {})}
                         
-                        # 更新数据库
-                        task.progress = progress
-                        task.current_epoch = epoch
-                        db.session.commit()
-                        print(f"Epoch {epoch}/{epochs} completed - Progress: {progress:.1f}%")
-                    except Exception as e:
-                        print(f"Error in epoch callback: {e}")
+                        writer.update(task_id, progress=progress, current_epoch=epoch)
+                    elif kind == 'log':
+                        self._log(task_id, payload)
+                    elif kind == 'metrics':
+                        self.events.publish(task_id, 'metric', payload)
+                        values = {} if payload['final'] else epoch_losses.pop(payload['epoch'], {})
+                        values.update(payload['metrics'])
+                        if payload.get('fitness') is not None:
+                            values['fitness'] = payload['fitness']
+                        writer.insert(
+                            TrainingMetric,
+                            task_id=task_id,
+                            epoch=payload['epoch'],
+                            final=payload['final'],
+                            epoch_time=payload.get('epoch_time'),
+                            values=json.dumps(values)
+                        )
+                    elif kind in ('completed', 'failed'):
+                        outcome = (kind, payload)
                 
-                # 添加回调
-                model.add_callback('on_train_epoch_end', on_train_epoch_end)
+                process.join()
+                self.training_processes.pop(task_id, None)
                 
-                # 开始训练
-                print(f"Starting YOLO training with: epochs={epochs}, batch={batch_size}, imgsz={img_size}")
-                results = model.train(
-                    data=training_data_path,
-                    epochs=epochs,
-                    batch=batch_size,
-                    imgsz=img_size,
-                    project=project_dir,
-                    name='train',
-                    exist_ok=True,
-                    verbose=True
-                )
+                # 状态变化前先写入缓冲中的进度与指标，再重新加载任务
+                writer.flush()
+                task = TrainingTask.query.get(task_id)
+                
+                if task_id in self.stop_requested:
+                    # 已被强制停止
+                    finish_stopped()
+                    return
                 
-                print("Training completed successfully!")
+                if outcome is None:
+                    raise Exception(f"Training process exited unexpectedly (exit code {process.exitcode})")
                 
-                # 训练完成，保存模型
-                best_weights = os.path.join(project_dir, 'train', 'weights', 'best.pt')
-                model_save_path = os.path.join(self.models_dir, f'task_{task_id}_best.pt')
+                if outcome[0] == 'failed':
+                    raise TrainingProcessError(outcome[1]['error'], outcome[1]['traceback'])
                 
-                if os.path.exists(best_weights):
-                    shutil.copy(best_weights, model_save_path)
-                    print(f"Model saved to: {model_save_path}")
-                    
+                # 训练完成，创建模型记录
+                model_save_path = outcome[1]['model_save_path']
+                model_record = None
+                if model_save_path and os.path.exists(model_save_path):
                     # 获取训练结果图片路径
                     results_img = os.path.join(project_dir, 'train', 'results.png')
                     confusion_matrix = os.path.join(project_dir, 'train', 'confusion_matrix.png')
                     
                     # 创建模型记录
                     model_record = Model(
-                        name=f'{task.name}_model',
+                        name=f'{task_name}_model',
                         task_id=task_id,
                         task_type=task_type,
                         model_type=model_type,
@@ -317,49 +332,123 @@ class TrainingService:
                     )
                     db.session.add(model_record)
                 
-                # 更新任务状态
-                task.status = 'completed'
-                task.progress = 100.0
-                task.completed_at = datetime.now()
-                task.output_path = project_dir
-                db.session.commit()
+                # 更新任务状态（持锁检查：进程结束后到这里之间发出的停止同样生效）
+                with self._stop_lock:
+                    stopped = task_id in self.stop_requested
+                    if not stopped:
+                        task.status = 'completed'
+                        task.progress = 100.0
+                        task.completed_at = datetime.now()
+                        task.output_path = project_dir
+                        db.session.commit()
+                if stopped:
+                    finish_stopped()
+                    return
                 
-                self.training_progress[task_id]['status'] = 'completed'
+                self._set_status(task_id, 'completed', progress=100.0,
+                                 model_id=model_record.id if model_record is not None else None)
                 print(f"Task {task_id} completed successfully!")
                 
+                # 后台导出 CPU 推理引擎（失败不影响训练结果）
+                if model_record is not None and self.export_service and self.auto_export_engines:
+                    try:
+                        self.export_service.export_model(model_record.id, self.auto_export_engines)
+                    except Exception as export_error:
+                        print(f"Failed to schedule export for task {task_id}: {export_error}")
+                
             except Exception as e:
                 # 训练失败
                 error_msg = str(e)
-                error_trace = traceback.format_exc()
+                error_trace = e.child_traceback if isinstance(e, TrainingProcessError) else traceback.format_exc()
                 print(f"Training failed for task {task_id}:")
                 print(f"Error: {error_msg}")
                 print(f"Traceback:\n{error_trace}")
                 
+                for line in f"Error: {error_msg}\n{error_trace}".splitlines():
+                    self._log(task_id, line)
+                
                 try:
+                    db.session.rollback()
+                    writer.flush()
                     task = TrainingTask.query.get(task_id)
                     if task:
                         task.status = 'failed'
-                        task.logs = f"{error_msg}\n\n{error_trace}"
+                        task_log = f"{error_msg}\n\n{error_trace}"
+                        if len(task_log) > MAX_TASK_LOG_CHARS:
+                            # 保留开头的错误信息和末尾的堆栈
+                            half = MAX_TASK_LOG_CHARS // 2
+                            task_log = f"{task_log[:half]}\n...\n{task_log[-half:]}"
+                        task.logs = task_log
                         db.session.commit()
                 except Exception as db_error:
                     print(f"Failed to update task status: {db_error}")
                 
-                self.training_progress[task_id]['status'] = 'failed'
                 self.training_progress[task_id]['error'] = error_msg
-                self.training_progress[task_id]['logs'] = self.training_progress[task_id].get('logs', []) + [f'Error: {error_msg}']
+                self._set_status(task_id, 'failed', error=error_msg)
+            finally:
+                with self._stop_lock:
+                    self.training_processes.pop(task_id, None)
+                    self.stop_requested.discard(task_id)
+                if cache_path:
+                    self.image_cache.release(cache_path)
+                self.logs.close(task_id)
+                db.session.remove()
+    
+    def _log(self, task_id, line):
+        """记录一行训练日志并推送 log 事件"""
+        seq = self.logs.append(task_id, line)
+        self.events.publish(task_id, 'log', {'seq': seq, 'line': line})
+    
+    def _set_status(self, task_id, status, **extra):
+        """更新内存中的训练状态并推送 status 事件"""
+        if task_id in self.training_progress:
+            self.training_progress[task_id]['status'] = status
+        self.events.publish(task_id, 'status', {'status': status, **extra})
+    
+    @staticmethod
+    def _iter_messages(process, messages):
+        """读取工作进程消息，直到进程退出且队列取空"""
+        while True:
+            try:
+                yield messages.get(timeout=1)
+            except queue.Empty:
+                if not process.is_alive():
+                    # 进程已退出，取完残留消息
+                    while True:
+                        try:
+                            yield messages.get(timeout=0.5)
+                        except queue.Empty:
+                            return
     
     def stop_training(self, task_id):
-        """停止训练任务"""
-        if task_id in self.training_threads:
-            # 注意：线程不能直接停止，这里只是标记状态
+        """停止训练任务：终止训练进程，由监控线程清理输出目录并更新状态
+
+        停止请求总会登记：训练线程尚未启动进程或进程刚结束时，由训练线程在启动前或标记完成前处理。
+        """
+        with self._stop_lock:
+            self.stop_requested.add(task_id)
+            process = self.training_processes.get(task_id)
+        if process is None or not process.is_alive():
+            # 没有运行中的训练进程（排队中或已结束），直接推送停止状态
+            self._set_status(task_id, 'stopped')
+            return False
+        
+        if task_id in self.training_progress:
             self.training_progress[task_id]['status'] = 'stopped'
-            # 实际的停止需要在训练循环中检查状态
+        
+        process.terminate()
+        process.join(timeout=10)
+        if process.is_alive():
+            process.kill()
+        print(f"Training process for task {task_id} terminated")
+        return True
     
-    def get_training_progress(self, task_id):
-        """获取训练进度"""
-        return self.training_progress.get(task_id, {
+    def get_training_progress(self, task_id, log_lines=100):
+        """获取训练进度，logs 为最近 log_lines 行日志"""
+        progress = dict(self.training_progress.get(task_id, {
             'status': 'unknown',
             'progress': 0,
-            'current_epoch': 0,
-            'logs': []
-        })
+            'current_epoch': 0
+        }))
+        progress['logs'] = self.logs.tail(task_id, log_lines)
+        return progress
@@ -0,0 +1,242 @@
+"""
+训练工作进程
+
+在独立进程中执行 YOLO 训练，通过 multiprocessing 队列向主进程回报进度：
+    ('epoch', {...})      每轮训练结束，附带训练损失与学习率
+    ('metrics', {...})    每轮验证结束，附带验证指标与耗时
+    ('log', line)         一行训练输出（stdout / stderr / ultralytics 日志）
+    ('completed', {...})  训练完成，附带保存的权重路径
+    ('failed', {...})     训练失败，附带错误信息与堆栈
+
+工作进程不访问数据库，所有状态由主进程中的 TrainingService 写入。
+"""
+import os
+import io
+import sys
+import re
+import logging
+
+
+def _limit_threads(num_threads):
+    """限制数值计算库的线程数，需在导入 torch 之前设置"""
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMEXPR_NUM_THREADS'):
+        os.environ[var] = str(num_threads)
+
+
+_ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]')
+
+
+class _LineWriter(io.TextIOBase):
+    """按行转发输出到主进程，同时写回原输出流
+
+    进度条以 '\\r' 刷新同一行，只在换行时发送该行的最终内容，避免每个 batch 一条日志；
+    发送前去掉终端颜色控制符。
+    """
+
+    def __init__(self, messages, stream):
+        self.messages = messages
+        self.stream = stream
+        self._buffer = ''
+
+    def write(self, text):
+        try:
+            self.stream.write(text)
+        except Exception:
+            pass
+        self._buffer += text
+        while '\n' in self._buffer:
+            line, self._buffer = self._buffer.split('\n', 1)
+            line = _ANSI_ESCAPE.sub('', line.rsplit('\r', 1)[-1]).strip()
+            if line:
+                self.messages.put(('log', line))
+        if '\r' in self._buffer:
+            self._buffer = self._buffer.rsplit('\r', 1)[-1]
+        return len(text)
+
+    def flush(self):
+        try:
+            self.stream.flush()
+        except Exception:
+            pass
+
+    def isatty(self):
+        return False
+
+
+def _capture_output(messages):
+    """重定向 stdout / stderr，并把已创建的 ultralytics 日志 handler 指向新的输出流"""
+    sys.stdout = _LineWriter(messages, sys.__stdout__)
+    sys.stderr = _LineWriter(messages, sys.__stderr__)
+    for handler in logging.getLogger('ultralytics').handlers:
+        if isinstance(handler, logging.StreamHandler):
+            handler.setStream(sys.stdout)
+
+
+def _to_floats(values):
+    """将指标字典中的 tensor / numpy 数值转为 float，便于跨进程传递与 JSON 序列化"""
+    return {k: round(float(v), 6) for k, v in (values or {}).items()}
+
+
+def run_training_worker(config, messages):
+    """工作进程入口，config 为训练参数字典，messages 为回报进度的队列"""
+    import traceback
+
+    os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+    if config.get('threads'):
+        _limit_threads(config['threads'])
+
+    _capture_output(messages)
+    try:
+        _train(config, messages)
+    except Exception as e:
+        messages.put(('failed', {
+            'error': str(e),
+            'traceback': traceback.format_exc()
+        }))
+
+
+def _train(config, messages):
+    import shutil
+    from ultralytics import YOLO
+    # ultralytics 首次导入时创建日志 handler，导入后再次绑定到转发流
+    _capture_output(messages)
+
+    if config.get('threads'):
+        import torch
+        torch.set_num_threads(config['threads'])
+
+    task_id = config['task_id']
+    dataset_path = config['dataset_path']
+    task_type = config['task_type']
+    model_type = config['model_type']
+    epochs = config['epochs']
+    project_dir = config['project_dir']
+
+    # 验证数据集路径
+    if not os.path.exists(dataset_path):
+        raise Exception(f"Dataset path does not exist: {dataset_path}")
+
+    data_yaml = os.path.join(dataset_path, 'data.yaml')
+    if not os.path.exists(data_yaml):
+        raise Exception(f"data.yaml not found at: {data_yaml}")
+
+    # 对于分类任务，YOLO需要数据集目录路径（包含train/val子目录），而不是data.yaml文件路径
+    # 对于检测/分割任务，YOLO需要data.yaml文件路径
+    if task_type == 'classify':
+        # 分类任务：传递数据集目录路径
+        training_data_path = dataset_path.replace('\\', '/')
+        print(f"Classification task - using dataset directory: {training_data_path}")
+    else:
+        # 检测/分割任务：传递data.yaml文件路径
+        training_data_path = data_yaml.replace('\\', '/')
+        print(f"Detection/Segmentation task - using data.yaml: {training_data_path}")
+
+    print(f"Dataset path: {dataset_path}")
+    print(f"data.yaml path: {data_yaml}")
+    print(f"Training data path: {training_data_path}")
+
+    # 选择模型
+    model_map = {
+        'detect': f'{model_type}.pt',
+        'classify': f'{model_type}-cls.pt',
+        'segment': f'{model_type}-seg.pt'
+    }
+    model_file = model_map.get(task_type, f'{model_type}.pt')
+
+    # 检查models目录中是否有预下载的模型
+    local_model_path = os.path.join(config['models_dir'], model_file)
+    if os.path.exists(local_model_path):
+        model_path = local_model_path
+        print(f"Using local model: {model_path}")
+    else:
+        model_path = model_file
+        print(f"Model will be downloaded: {model_file}")
+
+    # 加载模型（处理下载错误）
+    try:
+        model = YOLO(model_path)
+        print(f"Model loaded successfully!")
+    except Exception as download_error:
+        # 如果GitHub下载失败，提供清晰的错误信息
+        error_msg = str(download_error)
+        if 'ProxyError' in error_msg or 'github.com' in error_msg:
+            raise Exception(
+                f"无法从GitHub下载模型文件 {model_file}。\n"
+                f"解决方案：\n"
+                f"1. 手动下载模型文件到 backend/models/ 目录：\n"
+                f"   - yolo11n.pt: https://github.com/ultralytics/assets/releases/download/v8.1.0/yolo11n.pt\n"
+                f"   - yolo11s.pt: https://github.com/ultralytics/assets/releases/download/v8.1.0/yolo11s.pt\n"
+                f"   - yolo11m.pt: https://github.com/ultralytics/assets/releases/download/v8.1.0/yolo11m.pt\n"
+                f"2. 或配置网络代理\n"
+                f"\n原始错误: {error_msg}"
+            )
+        else:
+            raise
+
+    print(f"Training output directory: {project_dir}")
+
+    state = {'last_epoch': 0}
+
+    # 自定义回调函数：每轮训练结束向主进程回报进度与训练损失
+    def on_train_epoch_end(trainer):
+        try:
+            epoch = trainer.epoch + 1
+            state['last_epoch'] = epoch
+            messages.put(('epoch', {
+                'epoch': epoch,
+                'progress': (epoch / epochs) * 100,
+                'loss': _to_floats(trainer.label_loss_items(trainer.tloss, prefix='train')),
+                'lr': _to_floats(trainer.lr)
+            }))
+            print(f"Epoch {epoch}/{epochs} completed - Progress: {(epoch / epochs) * 100:.1f}%")
+        except Exception as e:
+            print(f"Error in epoch callback: {e}")
+
+    # 验证结束后回报验证指标与耗时；训练结束时对 best.pt 的最终验证也会触发（epoch 为最后一轮 +1），标记为 final
+    def on_fit_epoch_end(trainer):
+        try:
+            epoch = trainer.epoch + 1
+            final = epoch > state['last_epoch']
+            messages.put(('metrics', {
+                'epoch': state['last_epoch'] if final else epoch,
+                'final': final,
+                'metrics': _to_floats(trainer.metrics),
+                'fitness': float(trainer.fitness) if trainer.fitness is not None else None,
+                'epoch_time': trainer.epoch_time
+            }))
+        except Exception as e:
+            print(f"Error in metrics callback: {e}")
+
+    # 添加回调
+    model.add_callback('on_train_epoch_end', on_train_epoch_end)
+    model.add_callback('on_fit_epoch_end', on_fit_epoch_end)
+
+    # 开始训练
+    train_args = {
+        'data': training_data_path,
+        'epochs': epochs,
+        'batch': config['batch_size'],
+        'imgsz': config['img_size'],
+        'project': project_dir,
+        'name': 'train',
+        'exist_ok': True,
+        'verbose': True
+    }
+    if config.get('workers') is not None:
+        train_args['workers'] = config['workers']
+    print(f"Starting YOLO training with: epochs={epochs}, batch={config['batch_size']}, imgsz={config['img_size']}")
+    model.train(**train_args)
+
+    print("Training completed successfully!")
+
+    # 训练完成，保存模型
+    best_weights = os.path.join(project_dir, 'train', 'weights', 'best.pt')
+    model_save_path = os.path.join(config['models_dir'], f'task_{task_id}_best.pt')
+
+    if os.path.exists(best_weights):
+        shutil.copy(best_weights, model_save_path)
+        print(f"Model saved to: {model_save_path}")
+    else:
+        model_save_path = None
+
+    messages.put(('completed', {'model_save_path': model_save_path}))
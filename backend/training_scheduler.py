@@ -0,0 +1,163 @@
+import heapq
+import threading
+from datetime import datetime, timedelta
+
+
+class TrainingScheduler:
+    """训练任务调度器
+
+    数据库中 status='pending' 的 TrainingTask 即为持久化队列：按优先级（高优先）、
+    创建时间（先进先出）排序，同时运行的训练数不超过 max_concurrent。
+    服务重启后未开始的任务仍会被调度。
+    """
+
+    DEFAULT_SECONDS_PER_EPOCH = 60
+
+    def __init__(self, app, training_service, max_concurrent=1, poll_interval=5):
+        self.app = app
+        self.training_service = training_service
+        self.max_concurrent = max_concurrent
+        self.poll_interval = poll_interval
+        self._cond = threading.Condition()
+        self._thread = None
+        training_service.on_task_finished = self.notify
+
+    def start(self):
+        """启动调度线程（幂等）"""
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+            self._thread.start()
+
+    def notify(self, *args):
+        """有新任务入队或训练结束时唤醒调度线程"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def _recover_interrupted(self):
+        """服务重启前仍在训练的任务已随进程中断，标记为失败"""
+        from models import db, TrainingTask
+
+        interrupted = TrainingTask.query.filter_by(status='training').all()
+        for task in interrupted:
+            if self.training_service.is_running(task.id):
+                continue
+            task.status = 'failed'
+            task.logs = 'Training interrupted by server restart'
+        if interrupted:
+            db.session.commit()
+
+    def _dispatch_loop(self):
+        with self.app.app_context():
+            try:
+                self._recover_interrupted()
+            except Exception as e:
+                print(f"Failed to recover interrupted tasks: {e}")
+
+            while True:
+                try:
+                    self._dispatch()
+                except Exception as e:
+                    print(f"Training scheduler error: {e}")
+                finally:
+                    from models import db
+                    db.session.remove()
+                with self._cond:
+                    self._cond.wait(self.poll_interval)
+
+    def _dispatch(self):
+        """在空闲槽位上启动排队最前的任务"""
+        from models import db, TrainingTask
+
+        while self.training_service.running_count() < self.max_concurrent:
+            task = self._pending_query().first()
+            if task is None:
+                return
+
+            # 排队期间数据集重新校验未通过：任务直接失败，不占用训练槽位
+            if task.dataset.validation_status == 'failed':
+                TrainingTask.query.filter_by(id=task.id, status='pending').update(
+                    {'status': 'failed', 'logs': '数据集校验未通过', 'completed_at': datetime.now()},
+                    synchronize_session=False
+                )
+                db.session.commit()
+                continue
+
+            # 原子地认领任务，避免多个进程重复启动同一任务
+            claimed = TrainingTask.query.filter_by(id=task.id, status='pending').update(
+                {'status': 'training', 'started_at': datetime.now()}, synchronize_session=False
+            )
+            db.session.commit()
+            if not claimed:
+                continue
+
+            dataset = task.dataset
+            print(f"Scheduling task {task.id} (priority={task.priority})")
+            self.training_service.start_training(
+                task_id=task.id,
+                dataset_path=dataset.path,
+                task_type=task.task_type,
+                model_type=task.model_type,
+                epochs=task.epochs,
+                batch_size=task.batch_size,
+                img_size=task.img_size
+            )
+
+    @staticmethod
+    def _pending_query():
+        from models import TrainingTask
+
+        return TrainingTask.query.filter_by(status='pending').order_by(
+            TrainingTask.priority.desc(), TrainingTask.created_at.asc(), TrainingTask.id.asc()
+        )
+
+    def _seconds_per_epoch(self):
+        """根据已完成任务估算每轮训练耗时"""
+        from models import TrainingTask
+
+        done = TrainingTask.query.filter(
+            TrainingTask.status == 'completed',
+            TrainingTask.started_at.isnot(None),
+            TrainingTask.completed_at.isnot(None)
+        ).order_by(TrainingTask.completed_at.desc()).limit(20).all()
+        samples = [
+            (t.completed_at - t.started_at).total_seconds() / t.epochs
+            for t in done if t.epochs
+        ]
+        return sum(samples) / len(samples) if samples else self.DEFAULT_SECONDS_PER_EPOCH
+
+    def queue_snapshot(self):
+        """返回排队任务的位置与预计开始时间 {task_id: {'queue_position', 'estimated_start'}}"""
+        from models import TrainingTask
+
+        seconds_per_epoch = self._seconds_per_epoch()
+        now = datetime.now()
+
+        # 各槽位预计空闲时间（秒）：正在训练的任务按剩余轮数估算
+        slots = []
+        for task in TrainingTask.query.filter_by(status='training').all():
+            remaining = max(task.epochs - (task.current_epoch or 0), 0)
+            slots.append(remaining * seconds_per_epoch)
+        slots = sorted(slots)[:self.max_concurrent]
+        slots += [0.0] * (self.max_concurrent - len(slots))
+        heapq.heapify(slots)
+
+        snapshot = {}
+        for position, task in enumerate(self._pending_query().all(), start=1):
+            start_in = heapq.heappop(slots)
+            heapq.heappush(slots, start_in + task.epochs * seconds_per_epoch)
+            snapshot[task.id] = {
+                'queue_position': position,
+                'estimated_start': (now + timedelta(seconds=start_in)).strftime('%Y-%m-%d %H:%M:%S')
+            }
+        return snapshot
+
+    def stats(self):
+        from models import TrainingTask
+
+        return {
+            'max_concurrent': self.max_concurrent,
+            'running': self.training_service.running_count(),
+            'pending': TrainingTask.query.filter_by(status='pending').count()
+        }
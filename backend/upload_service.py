@@ -0,0 +1,255 @@
+import os
+import json
+import uuid
+import hashlib
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+CHECKSUM_ALGORITHMS = ('sha256', 'md5')
+
+
+class UploadError(Exception):
+    """分片上传请求错误，status 为对应的 HTTP 状态码"""
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+class UploadService:
+    """数据集分片上传与异步处理
+
+    上传会话保存在 upload_dir/<upload_id>.json，数据追加写入 <upload_id>.part，服务重启后仍可续传。
+    协议：init 创建会话 → 按 offset 依次 PUT 分片（附分片校验和）→ complete 创建 Dataset
+    （status=processing）并在后台解压处理，完成后 status 变为 ready 或 error。
+    断线后 GET 会话得到已接收的 offset，从该位置继续上传。
+    """
+
+    def __init__(self, app, training_service, upload_dir, chunk_size=8 * 1024 * 1024, max_workers=1):
+        self.app = app
+        self.training_service = training_service
+        self.upload_dir = upload_dir
+        self.chunk_size = chunk_size
+        self.manifest = None  # DatasetManifest，处理完成时生成文件清单
+        self.validator = None  # DatasetValidator，生成清单后校验数据集完整性
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dataset-process')
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._started = False
+        os.makedirs(upload_dir, exist_ok=True)
+
+    def _meta_path(self, upload_id):
+        return os.path.join(self.upload_dir, f'{upload_id}.json')
+
+    def _part_path(self, upload_id):
+        return os.path.join(self.upload_dir, f'{upload_id}.part')
+
+    def _lock(self, upload_id):
+        with self._locks_guard:
+            return self._locks.setdefault(upload_id, threading.Lock())
+
+    def _load(self, upload_id):
+        try:
+            uuid.UUID(upload_id)
+        except ValueError:
+            raise UploadError('上传会话不存在', 404)
+        path = self._meta_path(upload_id)
+        if not os.path.exists(path):
+            raise UploadError('上传会话不存在', 404)
+        with open(path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        # 以磁盘上实际写入的字节数为准（写入中断时 .part 可能短于记录）
+        meta['offset'] = os.path.getsize(self._part_path(upload_id))
+        return meta
+
+    def _save(self, meta):
+        path = self._meta_path(meta['upload_id'])
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+
+    def init_upload(self, filename, name, task_type, description='', total_size=None):
+        """创建上传会话"""
+        if not filename or not name:
+            raise UploadError('缺少必要参数')
+        if not filename.lower().endswith('.zip'):
+            raise UploadError('仅支持 zip 格式的数据集')
+        meta = {
+            'upload_id': str(uuid.uuid4()),
+            'filename': filename,
+            'name': name,
+            'task_type': task_type,
+            'description': description,
+            'total_size': total_size,
+            'chunk_size': self.chunk_size,
+            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        open(self._part_path(meta['upload_id']), 'wb').close()
+        self._save(meta)
+        meta['offset'] = 0
+        return meta
+
+    def get_upload(self, upload_id):
+        return self._load(upload_id)
+
+    def put_chunk(self, upload_id, offset, stream, checksum=None, algorithm='sha256'):
+        """写入一个分片：offset 必须等于已接收字节数；校验和不符时丢弃该分片
+
+        分片流式写入磁盘并同时计算校验和，不在内存中缓存整个分片。
+        """
+        if algorithm not in CHECKSUM_ALGORITHMS:
+            raise UploadError(f'不支持的校验算法: {algorithm}')
+
+        with self._lock(upload_id):
+            meta = self._load(upload_id)
+            if offset != meta['offset']:
+                raise UploadError('分片偏移不匹配', 409, offset=meta['offset'])
+
+            digest = hashlib.new(algorithm)
+            received = 0
+            part_path = self._part_path(upload_id)
+            with open(part_path, 'ab') as f:
+                try:
+                    while True:
+                        block = stream.read(1024 * 1024)
+                        if not block:
+                            break
+                        digest.update(block)
+                        f.write(block)
+                        received += len(block)
+                    f.flush()
+                except Exception:
+                    # 连接中断：回退到分片开始位置，客户端重传该分片
+                    f.truncate(offset)
+                    raise
+
+                if checksum and digest.hexdigest() != checksum.lower():
+                    f.truncate(offset)
+                    raise UploadError('分片校验失败', 422, offset=offset)
+
+            total_size = meta.get('total_size')
+            if total_size is not None and offset + received > total_size:
+                with open(part_path, 'ab') as f:
+                    f.truncate(offset)
+                raise UploadError('超出声明的文件大小', 413, offset=offset)
+
+            meta['offset'] = offset + received
+            return meta
+
+    def abort(self, upload_id):
+        with self._lock(upload_id):
+            self._load(upload_id)
+            for path in (self._meta_path(upload_id), self._part_path(upload_id)):
+                if os.path.exists(path):
+                    os.remove(path)
+        with self._locks_guard:
+            self._locks.pop(upload_id, None)
+
+    def complete(self, upload_id, checksum=None, algorithm='sha256'):
+        """结束上传：校验整体大小与校验和，创建 processing 状态的数据集并提交后台处理"""
+        with self._lock(upload_id):
+            meta = self._load(upload_id)
+            part_path = self._part_path(upload_id)
+            if meta.get('total_size') is not None and meta['offset'] != meta['total_size']:
+                raise UploadError('文件未上传完整', 409, offset=meta['offset'])
+            if meta['offset'] == 0:
+                raise UploadError('文件为空')
+            if checksum:
+                if algorithm not in CHECKSUM_ALGORITHMS:
+                    raise UploadError(f'不支持的校验算法: {algorithm}')
+                digest = hashlib.new(algorithm)
+                with open(part_path, 'rb') as f:
+                    for block in iter(lambda: f.read(1024 * 1024), b''):
+                        digest.update(block)
+                if digest.hexdigest() != checksum.lower():
+                    raise UploadError('文件校验失败', 422)
+
+            # 转为普通上传文件，会话结束
+            timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+            zip_path = os.path.join(self.upload_dir, f'{timestamp}_{upload_id}.zip')
+            os.replace(part_path, zip_path)
+            os.remove(self._meta_path(upload_id))
+        with self._locks_guard:
+            self._locks.pop(upload_id, None)
+
+        return self.submit(zip_path, meta['name'], meta['task_type'], meta.get('description', ''))
+
+    def submit(self, zip_path, name, task_type, description=''):
+        """为已保存的压缩包创建数据集记录（status=processing）并在后台处理，返回数据集"""
+        from models import db, Dataset
+
+        dataset = Dataset(
+            name=name,
+            task_type=task_type,
+            description=description,
+            path='',
+            size=os.path.getsize(zip_path),
+            format='zip',
+            status='processing'
+        )
+        db.session.add(dataset)
+        db.session.commit()
+        self._executor.submit(self._process, dataset.id, zip_path)
+        return dataset
+
+    def _process(self, dataset_id, zip_path):
+        """后台解压、生成 data.yaml 与文件清单、校验完整性，更新数据集状态"""
+        from models import db, Dataset
+
+        with self.app.app_context():
+            dataset = Dataset.query.get(dataset_id)
+            if dataset is None:
+                os.remove(zip_path)
+                return
+            try:
+                print(f"Processing dataset {dataset_id}: {zip_path}")
+                dataset_path, stats = self.training_service.process_dataset(
+                    zip_path, dataset.name, dataset.task_type, dataset_id=dataset.id)
+                dataset.path = dataset_path
+                dataset.file_count = stats.get('total_images', 0)
+                if 'dedup' in stats:
+                    dedup = stats['dedup']
+                    print(f"Dataset {dataset_id} storage: {dedup['files']} files, {dedup['unique']} unique, "
+                          f"{dedup['stored_bytes'] / 1024 ** 2:.1f}MB new of {dedup['bytes'] / 1024 ** 2:.1f}MB")
+                if self.manifest is not None:
+                    self.manifest.refresh(dataset, labels=stats.get('labels'), inventory=stats.get('inventory'))
+                    if self.validator is not None:
+                        report = self.validator.validate(dataset, stats.get('labels'))
+                        dataset.validation = json.dumps(report, ensure_ascii=False)
+                        print(f"Dataset {dataset_id} validation: {report['status']}")
+                dataset.status = 'ready'
+                dataset.error = None
+                db.session.commit()
+                print(f"Dataset {dataset_id} ready: {dataset.file_count} images")
+            except Exception as e:
+                db.session.rollback()
+                print(f"Failed to process dataset {dataset_id}: {e}")
+                dataset = Dataset.query.get(dataset_id)
+                if dataset is not None:
+                    dataset.status = 'error'
+                    dataset.error = str(e)
+                    db.session.commit()
+            finally:
+                if os.path.exists(zip_path):
+                    os.remove(zip_path)
+
+    def start(self):
+        """服务启动后首次调用：重启前未处理完的数据集已中断，标记为 error（幂等）"""
+        from models import db, Dataset
+
+        with self._locks_guard:
+            if self._started:
+                return
+            self._started = True
+        with self.app.app_context():
+            interrupted = Dataset.query.filter_by(status='processing').all()
+            for dataset in interrupted:
+                dataset.status = 'error'
+                dataset.error = 'Processing interrupted by server restart'
+            if interrupted:
+                db.session.commit()
+        # 回收上次运行中未能及时回收的 blob（与数据集处理串行执行）
+        blob_store = self.training_service.ingestor.blob_store
+        if blob_store is not None:
+            self._executor.submit(blob_store.sweep)
@@ -0,0 +1,202 @@
+import json
+import time
+import queue
+import threading
+from collections import deque
+import cv2
+from inference_utils import class_names_array, encode_image, extract_detections, render_result
+
+_END = object()
+
+
+class _FrameReader(threading.Thread):
+    """后台读帧线程：按 stride / 目标帧率抽帧后放入有界队列
+
+    drop_frames 为 True（实时流）时队列满则丢弃新帧并计数，保证延迟不累积；
+    为 False（上传的视频文件）时阻塞等待，不丢帧。
+    """
+
+    def __init__(self, source, stride=1, target_fps=None, drop_frames=False, queue_size=32):
+        super().__init__(daemon=True)
+        self.source = source
+        self.stride = max(1, stride)
+        self.target_fps = target_fps
+        self.drop_frames = drop_frames
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.source_fps = 0.0
+        self.frames_read = 0
+        self.frames_skipped = 0
+        self.frames_dropped = 0
+        self.error = None
+
+    def run(self):
+        capture = cv2.VideoCapture(self.source)
+        try:
+            if not capture.isOpened():
+                raise Exception(f"Cannot open video source: {self.source}")
+            self.source_fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+            next_emit = 0.0
+            frame_idx = -1
+            while not self.stop_event.is_set():
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                frame_idx += 1
+                self.frames_read += 1
+                timestamp = frame_idx / self.source_fps
+
+                # 按 stride 与目标帧率抽帧
+                if frame_idx % self.stride != 0:
+                    self.frames_skipped += 1
+                    continue
+                if self.target_fps:
+                    if timestamp + 1e-6 < next_emit:
+                        self.frames_skipped += 1
+                        continue
+                    next_emit = max(next_emit + 1.0 / self.target_fps, timestamp)
+
+                item = (frame_idx, timestamp, time.time(), frame)
+                if self.drop_frames:
+                    try:
+                        self.frames.put_nowait(item)
+                    except queue.Full:
+                        self.frames_dropped += 1
+                else:
+                    while not self.stop_event.is_set():
+                        try:
+                            self.frames.put(item, timeout=0.5)
+                            break
+                        except queue.Full:
+                            continue
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            capture.release()
+            self.frames.put(_END)
+
+    def next_batch(self, batch_size):
+        """阻塞取第一帧，再非阻塞取已就绪的帧凑成一批；读到结尾返回 None"""
+        first = self.frames.get()
+        if first is _END:
+            return None
+        batch = [first]
+        while len(batch) < batch_size:
+            try:
+                item = self.frames.get_nowait()
+            except queue.Empty:
+                break
+            if item is _END:
+                self.frames.put(_END)
+                break
+            batch.append(item)
+        return batch
+
+
+class VideoInferenceService:
+    """视频/帧流推理：读帧线程 + 批量推理，结果按帧流式输出（NDJSON 或带标注的 MJPEG）"""
+
+    def __init__(self, model_cache, queue_size=32):
+        self.model_cache = model_cache
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self.sessions = {}
+        self.completed_sessions = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'active_sessions': len(self.sessions),
+                'completed_sessions': self.completed_sessions,
+                'sessions': list(self.sessions.values())
+            }
+
+    def stream(self, source, weight_path, task_type, conf=0.25, iou=0.45, imgsz=None, stride=1,
+               target_fps=None, batch_size=4, output='ndjson', drop_frames=False, image_format='jpeg',
+               quality=80):
+        """生成流式响应内容；客户端断开时生成器被关闭，读帧线程随之停止"""
+        reader = _FrameReader(source, stride=stride, target_fps=target_fps,
+                              drop_frames=drop_frames, queue_size=self.queue_size)
+        latencies = deque(maxlen=1000)
+        with self._lock:
+            session_id = self._next_id
+            self._next_id += 1
+        session = {'id': session_id, 'frames_processed': 0}
+
+        predict_kwargs = {'conf': conf, 'iou': iou, 'verbose': False}
+        if imgsz:
+            predict_kwargs['imgsz'] = imgsz
+
+        def snapshot():
+            ordered = sorted(latencies)
+            session.update({
+                'source_fps': reader.source_fps,
+                'frames_read': reader.frames_read,
+                'frames_skipped': reader.frames_skipped,
+                'frames_dropped': reader.frames_dropped,
+                'avg_latency_ms': round(sum(ordered) / len(ordered), 2) if ordered else 0.0,
+                'p95_latency_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2) if ordered else 0.0
+            })
+            return dict(session)
+
+        reader.start()
+        with self._lock:
+            self.sessions[session_id] = session
+        started = time.time()
+        try:
+            yolo_model = self.model_cache.get(weight_path, task=task_type)
+            names_array = class_names_array(yolo_model.names)
+            while True:
+                batch = reader.next_batch(batch_size)
+                if batch is None:
+                    break
+                with self.model_cache.model_lock(weight_path):
+                    results = yolo_model.predict([item[3] for item in batch], **predict_kwargs)
+
+                for (frame_idx, timestamp, read_at, frame), result in zip(batch, results):
+                    detections = extract_detections(result, task_type, names_array=names_array, mask_format='none')
+                    latency = (time.time() - read_at) * 1000
+                    latencies.append(latency)
+                    session['frames_processed'] += 1
+                    meta = {
+                        'frame': frame_idx,
+                        'timestamp': round(timestamp, 3),
+                        'detections': detections,
+                        'latency_ms': round(latency, 2),
+                        'batch_size': len(batch)
+                    }
+                    if output == 'mjpeg':
+                        image_bytes, mimetype = encode_image(
+                            render_result(result, task_type, frame, detections), image_format, quality
+                        )
+                        yield (
+                            b'--frame\r\n'
+                            + f'Content-Type: {mimetype}\r\n'.encode('utf-8')
+                            + f'Content-Length: {len(image_bytes)}\r\n'.encode('utf-8')
+                            + f'X-Frame-Meta: {json.dumps(meta)}\r\n\r\n'.encode('utf-8')
+                            + image_bytes + b'\r\n'
+                        )
+                    else:
+                        yield json.dumps(meta, ensure_ascii=False) + '\n'
+                snapshot()
+
+            summary = snapshot()
+            summary['total_time'] = int((time.time() - started) * 1000)
+            if reader.error:
+                summary['error'] = reader.error
+            print(f"Video inference session {session_id} finished: {summary}")
+            if output != 'mjpeg':
+                yield json.dumps({'done': True, **summary}, ensure_ascii=False) + '\n'
+        finally:
+            reader.stop_event.set()
+            # 释放可能阻塞在 put 上的读帧线程
+            while reader.is_alive():
+                try:
+                    reader.frames.get_nowait()
+                except queue.Empty:
+                    pass
+                reader.join(timeout=0.1)
+            with self._lock:
+                self.sessions.pop(session_id, None)
+                self.completed_sessions += 1
@@ -1,5 +1,22 @@
 import request from '@/utils/request'
 
+// 列表接口按 cursor 分页（默认每页有上限），依次请求全部页面后合并，页面仍在前端分页显示
+async function requestAllPages(url) {
+  const data = []
+  let cursor = null
+  let res
+  do {
+    res = await request({
+      url,
+      method: 'get',
+      params: cursor ? { cursor, limit: 500 } : { limit: 500 }
+    })
+    data.push(...res.data)
+    cursor = res.pagination && res.pagination.next_cursor
+  } while (cursor)
+  return { ...res, data }
+}
+
 // 统计信息
 export function getStats() {
   return request({
@@ -10,10 +27,7 @@ export function getStats() {
 
 // ========== 数据集相关 ==========
 export function getDatasets() {
-  return request({
-    url: '/datasets',
-    method: 'get'
-  })
+  return requestAllPages('/datasets')
 }
 
 export function getDataset(id) {
@@ -52,10 +66,7 @@ export function downloadDataset(id) {
 
 // ========== 模型相关 ==========
 export function getModels() {
-  return request({
-    url: '/models',
-    method: 'get'
-  })
+  return requestAllPages('/models')
 }
 
 export function getModel(id) {
@@ -101,10 +112,7 @@ export function runInference(formData) {
 
 // ========== 训练任务相关 ==========
 export function getTasks() {
-  return request({
-    url: '/tasks',
-    method: 'get'
-  })
+  return requestAllPages('/tasks')
 }
 
 export function getTask(id) {